@@ -1,7 +1,11 @@
+import math
 import sys
-import pickle
+import time
 from settings import Settings
 from chip8.chip8 import Chip8
+from chip8.debugger import Debugger, parseBreakpoint, parseWatchpoint
+from chip8.quirks import PROFILES
+from chip8.rewind import RewindBuffer
 from frame import Frame
 from window import Window
 from colormap import rgb2hex, hex2rgb
@@ -25,13 +29,34 @@ class InterpreterApp(QtWidgets.QApplication):
         self.__BLACK = (0, 0, 0)
         self.__WINTITLE = 'Python CHIP-8 Interpreter'
         self.__ICON = 'assets/icon.svg'
+        self.__FRAMETIME = 1 / 60
+        # Most frames emulated at once to catch up with the wall clock
+        self.__MAXFRAMES = 4
         self.__defaultStatus = 'Please load a ROM file...'
         self.__pausedStatus = 'PAUSED'
         self.__runStatus = 'Running...'
+        self.__rewindStatus = 'Rewinding...'
+        # Emulation speeds in instructions per second, None is unlimited
+        self.__speeds = {'500 IPS': 500, '600 IPS': 600, '1000 IPS': 1000,
+                         '2000 IPS': 2000, 'Unlimited Speed': None}
+        # Quirk profiles of the CHIP-8 variants, by menu item
+        self.__quirkProfiles = {'COSMAC VIP Quirks': 'vip',
+                                'CHIP-48 Quirks': 'chip48',
+                                'SUPER-CHIP Quirks': 'schip',
+                                'Modern Quirks': 'modern'}
+        self.__unlimitedSpeed = False
         self.__pauseLock = False
         self.__isPaused = False
         self.__isRunning = False
+        self.__nextFrame = time.perf_counter()  # Wall clock frame deadline
         self.__chip8 = Chip8()
+        self.__debugger = Debugger(self.__chip8)
+        self.__gfxVersion = None
+        # Snapshots of the last 60 seconds of frames, captured into a reused
+        # state buffer, for rewinding
+        self.__rewind = RewindBuffer(maxFrames=60 * 60)
+        self.__rewindState = bytearray(Chip8.STATE_SIZE)
+        self.__isRewinding = False
         self.__keyBindings = {}
         self.__timer = QtCore.QBasicTimer()
         # Configure Settings
@@ -85,6 +110,7 @@ class InterpreterApp(QtWidgets.QApplication):
         self.__window.addMenu('File')
         self.__window.addMenu('Options')
         self.__window.addMenu('Settings')
+        self.__window.addMenu('Debug')
         self.__window.addMenu('Help')
 
     def __setupMenuItems(self):
@@ -107,6 +133,11 @@ class InterpreterApp(QtWidgets.QApplication):
         self.__window.addMenuItem('Options',
                                   'Load State',
                                   self.__eventLoadState)
+        self.__window.addMenuSeperator('Options')
+        self.__window.addCheckableMenuItem('Options',
+                                           'Rewind',
+                                           False,
+                                           self.__eventRewind)
         # Setup Settings menu items
         self.__window.addMenuItem('Settings',
                                   'Pixel Colour',
@@ -114,6 +145,34 @@ class InterpreterApp(QtWidgets.QApplication):
         self.__window.addMenuItem('Settings',
                                   'Background Colour',
                                   self.__eventChangeBgColour)
+        self.__window.addMenuSeperator('Settings')
+        for speed in self.__speeds:
+            self.__window.addCheckableMenuItem(
+                'Settings',
+                speed,
+                self.__speeds[speed] == self.__chip8.getSpeed(),
+                lambda speed=speed: self.__eventChangeSpeed(speed))
+        self.__window.addMenuSeperator('Settings')
+        for item, profile in self.__quirkProfiles.items():
+            self.__window.addCheckableMenuItem(
+                'Settings',
+                item,
+                PROFILES[profile] == self.__chip8.getQuirks(),
+                lambda item=item: self.__eventChangeQuirks(item))
+        # Setup Debug menu items
+        self.__window.addMenuItem('Debug',
+                                  'Add Breakpoint',
+                                  self.__eventAddBreakpoint)
+        self.__window.addMenuItem('Debug',
+                                  'Add Watchpoint',
+                                  self.__eventAddWatchpoint)
+        self.__window.addMenuItem('Debug',
+                                  'Clear Breakpoints',
+                                  self.__debugger.clear)
+        self.__window.addMenuSeperator('Debug')
+        self.__window.addMenuItem('Debug', 'Continue', self.__eventContinue)
+        self.__window.addMenuItem('Debug', 'Step', self.__eventStep)
+        self.__window.addMenuItem('Debug', 'Step Over', self.__eventStepOver)
         # Setup Help menu items
         self.__window.addMenuItem('Help', 'About', self.__eventAbout)
 
@@ -169,6 +228,10 @@ class InterpreterApp(QtWidgets.QApplication):
         self.__keyBindings[QtCore.Qt.Key_V] = [
             lambda: self.__chip8.setKeyState(15, 1),
             lambda: self.__chip8.setKeyState(15, 0)]
+        # Hold backspace to rewind
+        self.__keyBindings[QtCore.Qt.Key_Backspace] = [
+            lambda: self.__setRewinding(True),
+            lambda: self.__setRewinding(False)]
         self.__window.updateKeyBindings(self.__keyBindings)
 
     def __showException(self, exception):
@@ -180,22 +243,103 @@ class InterpreterApp(QtWidgets.QApplication):
                                        buttons=QtWidgets.QMessageBox.Ok)
 
     def __emulate(self):
-        '''Emulate the CHIP-8 system using a timer that executes some number
-        of times per second specified by the framerate. Process CHIP-8
-        instructions and pixel rendering. Halt the system if an exception is
-        caught and log the exception to a file.'''
+        '''Emulate the CHIP-8 system using a timer that executes once per
+        frame of the wall clock. Process the CHIP-8 instructions of every frame
+        that is due, so that a slow host catches up, and render the pixels
+        that changed. Capture a snapshot of every frame for rewinding, or
+        restore the previous snapshot while rewinding. Halt the system if an
+        exception is caught and log the exception to a file.'''
         try:
-            if self.__isRunning and not self.__isPaused:
-                self.__chip8.emulateCycle()
+            frames = self.__dueFrames()
+            if self.__isRunning and not self.__isPaused and \
+               self.__isRewinding:
+                for _ in range(frames):
+                    if self.__isRewinding:
+                        self.__rewindFrame()
+            elif self.__isRunning and not self.__isPaused:
+                # At unlimited speed a single frame fills the time until the
+                # next deadline
+                if self.__unlimitedSpeed:
+                    frames = 1
+                for _ in range(frames):
+                    event = self.__emulateFrame()
+                    if event & (Chip8.EVENT_KEY_WAIT | Chip8.EVENT_BREAK):
+                        break
                 self.__handleSound(self.__chip8.getSoundTimer())
-                self.__gridFrame.updatePixels(self.__chip8.getGFX())
+                self.__updateFrame()
+                if event & Chip8.EVENT_BREAK:
+                    self.__showBreak()
         except (Exception) as error:
             # Exception caught, display message and terminate
             self.__isRunning = False
             self.__showException(error)
             self.__window.close()
         finally:
-            QtCore.QTimer.singleShot(1, self.__emulate)
+            # Wake up at the next deadline rather than a frame from now, so
+            # that the time spent emulating does not slow the game down
+            delay = math.ceil((self.__nextFrame - time.perf_counter()) * 1000)
+            QtCore.QTimer.singleShot(max(delay, 0), QtCore.Qt.PreciseTimer,
+                                     self.__emulate)
+
+    def __dueFrames(self):
+        '''Return the number of frames due since the previous call by the wall
+        clock, at least one, and move the deadline of the next frame past
+        them. A host that falls more than __MAXFRAMES frames behind drops the
+        rest instead of catching up.'''
+        now = time.perf_counter()
+        frames = max(int((now - self.__nextFrame) / self.__FRAMETIME) + 1, 1)
+        if frames > self.__MAXFRAMES:
+            frames = self.__MAXFRAMES
+            self.__nextFrame = now + self.__FRAMETIME
+        else:
+            self.__nextFrame += frames * self.__FRAMETIME
+        return frames
+
+    def __emulateFrame(self):
+        '''Emulate the CHIP-8 instructions of a frame and capture a snapshot
+        of it for rewinding. Return the events of the last run.'''
+        event = 0
+        # Emulate until the frame ends or a key press is required, at
+        # unlimited speed keep emulating frames until the next deadline unless
+        # the program is idle
+        while not event & (Chip8.EVENT_KEY_WAIT | Chip8.EVENT_BREAK):
+            event = self.__chip8.runFrame()
+            if event & Chip8.EVENT_FRAME and \
+               not (self.__unlimitedSpeed and
+                    not event & Chip8.EVENT_IDLE and
+                    time.perf_counter() < self.__nextFrame):
+                break
+        self.__rewind.push(self.__chip8.saveState(self.__rewindState))
+        return event
+
+    def __updateFrame(self):
+        '''Hand the frame published by the CHIP-8 system to the Frame and
+        redraw the rows that changed if the graphics buffer changed since it
+        was last drawn, switching the Frame to the resolution of the graphics
+        buffer first if it changed.'''
+        version = self.__chip8.getGFXVersion()
+        if version != self.__gfxVersion:
+            self.__gfxVersion = version
+            self.__gridFrame.setResolution(*self.__chip8.getResolution())
+            self.__gridFrame.updateRows(*self.__chip8.publishFrame())
+
+    def __rewindFrame(self):
+        '''Restore the CHIP-8 system to the most recent snapshot in the rewind
+        buffer and stop rewinding once the buffer is empty.'''
+        if self.__rewind.isEmpty():
+            self.__setRewinding(False)
+        else:
+            self.__chip8.loadState(self.__rewind.pop())
+            self.__updateFrame()
+
+    def __setRewinding(self, action):
+        '''Start or stop rewinding, check the Rewind menu item and modify the
+        StatusBar text to reflect the state of the application.'''
+        if self.__isRunning and action != self.__isRewinding:
+            self.__isRewinding = action
+            if not self.__isPaused:
+                self.__pauseEmulator(False)
+        self.__window.setCheckedMenuItem('Rewind', self.__isRewinding)
 
     def __handleSound(self, soundTimer):
         '''Play a beep sound if the value of the soundTimer is non-zero.'''
@@ -224,6 +368,8 @@ class InterpreterApp(QtWidgets.QApplication):
             # Set the status text (paused or running)
             if self.__isPaused:
                 self.__window.setStatusBar(self.__pausedStatus)
+            elif self.__isRewinding:
+                self.__window.setStatusBar(self.__rewindStatus)
             else:
                 self.__window.setStatusBar(self.__runStatus)
         else:
@@ -249,9 +395,10 @@ class InterpreterApp(QtWidgets.QApplication):
             # Resume interpreter when dialog is closed
             if not self.__pauseLock:
                 self.__pauseEmulator(False)
-            # Save the state of the CHIP-8 CPU to a file
+            # Save a snapshot of the CHIP-8 system to a file
             if fname:
-                pickle.dump(self.__chip8.getState(), open(fname, 'wb'))
+                with open(fname, 'wb') as saveFile:
+                    saveFile.write(self.__chip8.saveState())
         else:
             # Display error message
             QtWidgets.QMessageBox.information(self.__window,
@@ -274,9 +421,16 @@ class InterpreterApp(QtWidgets.QApplication):
         # Resume interpreter when dialog is closed
         if not self.__pauseLock:
             self.__pauseEmulator(False)
-        # Load the state of the CHIP-8 CPU from a file
+        # Load a snapshot of the CHIP-8 system from a file
         if fname:
-            self.__chip8.setState(pickle.load(open(fname, 'rb')))
+            try:
+                with open(fname, 'rb') as saveFile:
+                    self.__chip8.loadState(saveFile.read())
+            except (Exception) as error:
+                self.__showException(error)
+                return
+            self.__rewind.clear()
+            self.__updateFrame()
             self.__window.setStatusBar(self.__runStatus)
             self.__isRunning = True
 
@@ -304,6 +458,102 @@ class InterpreterApp(QtWidgets.QApplication):
             self.__settings.editSetting(
                 'COLOURS', 'pixel', rgb2hex(*newPxColour))
 
+    def __eventChangeSpeed(self, speed):
+        '''Change the number of instructions the CHIP-8 system emulates per
+        second and check the selected speed menu item.'''
+        self.__unlimitedSpeed = self.__speeds[speed] is None
+        if not self.__unlimitedSpeed:
+            self.__chip8.setSpeed(self.__speeds[speed])
+        for item in self.__speeds:
+            self.__window.setCheckedMenuItem(item, item == speed)
+
+    def __eventChangeQuirks(self, item):
+        '''Change the quirk profile of the CHIP-8 system, for the running ROM
+        and the ROMs loaded next, and check the selected quirks menu item.'''
+        self.__chip8.setQuirks(self.__quirkProfiles[item])
+        for other in self.__quirkProfiles:
+            self.__window.setCheckedMenuItem(other, other == item)
+
+    def __showBreak(self):
+        '''Pause the emulator where a breakpoint or watchpoint, or stepping,
+        stopped the CHIP-8 system and show the address of the next
+        instruction in the StatusBar.'''
+        self.__pauseLock = True
+        self.__pauseEmulator()
+        self.__window.setCheckedMenuItem('Pause', True)
+        stop = self.__debugger.getBreak()
+        status = 'Stopped at {:#05x}'.format(self.__chip8.getState()['PRC'])
+        if stop is not None and stop.reason == 'watchpoint' and \
+           stop.cycle == self.__chip8.getCycles() - 1:
+            status += ', {:#05x} written by {:#05x}'.format(stop.address,
+                                                          stop.pc)
+        self.__window.setStatusBar(status)
+
+    def __askDebugText(self, title, label):
+        '''Display a text input dialog and return the text entered, or None
+        if the dialog was cancelled.'''
+        self.__pauseEmulator()
+        text, accepted = QtWidgets.QInputDialog.getText(self.__window,
+                                                        title, label)
+        if not self.__pauseLock:
+            self.__pauseEmulator(False)
+        return text if accepted else None
+
+    def __eventAddBreakpoint(self):
+        '''Ask for the address of a breakpoint and its optional register
+        condition and add it to the debugger.'''
+        text = self.__askDebugText('Add Breakpoint',
+                                   'Address, optionally with a register '
+                                   'condition (2a4 or 2a4 v3=0f):')
+        if text:
+            try:
+                self.__debugger.addBreakpoint(*parseBreakpoint(text))
+            except ValueError as error:
+                QtWidgets.QMessageBox.warning(self.__window,
+                                              'Add Breakpoint',
+                                              str(error))
+
+    def __eventAddWatchpoint(self):
+        '''Ask for the addresses of a watchpoint and add it to the
+        debugger.'''
+        text = self.__askDebugText('Add Watchpoint',
+                                   'Address or range of addresses written '
+                                   'to (300 or 300-30f):')
+        if text:
+            try:
+                self.__debugger.addWatchpoint(*parseWatchpoint(text))
+            except ValueError as error:
+                QtWidgets.QMessageBox.warning(self.__window,
+                                              'Add Watchpoint',
+                                              str(error))
+
+    def __eventContinue(self):
+        '''Resume the CHIP-8 system after it stopped or was paused.'''
+        if self.__isRunning and self.__isPaused:
+            self.__pauseLock = False
+            self.__pauseEmulator(False)
+            self.__window.setCheckedMenuItem('Pause', False)
+
+    def __eventStep(self):
+        '''Execute one instruction of the CHIP-8 system, pausing it first.'''
+        if self.__isRunning:
+            self.__debugger.step()
+            self.__updateFrame()
+            self.__showBreak()
+
+    def __eventStepOver(self):
+        '''Execute one instruction of the CHIP-8 system, or a whole
+        subroutine call, pausing it first.'''
+        if self.__isRunning:
+            self.__debugger.stepOver()
+            self.__updateFrame()
+            self.__showBreak()
+
+    def __eventRewind(self):
+        '''Start rewinding the CHIP-8 system through the snapshots of the
+        previous frames if it is running forward, otherwise stop rewinding.'''
+        self.__setRewinding(not self.__isRewinding)
+
     def __eventPauseResume(self):
         '''Pause the CHIP-8 system if it is current running, otherwise resume
         the state of the CHIP-8 system if it is paused.'''
@@ -315,6 +565,8 @@ class InterpreterApp(QtWidgets.QApplication):
         '''Reset the current state of the emulator by clearing all the pixels
         in Frame and restoring the CHIP-8 system to it's initial state.'''
         if self.__isRunning:
+            self.__setRewinding(False)
+            self.__rewind.clear()
             self.__gridFrame.clearPixels()
             self.__chip8.reset()
             self.__window.setStatusBar(self.__defaultStatus)
@@ -356,6 +608,7 @@ class InterpreterApp(QtWidgets.QApplication):
         try:
             if fname:
                 self.__chip8.loadROM(fname)
+                self.__rewind.clear()
                 self.__window.setStatusBar(self.__runStatus)
                 self.__isRunning = True
         except (Exception) as error:
@@ -0,0 +1,95 @@
+'''Micro-benchmarks of the opcode families and macro-benchmarks of whole
+programs run headless, with both execution engines, and benchmarks of the
+block compiler of the recompiler engine.'''
+import os
+import time
+from chip8.chip8 import Chip8
+from chip8.compiler import BlockCompiler
+from chip8.disassembler import analyze
+from chip8.headless import runROM
+from .roms import MACRO_ROMS, MICRO_ROMS
+
+ENGINES = ['interpreter', 'recompiler']
+# Cycles run before timing a micro-benchmark, enough for the loops of the
+# micro ROMs to be decoded and compiled
+WARMUP_CYCLES = 1000
+
+
+def microBenchmark(filename, engine, cycles):
+    '''Return a function that emulates cycles of a ROM with Chip8.run, from
+    a fresh system with a fixed seed, and returns the number of cycles and
+    the seconds they took. The system first runs WARMUP_CYCLES untimed, so
+    that the time spent decoding and compiling is left out of the steady
+    state throughput.'''
+    def sample():
+        chip8 = Chip8(engine=engine, ips=1000000, seed=1)
+        chip8.loadROM(filename)
+        while chip8.getCycles() < WARMUP_CYCLES:
+            chip8.run(WARMUP_CYCLES - chip8.getCycles())
+        end = WARMUP_CYCLES + cycles
+        start = time.perf_counter()
+        while chip8.getCycles() < end:
+            chip8.run(end - chip8.getCycles())
+        return chip8.getCycles() - WARMUP_CYCLES, time.perf_counter() - start
+    return sample
+
+
+def macroBenchmark(filename, engine, cycles):
+    '''Return a function that runs a ROM headless for cycles at the default
+    speed, frame by frame, and returns the number of cycles and the seconds
+    they took.'''
+    def sample():
+        result = runROM(filename, cycles=cycles, engine=engine, seed=1)
+        return result['cycles'], result['seconds']
+    return sample
+
+
+def compileBenchmark(rom, passes):
+    '''Return a function that compiles the basic blocks of a ROM found by
+    its static analysis, passes times with a new BlockCompiler each, and
+    returns the number of instructions compiled and the seconds it took, or
+    None if the ROM has no block the compiler accepts.'''
+    ram = bytearray(4096)
+    ram[0x200:0x200 + len(rom)] = rom
+    compiler = BlockCompiler()
+    addresses = []
+    instructions = 0
+    for address in sorted(analyze(ram).getBlocks()):
+        block = compiler.compile(ram, address)
+        if block is not None:
+            addresses.append(address)
+            instructions += block[1]
+    if not addresses:
+        return None
+
+    def sample():
+        start = time.perf_counter()
+        for _ in range(passes):
+            compiler = BlockCompiler()
+            for address in addresses:
+                compiler.compile(ram, address)
+        return passes * instructions, time.perf_counter() - start
+    return sample
+
+
+def getBenchmarks(directory, scale=1.0):
+    '''Write the benchmark ROMs to directory and return the micro, macro and
+    compile benchmarks as a dictionary of the unit and sample function of
+    each benchmark by name. The scale multiplies the work of each sample.'''
+    benchmarks = {}
+    for group, roms, benchmark, cycles in (
+            ('micro', MICRO_ROMS, microBenchmark, 20000),
+            ('macro', MACRO_ROMS, macroBenchmark, 50000)):
+        cycles = max(int(cycles * scale), 1)
+        for name, rom in roms.items():
+            filename = os.path.join(directory, '{}.ch8'.format(name))
+            with open(filename, 'wb') as fileBuffer:
+                fileBuffer.write(rom)
+            for engine in ENGINES:
+                benchmarks['{}.{}.{}'.format(group, name, engine)] = (
+                    'IPS', benchmark(filename, engine, cycles))
+            sample = compileBenchmark(rom, max(int(50 * scale), 1))
+            if sample is not None:
+                benchmarks['compile.{}'.format(name)] = ('instructions/s',
+                                                         sample)
+    return benchmarks
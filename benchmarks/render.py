@@ -0,0 +1,79 @@
+'''Benchmarks of Frame.paintEvent, painting offscreen into a pixmap. They are
+skipped if PyQt5 is not installed.'''
+import os
+import time
+from chip8.chip8 import Chip8
+from .roms import MACRO_ROMS
+
+try:
+    from PyQt5 import QtCore, QtGui, QtWidgets
+except ImportError:
+    QtWidgets = None
+
+# The QApplication, kept alive for as long as the frames painted with it
+application = None
+
+
+def getApplication():
+    '''Return the QApplication, creating one that renders offscreen unless a
+    platform is already chosen.'''
+    global application
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    application = QtWidgets.QApplication.instance() or \
+        QtWidgets.QApplication([])
+    return application
+
+
+def getMazeGFX(directory):
+    '''Return the graphics buffer of the maze ROM packed into bytes after it
+    filled the screen.'''
+    filename = os.path.join(directory, 'render.ch8')
+    with open(filename, 'wb') as fileBuffer:
+        fileBuffer.write(MACRO_ROMS['maze'])
+    chip8 = Chip8(ips=1000000, seed=1)
+    chip8.loadROM(filename)
+    while chip8.getCycles() < 5000:
+        chip8.run(5000 - chip8.getCycles())
+    return chip8.getGFXBytes()
+
+
+def paintBenchmark(frame, data, rows, paints):
+    '''Return a function that updates the frame with the packed rows of data
+    and paints the rows of the frame, or all of it if rows is None, into a
+    pixmap paints times, and returns the number of paints and the seconds
+    they took.'''
+    pixmap = QtGui.QPixmap(frame.size())
+    if rows is None:
+        region = QtGui.QRegion(frame.rect())
+    else:
+        region = QtGui.QRegion(0, rows[0] * 10, frame.width(),
+                               len(rows) * 10)
+
+    def sample():
+        start = time.perf_counter()
+        for _ in range(paints):
+            frame.updateRows(data, rows)
+            frame.render(pixmap, QtCore.QPoint(), region)
+        return paints, time.perf_counter() - start
+    return sample
+
+
+def getBenchmarks(directory, scale=1.0):
+    '''Return the paint benchmarks as a dictionary of the unit and sample
+    function of each benchmark by name, or no benchmarks without PyQt5. The
+    scale multiplies the paints of each sample.'''
+    if QtWidgets is None:
+        return {}
+    from frame import Frame
+    getApplication()
+    frame = Frame(None, 64, 32, 10, (0, 0, 0), (255, 255, 255))
+    frame.resize(640, 320)
+    data = getMazeGFX(directory)
+    paints = max(int(20 * scale), 1)
+    return {
+        'render.full': ('paints/s',
+                        paintBenchmark(frame, data, None, paints)),
+        'render.rows': ('paints/s',
+                        paintBenchmark(frame, data, [8, 9, 10, 11],
+                                       paints * 4))
+    }
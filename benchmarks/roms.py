@@ -0,0 +1,90 @@
+'''Generated ROMs for the benchmarks. The micro-benchmark ROMs repeat one
+opcode family in a loop and the macro-benchmark ROMs are small programs in
+the style of public domain CHIP-8 games and demos. Every ROM runs forever
+without waiting for a key press, so it can be emulated for any number of
+cycles.'''
+
+
+def assemble(program):
+    '''Return the bytes of a program given as a dictionary of lists of 16-bit
+    words by address, starting at 0x200. Gaps are filled with zeros.'''
+    rom = bytearray()
+    for address, words in sorted(program.items()):
+        rom.extend(bytes(address - 0x200 - len(rom)))
+        rom.extend(b''.join(word.to_bytes(2, 'big') for word in words))
+    return bytes(rom)
+
+
+def loop(body, setup=(), data=None):
+    '''Return a ROM that runs setup once and then body forever, with the
+    optional data words stored at 0x300.'''
+    words = list(setup) + list(body)
+    words.append(0x1200 | 2 * len(setup))
+    program = {0x200: words}
+    if data is not None:
+        program[0x300] = data
+    return assemble(program)
+
+
+# Micro-benchmarks, one loop per opcode family
+MICRO_ROMS = {
+    # ALU with registers: 8XY1 to 8XYE
+    'alu': loop([0x8014, 0x8125, 0x8231, 0x8342, 0x8453, 0x8506, 0x860E,
+                 0x8707], setup=[0x6001, 0x6102, 0x6203]),
+    # Immediate loads and adds: 6XNN and 7XNN
+    'immediate': loop([0x6012, 0x7101, 0x6234, 0x7301, 0x6456, 0x7501,
+                       0x6678, 0x7701]),
+    # Skips over jumps: 3XNN, 4XNN, 5XY0 and 9XY0
+    'skip': loop([0x3001, 0x4001, 0x5010, 0x9010, 0x3000, 0x4000, 0x5120,
+                  0x9120], setup=[0x6001]),
+    # Jumps to the next instruction: 1NNN
+    'jump': assemble({0x200: [0x1202, 0x1204, 0x1206, 0x1208, 0x120A,
+                              0x120C, 0x120E, 0x1200]}),
+    # Subroutine calls and returns: 2NNN and 00EE
+    'call': assemble({0x200: [0x2208, 0x2208, 0x2208, 0x1200,
+                              0x220C, 0x00EE, 0x00EE]}),
+    # Register stores and loads: FX55 and FX65
+    'memory': loop([0xF755, 0xF765, 0xFF55, 0xFF65], setup=[0xA300]),
+    # Binary-coded decimal stores: FX33
+    'bcd': loop([0x7001, 0xF033], setup=[0xA300]),
+    # Random numbers: CXNN
+    'random': loop([0xC0FF, 0xC10F, 0xC2F0, 0xC301]),
+    # Timers: FX15, FX18 and FX07 without polling
+    'timer': loop([0xF015, 0xF107, 0xF018, 0xF207], setup=[0x6000]),
+}
+
+# Sprite drawing at each benchmarked height: DXYN
+for _height in (1, 5, 15):
+    MICRO_ROMS['draw{}'.format(_height)] = loop(
+        [0xD010 | _height, 0x7003, 0x7105, 0xD230 | _height, 0x7207,
+         0x7302], setup=[0xA300], data=[0xFF81] * 8)
+
+
+# Macro-benchmarks, small programs that exercise several families
+MACRO_ROMS = {
+    # The classic random maze, redrawn over itself forever
+    'maze': assemble({0x200: [0xA21E, 0xC201, 0x3201, 0xA21A, 0xD014,
+                              0x7004, 0x3040, 0x1200, 0x6000, 0x7104,
+                              0x3120, 0x1200, 0x1200, 0x8040, 0x2010,
+                              0x2040, 0x8010]}),
+    # A score counter, drawn as three digits with FX33, FX65 and FX29
+    'counter': assemble({0x200: [0xA300, 0x00E0, 0x7401, 0xF433, 0xF265,
+                                 0x6A10, 0x6B0C, 0xF029, 0xDAB5, 0x7A05,
+                                 0xF129, 0xDAB5, 0x7A05, 0xF229, 0xDAB5,
+                                 0x1200]}),
+    # Particles at random positions that bounce off the screen edges
+    'particles': assemble({0x200: [0xA300, 0xC03F, 0xC11F, 0x6201, 0x6301,
+                                   0xD011, 0xD011, 0x8024, 0x8134, 0xD011,
+                                   0x4000, 0x6201, 0x403F, 0x62FF, 0x4100,
+                                   0x6301, 0x411F, 0x63FF, 0x120C],
+                           0x300: [0x8000]}),
+    # Bubble sort of 16 random bytes with a compare and swap subroutine,
+    # FX55, FX65 and 8XY5
+    'sort': assemble({0x200: [0x6E00, 0xA300, 0xFE1E, 0xC0FF, 0xF055,
+                              0x7E01, 0x3E10, 0x1202, 0x6D00, 0x6C00,
+                              0x2224, 0x7C01, 0x3C0F, 0x1214, 0x7D01,
+                              0x3D0F, 0x1212, 0x1200],
+                      0x224: [0xA300, 0xFC1E, 0xF165, 0x8210, 0x8205,
+                              0x3F00, 0x00EE, 0x8200, 0x8010, 0x8120,
+                              0xF155, 0x00EE]}),
+}
@@ -0,0 +1,147 @@
+'''Run the benchmark suite, write the results as JSON and compare them with
+a stored baseline.'''
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import sys
+import tempfile
+from . import core, render
+
+# Baseline the results are compared with by default
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def runBenchmarks(benchmarks, repeat=5, onResult=None):
+    '''Run every sample function of the benchmarks repeat times and return
+    a dictionary of results by name. The value of a result is the best rate
+    of its samples, in work units per second. onResult is called with the
+    name and result of each benchmark once it has run.'''
+    results = {}
+    for name, (unit, sample) in sorted(benchmarks.items()):
+        rates = []
+        for _ in range(repeat):
+            work, seconds = sample()
+            rates.append(work / seconds if seconds else 0.0)
+        results[name] = {'unit': unit, 'value': max(rates), 'samples': rates}
+        if onResult is not None:
+            onResult(name, results[name])
+    return results
+
+
+def compareResults(results, baseline, tolerance=0.1):
+    '''Compare results with baseline results and return a dictionary of the
+    comparison of each benchmark by name. The status is 'slower' or
+    'faster' if the value changed by more than the tolerance, a fraction of
+    the baseline value, 'ok' otherwise and 'new' if the benchmark is not in
+    the baseline.'''
+    comparison = {}
+    for name, result in sorted(results.items()):
+        entry = {'value': result['value'], 'baseline': None, 'ratio': None,
+                 'status': 'new'}
+        if name in baseline and baseline[name]['value']:
+            ratio = result['value'] / baseline[name]['value']
+            entry.update(baseline=baseline[name]['value'], ratio=ratio)
+            if ratio < 1 - tolerance:
+                entry['status'] = 'slower'
+            elif ratio > 1 + tolerance:
+                entry['status'] = 'faster'
+            else:
+                entry['status'] = 'ok'
+        comparison[name] = entry
+    return comparison
+
+
+def getEnvironment():
+    '''Return a description of the machine the benchmarks ran on.'''
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine()
+    }
+
+
+def readResults(filename):
+    '''Read the results of a JSON report written by writeResults.'''
+    with open(filename) as fileBuffer:
+        return json.load(fileBuffer)['results']
+
+
+def writeResults(results, filename, comparison=None):
+    '''Write results, and their comparison with a baseline if given, to a
+    JSON report.'''
+    report = {'environment': getEnvironment(), 'results': results}
+    if comparison is not None:
+        report['comparison'] = comparison
+    with open(filename, 'w') as fileBuffer:
+        json.dump(report, fileBuffer, indent=2, sort_keys=True)
+
+
+def main(args=None):
+    '''Run the benchmarks from the command line, print their results and
+    exit with status 1 if any is slower than the baseline.'''
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Run the CHIP-8 performance benchmarks.')
+    parser.add_argument('--filter', default='*',
+                        help='only run the benchmarks whose name matches '
+                             'this pattern, such as "micro.*" (default: *)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='samples per benchmark, the best is kept '
+                             '(default: 5)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply the work of each sample (default: 1)')
+    parser.add_argument('--output',
+                        help='write the results to this JSON file')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='compare with the results in this JSON file '
+                             '(default: benchmarks/baseline.json)')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='fraction a result may change by before it is '
+                             'reported slower or faster (default: 0.1)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to the baseline file instead '
+                             'of comparing with it')
+    options = parser.parse_args(args)
+    with tempfile.TemporaryDirectory() as directory:
+        benchmarks = core.getBenchmarks(directory, options.scale)
+        benchmarks.update(render.getBenchmarks(directory, options.scale))
+        benchmarks = {name: benchmark for name, benchmark
+                      in benchmarks.items()
+                      if fnmatch.fnmatch(name, options.filter)}
+        if not benchmarks:
+            parser.error('no benchmarks match {}'.format(options.filter))
+
+        def printResult(name, result):
+            print('{:<32} {:>14.0f} {}'.format(name, result['value'],
+                                               result['unit']))
+            sys.stdout.flush()
+
+        results = runBenchmarks(benchmarks, options.repeat, printResult)
+    if options.save_baseline:
+        writeResults(results, options.baseline)
+        print('Baseline written to {}'.format(options.baseline))
+        return 0
+    comparison = None
+    if os.path.exists(options.baseline):
+        comparison = compareResults(results, readResults(options.baseline),
+                                    options.tolerance)
+        print()
+        print('{:<32} {:>14} {:>14} {:>7}'.format('Benchmark', 'Result',
+                                                  'Baseline', 'Ratio'))
+        for name, entry in comparison.items():
+            if entry['status'] == 'new':
+                print('{:<32} {:>14.0f} {:>14} {:>7}  new'.format(
+                    name, entry['value'], '-', '-'))
+            else:
+                print('{:<32} {:>14.0f} {:>14.0f} {:>7.2f}  {}'.format(
+                    name, entry['value'], entry['baseline'], entry['ratio'],
+                    entry['status']))
+    if options.output:
+        writeResults(results, options.output, comparison)
+    if comparison is not None and any(entry['status'] == 'slower'
+                                      for entry in comparison.values()):
+        return 1
+    return 0
@@ -0,0 +1,3 @@
+from .headless import main
+
+main()
@@ -1,6 +1,27 @@
+import struct
+import zlib
+from array import array
+from .compiler import BlockCompiler
+from .disassembler import analyze
+from .quirks import DEFAULT_PROFILE, PROFILES, Quirks
 from .stack import Stack
-from binascii import hexlify
-from random import randint, seed
+from .trace import NO_REGISTER, RECORD
+from functools import partial
+from random import getrandbits
+
+
+class UnknownOpcodeError(KeyError):
+    '''Raised when the opcode at the program counter is missing from the
+    opcode tables. It holds the address and the opcode.'''
+
+    def __init__(self, pc, opCode):
+        super().__init__(pc, opCode)
+        self.pc = pc
+        self.opCode = opCode
+
+    def __str__(self):
+        return 'Unknown opcode {:#06x} at {:#05x}'.format(self.opCode,
+                                                         self.pc)
 
 
 class Chip8(object):
@@ -8,379 +29,1531 @@ class Chip8(object):
     provides additional functionality for tasks such bas input handling, access
     to the graphics buffer for rendering and dynamic state loading.'''
 
-    def __init__(self):
-        '''Create a new CHIP-8 object.'''
+    # Events that end a call to run or runFrame before its cycle budget
+    EVENT_DRAW = 1          # The graphics buffer was cleared or drawn to
+    EVENT_SOUND = 2         # The sound timer was started
+    EVENT_KEY_WAIT = 4      # Execution is blocked waiting for a key press
+    EVENT_FRAME = 8         # The end of the current frame was reached
+    EVENT_IDLE = 16         # The program idled for the rest of the run
+    EVENT_BREAK = 32        # A breakpoint or watchpoint of the debugger hit
+
+    # The font set, used to draw plaintext characters
+    FONT_SET = bytes([0xF0, 0x90, 0x90, 0x90, 0xF0, 0x20, 0x60, 0x20,
+                      0x20, 0x70, 0xF0, 0x10, 0xF0, 0x80, 0xF0, 0xF0,
+                      0x10, 0xF0, 0x10, 0xF0, 0x90, 0x90, 0xF0, 0x10,
+                      0x10, 0xF0, 0x80, 0xF0, 0x10, 0xF0, 0xF0, 0x80,
+                      0xF0, 0x90, 0xF0, 0xF0, 0x10, 0x20, 0x40, 0x40,
+                      0xF0, 0x90, 0xF0, 0x90, 0xF0, 0xF0, 0x90, 0xF0,
+                      0x10, 0xF0, 0xF0, 0x90, 0xF0, 0x90, 0x90, 0xE0,
+                      0x90, 0xE0, 0x90, 0xE0, 0xF0, 0x80, 0x80, 0x80,
+                      0xF0, 0xE0, 0x90, 0x90, 0x90, 0xE0, 0xF0, 0x80,
+                      0xF0, 0x80, 0xF0, 0xF0, 0x80, 0xF0, 0x80, 0x80])
+    # The large font set of SUPER-CHIP, 8x10 pixel hexadecimal digits stored
+    # in RAM after the font set
+    BIG_FONT_SET = bytes([0xFF, 0xFF, 0xC3, 0xC3, 0xC3, 0xC3, 0xC3, 0xC3,
+                          0xFF, 0xFF, 0x18, 0x78, 0x78, 0x18, 0x18, 0x18,
+                          0x18, 0x18, 0xFF, 0xFF, 0xFF, 0xFF, 0x03, 0x03,
+                          0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF, 0xFF, 0xFF,
+                          0x03, 0x03, 0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF,
+                          0xC3, 0xC3, 0xC3, 0xC3, 0xFF, 0xFF, 0x03, 0x03,
+                          0x03, 0x03, 0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF,
+                          0x03, 0x03, 0xFF, 0xFF, 0xFF, 0xFF, 0xC0, 0xC0,
+                          0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF, 0xFF, 0xFF,
+                          0x03, 0x03, 0x06, 0x0C, 0x18, 0x18, 0x18, 0x18,
+                          0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF, 0xC3, 0xC3,
+                          0xFF, 0xFF, 0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF,
+                          0x03, 0x03, 0xFF, 0xFF, 0x7E, 0xFF, 0xC3, 0xC3,
+                          0xC3, 0xFF, 0xFF, 0xC3, 0xC3, 0xC3, 0xFC, 0xFC,
+                          0xC3, 0xC3, 0xFC, 0xFC, 0xC3, 0xC3, 0xFC, 0xFC,
+                          0x3C, 0xFF, 0xC3, 0xC0, 0xC0, 0xC0, 0xC0, 0xC3,
+                          0xFF, 0x3C, 0xFC, 0xFE, 0xC3, 0xC3, 0xC3, 0xC3,
+                          0xC3, 0xC3, 0xFE, 0xFC, 0xFF, 0xFF, 0xC0, 0xC0,
+                          0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF, 0xFF, 0xFF,
+                          0xC0, 0xC0, 0xFF, 0xFF, 0xC0, 0xC0, 0xC0, 0xC0])
+    BIG_FONT_ADDRESS = len(FONT_SET)
+
+    # Graphics buffer sizes in pixels, in low and SUPER-CHIP high resolution
+    LOW_RESOLUTION = (64, 32)
+    HIGH_RESOLUTION = (128, 64)
+
+    # Binary save states, a header followed by a fixed layout body
+    STATE_MAGIC = b'C8SS'
+    STATE_VERSION = 1
+    # Magic, version and CRC-32 of the body
+    __stateHeader = struct.Struct('<4sHI')
+    # PC, I, stack depth, 16 stack entries, registers, cycles, cycle base,
+    # tick base, instructions per second and the timer expiry ticks
+    __stateRegisters = struct.Struct('<HHB16H16sQQQIqq')
+    # Graphics buffer rows, in the same layout as getGFXBytes, with room for
+    # the 64 rows of high resolution as two words each. The 32 rows of low
+    # resolution are padded
+    __stateGFX = struct.Struct('>32Q')
+    __stateGFXHigh = struct.Struct('>128Q')
+    # Random number generator state
+    __stateRandom = struct.Struct('<I')
+    # High resolution flag and RPL user flags
+    __stateSuper = struct.Struct('<?16s')
+    STATE_SIZE = __stateHeader.size + __stateRegisters.size + 4096 + \
+        __stateGFXHigh.size + __stateRandom.size + __stateSuper.size
+    # Padding of the low resolution rows
+    __stateGFXPadding = bytes(__stateGFXHigh.size - __stateGFX.size)
+
+    # Exceptions, shared by every instance
+    __romSizeException = Exception(
+        'The ROM file is too large to fit in memory!')
+    __engineException = Exception(
+        'The specified execution engine does not exist!')
+    __quirksException = Exception(
+        'The specified quirk profile does not exist!')
+    __speedException = Exception(
+        'The speed must be a positive number of instructions!')
+    __stateException = Exception(
+        'The saved state is invalid or corrupted!')
+    __stateVersionException = Exception(
+        'The saved state was written by an unsupported version!')
+    __stackOverflowException = Exception('Cannot push to a full stack!')
+    __emptyStackException = Exception('Cannot pop from empty stack!')
+
+    # Depth of the call stack
+    STACK_SIZE = 16
+
+    # Contents of the RAM, graphics buffer and registers after a reset
+    __blankRAM = FONT_SET + BIG_FONT_SET + \
+        bytes(4096 - len(FONT_SET) - len(BIG_FONT_SET))
+    __blankGFX = (0,) * 32
+    # Mask of the right half of a high resolution row
+    __wordMask = (1 << 64) - 1
+    __blankRegisters = (0,) * 16
+
+    # Instances only hold the attributes below, without a __dict__
+    __slots__ = ('__pc', '__I', '__timers', '__cycles', '__runEnd', '__ips',
+                 '__cycleBase', '__tickBase', '__event', '__seed', '__rng',
+                 '__gfx', '__gfxWidth', '__gfxHeight', '__gfxVersion',
+                 '__dirtyRows', '__key', '__stk', '__sp', '__ram', '__V',
+                 '__cache', '__blocks', '__compiler', '__compiling',
+                 '__profiler', '__tracer', '__analysis', '__codeMap',
+                 '__writeMap', '__flags', '__quirks', '__handlers',
+                 '__subHandlers', '__debugger', '__breakCycle',
+                 '__frameBuffers', '__frameViews', '__frontBuffer',
+                 '__frameVersion')
+
+    def __init__(self, engine='interpreter', ips=600, seed=None,
+                 quirks=DEFAULT_PROFILE):
+        '''Create a new CHIP-8 object. The engine is either 'interpreter' to
+        decode and execute one instruction at a time, or 'recompiler' to also
+        compile basic blocks into Python functions for emulateBlock. The speed
+        is the number of instructions emulated per second of emulated time,
+        the delay and sound timers always count down at 60 Hz. The seed of the
+        random number generator used by CXNN is applied on every reset, a new
+        random seed is chosen on every reset if it is None. The quirks are
+        selected as by setQuirks. The system starts out reset.'''
         self.__pc = 0               # Program counter
         self.__I = 0                # Address register
-        self.__opCode = 0           # Operation code (string)
-        self.__timers = [0, 0]      # Timers [delay, sound]
-        self.__gfx = [[]]           # 2D graphics buffer
-        self.__key = []             # I/O key list
-        self.__stk = Stack()        # Main stack
-        self.__ram = []             # Main memory
-        self.__V = []               # Registers
-        # The font set, used to draw plaintext characters
-        self.__fontSet = ['F0', '90', '90', '90', 'F0', '20', '60', '20', '20',
-                          '70', 'F0', '10', 'F0', '80', 'F0', 'F0', '10', 'F0',
-                          '10', 'F0', '90', '90', 'F0', '10', '10', 'F0', '80',
-                          'F0', '10', 'F0', 'F0', '80', 'F0', '90', 'F0', 'F0',
-                          '10', '20', '40', '40', 'F0', '90', 'F0', '90', 'F0',
-                          'F0', '90', 'F0', '10', 'F0', 'F0', '90', 'F0', '90',
-                          '90', 'E0', '90', 'E0', '90', 'E0', 'F0', '80', '80',
-                          '80', 'F0', 'E0', '90', '90', '90', 'E0', 'F0', '80',
-                          'F0', '80', 'F0', 'F0', '80', 'F0', '80', '80']
-        # Opcode instruction jump tables
-        self.__opCodeTable = {'0': self.__jump0NNN, '1': self.__inst1NNN,
-                              '2': self.__inst2NNN, '3': self.__inst3XNN,
-                              '4': self.__inst4XNN, '5': self.__inst5XY0,
-                              '6': self.__inst6XNN, '7': self.__inst7XNN,
-                              '8': self.__jump8NNN, '9': self.__inst9XY0,
-                              'a': self.__instANNN, 'b': self.__instBNNN,
-                              'c': self.__instCXNN, 'd': self.__instDXYN,
-                              'e': self.__jumpENNN, 'f': self.__jumpFNNN}
-        self.__table0NNN = {'e0': self.__inst00E0, 'ee': self.__inst00EE}
-        self.__table8NNN = {'0': self.__inst8XY0, '1': self.__inst8XY1,
-                            '2': self.__inst8XY2, '3': self.__inst8XY3,
-                            '4': self.__inst8XY4, '5': self.__inst8XY5,
-                            '6': self.__inst8XY6, '7': self.__inst8XY7,
-                            'e': self.__inst8XYE}
-        self.__tableENNN = {'9e': self.__instEX9E, 'a1': self.__instEXA1}
-        self.__tableFNNN = {'07': self.__instFX07, '0a': self.__instFX0A,
-                            '15': self.__instFX15, '18': self.__instFX18,
-                            '1e': self.__instFX1E,
-                            '29': self.__instFX29, '33': self.__instFX33,
-                            '55': self.__instFX55, '65': self.__instFX65}
-
-    def reset(self):
+        self.__timers = [0, 0]      # Timer expiry ticks [delay, sound]
+        self.__cycles = 0           # Number of cycles emulated
+        self.__runEnd = 0           # Cycle count at the end of the run
+        self.__ips = 600            # Instructions per second
+        self.__cycleBase = 0        # Cycle count when the speed was set
+        self.__tickBase = 0         # Timer tick when the speed was set
+        self.__event = 0            # Events raised by the last instruction
+        self.__seed = seed          # Random number generator seed
+        self.__rng = 0              # Random number generator state
+        self.__gfxWidth = 64        # Graphics buffer width in pixels
+        self.__gfxHeight = 32       # Graphics buffer height in pixels
+        self.__gfx = [0] * 32       # Graphics buffer, one bitmask per row
+        self.__gfxVersion = 0       # Number of changes to the graphics buffer
+        self.__dirtyRows = 0        # Bitmask of rows changed since last pop
+        # Front and back framebuffers of publishFrame, packed like
+        # getGFXBytes, with read-only views of each at both resolutions
+        self.__frameBuffers = (bytearray(self.__stateGFXHigh.size),
+                               bytearray(self.__stateGFXHigh.size))
+        self.__frameViews = tuple(
+            {self.LOW_RESOLUTION[0]:
+             memoryview(buffer)[:self.__stateGFX.size].toreadonly(),
+             self.HIGH_RESOLUTION[0]: memoryview(buffer).toreadonly()}
+            for buffer in self.__frameBuffers)
+        self.__frontBuffer = 0      # Index of the published framebuffer
+        self.__frameVersion = -1    # Graphics version it was published at
+        self.__key = bytearray(16)  # I/O key states
+        self.__stk = array('H', bytes(2 * self.STACK_SIZE))  # Main stack
+        self.__sp = 0               # Stack pointer
+        self.__ram = bytearray(4096)  # Main memory
+        self.__V = [0] * 16         # Registers, always 0 to 255
+        self.__flags = bytearray(16)  # RPL user flags, kept across resets
+        self.__cache = {}           # Decoded instructions by address
+        self.__blocks = {}          # Compiled basic blocks by address
+        self.__profiler = None      # Profiler instrumenting decoding
+        self.__tracer = None        # TraceBuffer instrumenting decoding
+        self.__debugger = None      # Debugger instrumenting decoding
+        self.__breakCycle = -1      # Cycle of the last breakpoint hit
+        self.__analysis = None      # Analysis of the loaded ROM
+        self.__codeMap = None       # Code flags if the analysis is sound
+        self.__writeMap = None      # Flags of the addresses the ROM writes
+        self.__quirks = None        # Quirks emulated
+        self.__handlers = None      # Opcode table specialized for the quirks
+        self.__subHandlers = None   # Opcode sub tables, likewise
+        # Block compiler, only used by the recompiler engine
+        if engine == 'recompiler':
+            self.__compiler = BlockCompiler()
+        elif engine == 'interpreter':
+            self.__compiler = None
+        else:
+            raise self.__engineException
+        # Whether compiled blocks are run, which instrumentation prevents
+        self.__compiling = self.__compiler is not None
+        self.setQuirks(quirks)
+        self.setSpeed(ips)
+        self.reset()
+
+    def reset(self, seed=None):
         '''Reset the CHIP-8 system to it's original state. Clear all registers,
         graphics buffers, key mappings, timers, RAM buffer, stack and program
-        counter. Load the default fontset.'''
+        counter. Load the default fontset. Seed the random number generator
+        with the specified seed, which is then used by later resets, or with
+        the seed given at construction.'''
+        if seed is not None:
+            self.__seed = seed
+        self.__rng = self.__seedState(
+            self.__seed if self.__seed is not None else getrandbits(32))
         self.__pc = 512
         self.__I = 0
-        self.__opCode = 0
-        self.__timers = [0, 0]
-        self.__gfx = [[0 for x in range(32)] for y in range(64)]
-        self.__key = [0 for x in range(16)]
-        self.__V = [0 for x in range(16)]
-        self.__stk.clear()
-        self.__ram = ['00' for x in range(4096)]
+        self.__timers[:] = (0, 0)
+        self.__cycles = 0
+        self.__cycleBase = 0
+        self.__tickBase = 0
+        self.__event = 0
+        self.__breakCycle = -1
+        # Clear the buffers in place, back in low resolution
+        self.__setResolution(False)
+        self.__key[:] = bytes(16)
+        self.__V[:] = self.__blankRegisters
+        self.__sp = 0
         # Load default fontset into memory
-        for i in range(80):
-            self.__ram[i] = self.__fontSet[i]
+        self.__ram[:] = self.__blankRAM
+        self.__cache.clear()
+        self.__blocks.clear()
+        self.__setAnalysis(None)
 
     def setKeyState(self, key, state):
         '''Set the state of a key.'''
-        # Check if key list has been initialized
-        if self.__key:
-            self.__key[key] = state
+        self.__key[key] = 1 if state else 0
+
+    def setSpeed(self, ips):
+        '''Set the number of instructions emulated per second of emulated
+        time. The timers keep their current values.'''
+        if ips <= 0:
+            raise self.__speedException
+        self.__tickBase = self.__tickAt(self.__cycles)
+        self.__cycleBase = self.__cycles
+        self.__ips = ips
+
+    def setProfiler(self, profiler):
+        '''Attach a Profiler that records every instruction executed from now
+        on, or detach it if profiler is None. Instructions are interpreted one
+        at a time while a profiler is attached, even with the recompiler
+        engine.'''
+        self.__profiler = profiler
+        self.__instrumentationChanged()
+
+    def getProfiler(self):
+        '''Return the attached Profiler, or None if there is none.'''
+        return self.__profiler
+
+    def setTracer(self, tracer):
+        '''Attach a TraceBuffer that records every instruction executed from
+        now on, or detach it if tracer is None. The recompiler engine compiles
+        blocks again that record their instructions themselves.'''
+        self.__tracer = tracer
+        self.__blocks.clear()
+        self.__instrumentationChanged()
+
+    def getTracer(self):
+        '''Return the attached TraceBuffer, or None if there is none.'''
+        return self.__tracer
+
+    def setDebugger(self, debugger):
+        '''Attach a Debugger whose breakpoints and watchpoints are checked
+        from now on, or detach it if debugger is None. A Debugger attaches
+        itself while it has any and detaches itself otherwise. Only the
+        instructions at breakpoints and those that FX33 and FX55 watchpoints
+        concern are instrumented, and compiled blocks never span a
+        breakpoint.'''
+        self.__debugger = debugger
+        self.__blocks.clear()
+        self.__instrumentationChanged()
+
+    def getDebugger(self):
+        '''Return the attached Debugger, or None if there is none.'''
+        return self.__debugger
+
+    def __instrumentationChanged(self):
+        '''Decode the instructions again with or without instrumentation and
+        only run compiled blocks without a profiler.'''
+        self.__cache.clear()
+        self.__compiling = self.__compiler is not None and \
+            self.__profiler is None
+
+    def setQuirks(self, quirks):
+        '''Select the quirks emulated, either Quirks or the name of one of
+        the PROFILES such as 'vip' or 'schip'. The opcode tables and the
+        block compiler are specialized for the quirks, so that instructions
+        never check them as they execute. Decoded instructions and compiled
+        blocks are discarded, as is the analysis of the ROM if the quirks
+        change, load the ROM with its quirks to keep it.'''
+        if not isinstance(quirks, Quirks):
+            if quirks not in PROFILES:
+                raise self.__quirksException
+            quirks = PROFILES[quirks]
+        if quirks != self.__quirks:
+            self.__setAnalysis(None)
+        self.__quirks = quirks
+        self.__handlers, self.__subHandlers = self.__getTables(quirks)
+        if self.__compiler is not None:
+            self.__compiler = BlockCompiler(quirks=quirks)
+        self.__cache.clear()
+        self.__blocks.clear()
+
+    def getQuirks(self):
+        '''Return the Quirks emulated.'''
+        return self.__quirks
+
+    @classmethod
+    def __getTables(cls, quirks):
+        '''Return the opcode table and sub tables specialized for the quirks,
+        built from the handlers of the quirks that differ from the shared
+        tables. They are built once for all instances with the same quirks.'''
+        tables = cls.__quirkTables.get(quirks)
+        if tables is not None:
+            return tables
+        handlers = dict(cls.__opCodeTable)
+        subHandlers = {nibble: (dict(table), mask)
+                       for nibble, (table, mask) in cls.__subTables.items()}
+        for (quirk, setting), replacements in cls.__quirkHandlers.items():
+            if getattr(quirks, quirk) == setting:
+                for (nibble, key), entry in replacements.items():
+                    if key is None:
+                        handlers[nibble] = entry
+                    else:
+                        subHandlers[nibble][0][key] = entry
+        if not quirks.superchip:
+            for nibble, keys in cls.__superChipKeys.items():
+                for key in keys:
+                    del subHandlers[nibble][0][key]
+            # DXY0 draws a sprite of no rows
+            table = subHandlers[0xD][0]
+            table[0x0] = table[0x1]
+        if quirks.vblank:
+            table = subHandlers[0xD][0]
+            for key, (handler, operands) in table.items():
+                table[key] = (cls.__waitingDraw(handler), operands)
+        tables = cls.__quirkTables[quirks] = (handlers, subHandlers)
+        return tables
+
+    @staticmethod
+    def __waitingDraw(draw):
+        '''Return a variant of a draw handler that waits for the display
+        interrupt after drawing (vblank quirk), named after the same opcode
+        family.'''
+        def handler(self, *operands):
+            draw(self, *operands)
+            self.__waitVBlank()
+        handler.__name__ = draw.__name__
+        return handler
+
+    def getSeed(self):
+        '''Return the seed applied to the random number generator on reset, or
+        None if a new random seed is chosen on every reset.'''
+        return self.__seed
+
+    def getSpeed(self):
+        '''Return the number of instructions emulated per second.'''
+        return self.__ips
+
+    def getPC(self):
+        '''Return the program counter.'''
+        return self.__pc
+
+    def getOpCode(self):
+        '''Return the opcode at the program counter.'''
+        return (self.__ram[self.__pc] << 8) | self.__ram[self.__pc + 1]
+
+    def getStackDepth(self):
+        '''Return the number of return addresses on the stack.'''
+        return self.__sp
 
     def getSoundTimer(self):
         '''Return the value of the sound timer.'''
-        return self.__timers[1]
+        return max(self.__timers[1] - self.__tickAt(self.__cycles), 0)
 
     def getGFX(self):
-        '''Return the graphics buffer.'''
-        # Check if the graphics buffer has been initialized
-        if self.__gfx:
-            return self.__gfx
+        '''Return a copy of the graphics buffer as a 2D list of pixels indexed
+        by column and then row.'''
+        return self.__unpackGFX()
+
+    def getGFXBytes(self):
+        '''Return the graphics buffer packed into bytes, one bit per pixel and
+        row by row, with the leftmost pixel of a row in the most significant
+        bit of its first byte.'''
+        rowBytes = self.__gfxWidth // 8
+        return b''.join(row.to_bytes(rowBytes, 'big') for row in self.__gfx)
+
+    def getGFXVersion(self):
+        '''Return a number that changes whenever the graphics buffer changes,
+        frontends can compare it to skip rendering unchanged frames.'''
+        return self.__gfxVersion
+
+    def popDirtyRows(self):
+        '''Return the rows of the graphics buffer that changed since the
+        previous call, in ascending order, and mark all rows as clean.'''
+        dirty = self.__dirtyRows
+        self.__dirtyRows = 0
+        return [row for row in range(self.__gfxHeight) if dirty >> row & 1]
+
+    def publishFrame(self):
+        '''Publish the graphics buffer as a completed frame for a frontend to
+        draw. The buffer is packed like getGFXBytes into the back one of two
+        framebuffers, which then becomes the front one, unless it did not
+        change since the previous call. Return a read-only memoryview of the
+        front framebuffer and the rows that changed since the previous call,
+        marking all rows as clean like popDirtyRows. The view is never
+        written until the call after next, so a frontend can keep it and read
+        it when painting without copying it, and never sees a frame that is
+        partly drawn.'''
+        if self.__frameVersion != self.__gfxVersion:
+            self.__frameVersion = self.__gfxVersion
+            self.__frontBuffer ^= 1
+            buffer = self.__frameBuffers[self.__frontBuffer]
+            if self.__gfxWidth == self.HIGH_RESOLUTION[0]:
+                # Rows of 128 pixels are faster to convert whole than to
+                # split into two words for the struct
+                buffer[:] = b''.join([row.to_bytes(16, 'big')
+                                      for row in self.__gfx])
+            else:
+                self.__stateGFX.pack_into(buffer, 0, *self.__gfx)
+        return (self.__frameViews[self.__frontBuffer][self.__gfxWidth],
+                self.popDirtyRows())
+
+    def getResolution(self):
+        '''Return the width and height of the graphics buffer in pixels,
+        LOW_RESOLUTION or the SUPER-CHIP HIGH_RESOLUTION.'''
+        return (self.__gfxWidth, self.__gfxHeight)
+
+    def __setResolution(self, high):
+        '''Switch the graphics buffer to high or low resolution and clear it
+        in place.'''
+        self.__gfxWidth, self.__gfxHeight = \
+            self.HIGH_RESOLUTION if high else self.LOW_RESOLUTION
+        self.__gfx[:] = self.__blankGFX * (2 if high else 1)
+        self.__markAllRowsDirty()
+
+    def __markAllRowsDirty(self):
+        '''Mark every row of the graphics buffer as changed.'''
+        self.__gfxVersion += 1
+        self.__dirtyRows = (1 << self.__gfxHeight) - 1
+
+    def __unpackGFX(self):
+        '''Unpack the row bitmasks of the graphics buffer into a 2D list of
+        pixels indexed by column and then row. The most significant bit of a
+        row is its leftmost pixel.'''
+        width = self.__gfxWidth
+        return [[(row >> (width - 1 - x)) & 1 for row in self.__gfx]
+                for x in range(width)]
 
     def getState(self):
-        '''Return the state of the system.'''
+        '''Return the state of the system. RAM is returned as a list of two
+        character hex strings for compatibility with older saved states.'''
         stateData = {
             'PRC': self.__pc,
             'ADR': self.__I,
-            'OPC': self.__opCode,
-            'TIM': self.__timers,
-            'GFX': self.__gfx,
-            'KEY': self.__key,
-            'REG': self.__V,
-            'STK': self.__stk,
-            'RAM': self.__ram
+            'OPC': (self.__ram[self.__pc] << 8) | self.__ram[self.__pc + 1],
+            'TIM': [max(timer - self.__tickAt(self.__cycles), 0)
+                    for timer in self.__timers],
+            'GFX': self.__unpackGFX(),
+            'KEY': list(self.__key),
+            'REG': list(self.__V),
+            'STK': self.__getStack(),
+            'RAM': ['{:02x}'.format(byte) for byte in self.__ram]
         }
         return stateData
 
     def setState(self, stateData):
-        '''Set the state of the system.'''
+        '''Set the state of the system. RAM may be given either as bytes or as
+        a list of two character hex strings (older saved states).'''
+        self.__breakCycle = -1
         self.__pc = stateData['PRC']
         self.__I = stateData['ADR']
-        self.__opCode = stateData['OPC']
-        self.__timers = stateData['TIM']
-        self.__gfx = stateData['GFX']
-        self.__key = stateData['KEY']
-        self.__V = stateData['REG']
-        self.__stk = stateData['STK']
-        self.__ram = stateData['RAM']
-
-    def loadROM(self, filename):
-        '''Load a file's binary data into the system's RAM buffer.'''
-        self.reset()
+        self.__timers = [timer + self.__tickAt(self.__cycles)
+                         for timer in stateData['TIM']]
+        # Pack the 2D list of pixels into one bitmask per row, its width
+        # gives the resolution
+        self.__setResolution(
+            len(stateData['GFX']) == self.HIGH_RESOLUTION[0])
+        for x, column in enumerate(stateData['GFX']):
+            for y, pixel in enumerate(column):
+                if pixel:
+                    self.__gfx[y] |= 1 << (self.__gfxWidth - 1 - x)
+        self.__key[:] = bytes(stateData['KEY'])
+        self.__V[:] = bytes(stateData['REG'])
+        # The stack is either a Stack (older saved states) or a list of
+        # return addresses, oldest first
+        stack = stateData['STK']
+        if isinstance(stack, Stack):
+            stack = stack.getItems()
+        self.__setStack(stack)
+        # Convert RAM stored as hex strings by older saved states
+        if isinstance(stateData['RAM'], list):
+            self.__ram[:] = bytes(int(byte, 16) for byte in stateData['RAM'])
+        else:
+            self.__ram[:] = stateData['RAM']
+        # Instructions decoded from the previous RAM are no longer valid,
+        # nor is the analysis of the ROM
+        self.__cache.clear()
+        self.__blocks.clear()
+        self.__setAnalysis(None)
+
+    def __getStack(self):
+        '''Return the return addresses on the stack as a Stack.'''
+        stack = Stack()
+        for address in self.__stk[:self.__sp]:
+            stack.push(address)
+        return stack
+
+    def __setStack(self, addresses):
+        '''Replace the stack with the return addresses, oldest first.'''
+        if len(addresses) > self.STACK_SIZE:
+            raise self.__stackOverflowException
+        self.__stk[:len(addresses)] = array('H', addresses)
+        self.__sp = len(addresses)
+
+    def saveState(self, buffer=None):
+        '''Write a binary snapshot of the system into buffer, a bytearray of
+        STATE_SIZE bytes, or into a new bytearray if no buffer is given, and
+        return it. The snapshot holds the RAM, registers, stack, timers and
+        graphics buffer, resolution and RPL user flags but not the key states,
+        which belong to the host.'''
+        if buffer is None:
+            buffer = bytearray(self.STATE_SIZE)
+        view = memoryview(buffer)
+        offset = self.__stateHeader.size
+        # Entries above the stack pointer are stale but harmless
+        self.__stateRegisters.pack_into(
+            view, offset, self.__pc, self.__I, self.__sp, *self.__stk,
+            bytes(self.__V),
+            self.__cycles, self.__cycleBase, self.__tickBase, self.__ips,
+            *self.__timers)
+        offset += self.__stateRegisters.size
+        view[offset:offset + 4096] = self.__ram
+        offset += 4096
+        high = self.__gfxWidth == self.HIGH_RESOLUTION[0]
+        if high:
+            # Split the rows of 128 pixels into two words
+            mask = self.__wordMask
+            self.__stateGFXHigh.pack_into(
+                view, offset, *[word for row in self.__gfx
+                                for word in (row >> 64, row & mask)])
+        else:
+            self.__stateGFX.pack_into(view, offset, *self.__gfx)
+            view[offset + self.__stateGFX.size:
+                 offset + self.__stateGFXHigh.size] = self.__stateGFXPadding
+        offset += self.__stateGFXHigh.size
+        self.__stateRandom.pack_into(view, offset, self.__rng)
+        offset += self.__stateRandom.size
+        self.__stateSuper.pack_into(view, offset, high, self.__flags)
+        self.__stateHeader.pack_into(
+            view, 0, self.STATE_MAGIC, self.STATE_VERSION,
+            zlib.crc32(view[self.__stateHeader.size:self.STATE_SIZE]))
+        return buffer
+
+    def loadState(self, data):
+        '''Restore the system from a snapshot written by saveState. The
+        snapshot is copied into the existing buffers, decoded instructions
+        are kept if the RAM did not change and only the rows of the graphics
+        buffer that changed are marked dirty. The speed is kept.'''
+        view = memoryview(data)
+        if len(view) < self.__stateHeader.size:
+            raise self.__stateException
+        magic, version, checksum = self.__stateHeader.unpack_from(view)
+        if magic != self.STATE_MAGIC:
+            raise self.__stateException
+        if version != self.STATE_VERSION:
+            raise self.__stateVersionException
+        if len(view) != self.STATE_SIZE:
+            raise self.__stateException
+        if zlib.crc32(view[self.__stateHeader.size:]) != checksum:
+            raise self.__stateException
+        fields = self.__stateRegisters.unpack_from(
+            view, self.__stateHeader.size)
+        if fields[2] > self.STACK_SIZE:
+            raise self.__stateException
+        self.__pc, self.__I, self.__sp = fields[0:3]
+        self.__stk[:] = array('H', fields[3:19])
+        self.__V[:] = fields[19]
+        self.__cycles, self.__cycleBase, self.__tickBase = fields[20:23]
+        ips = self.__ips
+        self.__ips = fields[23]
+        self.__timers[:] = fields[24:26]
+        if ips != self.__ips:
+            self.setSpeed(ips)
+        self.__event = 0
+        self.__breakCycle = -1
+        offset = self.__stateHeader.size + self.__stateRegisters.size
+        ram = view[offset:offset + 4096]
+        if self.__ram != ram:
+            self.__ram[:] = ram
+            # Instructions decoded from the previous RAM are no longer valid,
+            # nor is the analysis of the ROM
+            self.__cache.clear()
+            self.__blocks.clear()
+            self.__setAnalysis(None)
+        offset += 4096
+        high, flags = self.__stateSuper.unpack_from(
+            view, offset + self.__stateGFXHigh.size + self.__stateRandom.size)
+        self.__flags[:] = flags
+        if high:
+            words = self.__stateGFXHigh.unpack_from(view, offset)
+            rows = [left << 64 | right
+                    for left, right in zip(words[0::2], words[1::2])]
+        else:
+            rows = self.__stateGFX.unpack_from(view, offset)
+        if high != (self.__gfxWidth == self.HIGH_RESOLUTION[0]):
+            self.__setResolution(high)
+        dirty = 0
+        for row in range(self.__gfxHeight):
+            if self.__gfx[row] != rows[row]:
+                dirty |= 1 << row
+        if dirty:
+            self.__gfx[:] = rows
+            self.__dirtyRows |= dirty
+            self.__gfxVersion += 1
+        offset += self.__stateGFXHigh.size
+        self.__rng, = self.__stateRandom.unpack_from(view, offset)
+
+    def loadROM(self, filename, quirks=None):
+        '''Load a file's binary data into the system's RAM buffer and analyze
+        the program, see getAnalysis. The quirks of the ROM, if given, are
+        selected first, see setQuirks.'''
         # Load data from file in binary mode
-        fileBuffer = open(filename, 'rb')
-        romData = fileBuffer.read()
-        fileBuffer.close()
-        # Convert file data into hex
-        hexData = str(hexlify(romData))[2:]  # Remove 'b from string
-        # Pad string such that its length is a multiple of 4
-        for i in range(len(hexData) % 4):
-            hexData += '0'
-        # Copy padded string into memory, each byte is 2 hex chars
-        for i in range(0, len(hexData) - 1, 2):
-            self.__ram[int(i / 2) + 512] = hexData[i:i + 2]
+        with open(filename, 'rb') as fileBuffer:
+            self.loadROMData(fileBuffer.read(), quirks)
+
+    def loadROMData(self, romData, quirks=None):
+        '''Reset the system and load a ROM given as bytes or any other bytes
+        like object, such as a slice of a ROMPack, into the RAM buffer and
+        analyze the program, see getAnalysis. The quirks of the ROM, if
+        given, are selected first, see setQuirks.'''
+        if len(romData) > 4096 - 512:
+            raise self.__romSizeException
+        if quirks is not None:
+            self.setQuirks(quirks)
+        self.reset()
+        # Copy the data into memory starting at address 0x200
+        self.__ram[512:512 + len(romData)] = romData
+        self.__setAnalysis(analyze(self.__ram, 512, self.__quirks))
+
+    def getAnalysis(self):
+        '''Return the static Analysis of the ROM made by loadROM, or None if
+        the RAM was replaced since by a reset or a state.'''
+        return self.__analysis
+
+    def __setAnalysis(self, analysis):
+        '''Keep the analysis of the ROM and the flags derived from it. Writes
+        outside the code of a sound analysis do not need to invalidate
+        anything, and blocks in a range the ROM writes are not compiled.'''
+        self.__analysis = analysis
+        if analysis is None:
+            self.__codeMap = self.__writeMap = None
+        else:
+            self.__codeMap = analysis.getCodeMap() \
+                if analysis.isSound() else None
+            self.__writeMap = analysis.getWriteMap()
 
     def emulateCycle(self):
-        '''Emulate a system cycle. Fetch the next instruction from RAM, decode
-        the instruction using the opcode table and execute the instruction.'''
-        # Fetch opcode
-        self.__opCode = self.__ram[self.__pc] + self.__ram[self.__pc + 1]
-        # Execute opcode function from table
-        self.__opCodeTable[self.__opCode[0]]()
-        # Update timers
-        for i in range(len(self.__timers)):
-            if self.__timers[i] > 0:
-                self.__timers[i] -= 1
-
-    def __jump0NNN(self):
-        '''Opcode jump function for table0NNN.'''
-        self.__table0NNN[self.__opCode[2:4]]()
-
-    def __jump8NNN(self):
-        '''Opcode jump function for table8NNN.'''
-        self.__table8NNN[self.__opCode[3]]()
-
-    def __jumpENNN(self):
-        '''Opcode jump function for tableENNN.'''
-        self.__tableENNN[self.__opCode[2:4]]()
-
-    def __jumpFNNN(self):
-        '''Opcode jump function for tableFNNN.'''
-        self.__tableFNNN[self.__opCode[2:4]]()
+        '''Emulate a system cycle. Fetch the decoded instruction at the
+        program counter from the decode cache, decoding it first if required,
+        and execute the instruction.'''
+        self.__runEnd = self.__cycles + 1
+        instruction = self.__cache.get(self.__pc)
+        if instruction is None:
+            instruction = self.__decode(self.__pc)
+        instruction()
+        self.__cycles += 1
+
+    def emulateBlock(self):
+        '''Emulate the basic block starting at the program counter with the
+        recompiler engine, compiling it first if required. Instructions that
+        cannot be compiled, and every instruction with the interpreter engine,
+        are emulated one at a time with emulateCycle. Return the number of
+        cycles emulated.'''
+        if self.__compiling:
+            block = self.__blocks.get(self.__pc)
+            if block is None:
+                block = self.__compile(self.__pc)
+            if block[0] is not None:
+                # A budget of a single pass keeps loops from repeating
+                self.__pc, self.__I, cycles = block[0](
+                    self.__V, self.__ram, self.__I, self.__timers,
+                    self.__cycles, self.__tickAt, block[1])
+                self.__cycles += cycles
+                return cycles
+        # No cycle is emulated when a breakpoint stops the instruction
+        cycles = self.__cycles
+        self.emulateCycle()
+        return self.__cycles - cycles
+
+    def run(self, cycles):
+        '''Emulate up to the specified number of cycles in a single call. Stop
+        early after an instruction that draws to the graphics buffer, starts
+        the sound timer or waits for a key press. Return the events that ended
+        the run as a combination of the EVENT flags, or 0 if all of the cycles
+        were emulated. Idle loops are skipped over, raising EVENT_IDLE if the
+        program idled until the end of the run. A draw that waits for the
+        display interrupt (vblank quirk) ends the run at the end of the frame,
+        which can be past its last cycle.'''
+        # The caches are only ever cleared in place, so their lookups can be
+        # bound once per run
+        cached = self.__cache.get
+        blocks = self.__blocks.get if self.__compiling else None
+        timers = self.__timers
+        tickAt = self.__tickAt
+        V = self.__V
+        ram = self.__ram
+        end = self.__cycles + cycles
+        self.__runEnd = end
+        self.__event = 0
+        while self.__cycles < end:
+            pc = self.__pc
+            # Emulate compiled blocks while a pass fits in the cycle budget
+            if blocks is not None:
+                block = blocks(pc)
+                if block is None:
+                    block = self.__compile(pc)
+                if block[0] is not None and \
+                   block[1] <= end - self.__cycles:
+                    self.__pc, self.__I, executed = block[0](
+                        V, ram, self.__I, timers, self.__cycles, tickAt,
+                        end - self.__cycles)
+                    self.__cycles += executed
+                    continue
+            instruction = cached(pc)
+            if instruction is None:
+                instruction = self.__decode(pc)
+            instruction()
+            self.__cycles += 1
+            if self.__event:
+                break
+        return self.__event
+
+    def runFrame(self, cycles=None):
+        '''Emulate the cycles up to the end of the current frame in a single
+        call, a frame being one 60 Hz tick of the timers. Emulate no more than
+        the specified number of cycles if given. Stop early on the same events
+        as run. Return the events that ended the call, including EVENT_FRAME
+        once the frame is complete.'''
+        end = self.__frameEnd()
+        if cycles is not None:
+            event = self.run(min(end - self.__cycles, cycles))
+        else:
+            event = self.run(end - self.__cycles)
+        if self.__cycles == end:
+            event |= self.EVENT_FRAME
+        return event
+
+    def __frameEnd(self):
+        '''Return the first cycle of the next 60 Hz timer tick.'''
+        # Relative to when the speed was set
+        ticks = self.__tickAt(self.__cycles) + 1 - self.__tickBase
+        return self.__cycleBase - (-ticks * self.__ips // 60)
+
+    def getCycles(self):
+        '''Return the number of cycles emulated since the last reset.'''
+        return self.__cycles
+
+    def __tickAt(self, cycle):
+        '''Return the number of 60 Hz timer ticks of emulated time that have
+        elapsed at the specified cycle.'''
+        return self.__tickBase + \
+            (cycle - self.__cycleBase) * 60 // self.__ips
+
+    @staticmethod
+    def __seedState(seed):
+        '''Return the initial xorshift32 state for a seed. The state is never
+        zero, which would only ever produce zeros.'''
+        return ((seed & 0xFFFFFFFF) * 0x9E3779B1 + 0x7F4A7C15) & 0xFFFFFFFF \
+            or 0x7F4A7C15
+
+    def __compile(self, address):
+        '''Compile the basic block starting at address and store it in the
+        block cache. Addresses that cannot start a block, or that start an idle
+        loop the interpreter skips over, store an empty block so that they are
+        not compiled again.'''
+        block = None
+        if self.__idleLoop(address) is None:
+            block = self.__compiler.compile(self.__ram, address,
+                                            self.__tracer)
+        # Self-modified code is left to the interpreter rather than compiled
+        # again after every write
+        if block is not None and self.__writeMap is not None and \
+           self.__writeMap.find(1, address, block[2]) != -1:
+            block = None
+        # Breakpoints are checked by the interpreter
+        if block is not None and self.__debugger is not None and \
+           any(address <= stop < block[2]
+               for stop in self.__debugger.getBreakpoints()):
+            block = None
+        if block is None:
+            block = (None, 0, address + 2)
+        self.__blocks[address] = block
+        return block
+
+    def __idleLoop(self, address):
+        '''Return the handler that skips over the idle loop starting at
+        address, or None if there is no idle loop there. Idle loops are a 1NNN
+        jump to itself, and FX07 followed by 3X00 and a 1NNN jump back to the
+        FX07, which polls the delay timer until it reaches zero.'''
+        ram = self.__ram
+        opCode = (ram[address] << 8) | ram[address + 1]
+        if opCode == 0x1000 | address:
+            return self.__idleJump
+        if opCode & 0xF0FF == 0xF007 and address + 5 < len(ram):
+            x = (opCode >> 8) & 0xF
+            if (ram[address + 2] << 8) | ram[address + 3] == 0x3000 | x << 8 \
+               and (ram[address + 4] << 8) | ram[address + 5] == \
+               0x1000 | address:
+                return partial(self.__idleDelayPoll, x)
+        return None
+
+    def __decode(self, address):
+        '''Decode the opcode at address using the opcode tables. Return its
+        handler with the system and operands already bound and store it in the
+        decode cache. Raise UnknownOpcodeError if the opcode is not in the
+        tables.'''
+        opCode = (self.__ram[address] << 8) | self.__ram[address + 1]
+        instruction = self.__idleLoop(address)
+        if instruction is not None:
+            return self.__instrument(instruction, address, opCode, 'IDLE')
+        try:
+            if opCode >> 12 in self.__subHandlers:
+                table, mask = self.__subHandlers[opCode >> 12]
+                handler, operands = table[opCode & mask]
+            else:
+                handler, operands = self.__handlers[opCode >> 12]
+        except KeyError:
+            raise UnknownOpcodeError(address, opCode) from None
+        x = (opCode >> 8) & 0xF
+        y = (opCode >> 4) & 0xF
+        if operands == 'NNN':
+            instruction = partial(handler, self, opCode & 0xFFF)
+        elif operands == 'XNN':
+            instruction = partial(handler, self, x, opCode & 0xFF)
+        elif operands == 'XYN':
+            instruction = partial(handler, self, x, y, opCode & 0xF)
+        elif operands == 'XY':
+            instruction = partial(handler, self, x, y)
+        elif operands == 'X':
+            instruction = partial(handler, self, x)
+        elif operands == 'N':
+            instruction = partial(handler, self, opCode & 0xF)
+        else:
+            instruction = partial(handler, self)
+        # Handlers are named after their opcode family, such as 8XY4
+        return self.__instrument(instruction, address, opCode,
+                                 handler.__name__[-4:])
+
+    def __instrument(self, instruction, address, opCode, family):
+        '''Wrap a decoded instruction for the attached profiler and tracer,
+        if any, store it in the decode cache and return it.'''
+        if self.__profiler is not None:
+            instruction = self.__profiler.instrument(
+                instruction, address, family,
+                opCode & 0xF if family == 'DXYN' else None)
+        if self.__tracer is not None:
+            # The register the instruction changes, delay timer polling
+            # loops change the register of their FX07
+            if family == 'IDLE' and opCode & 0xF0FF == 0xF007:
+                family = 'FX07'
+            register = self.__changedRegisters.get(family, NO_REGISTER)
+            if register == 'X':
+                register = (opCode >> 8) & 0xF
+            instruction = self.__traced(instruction, address, opCode,
+                                        register)
+        if self.__debugger is not None:
+            instruction = self.__debugged(instruction, address, opCode,
+                                          family)
+        self.__cache[address] = instruction
+        return instruction
+
+    def __traced(self, instruction, address, opCode, register):
+        '''Return a function that executes a decoded instruction and packs
+        its record straight into the buffer of the tracer.'''
+        buffer, cursor, wrap = self.__tracer.getRecorder()
+        pack = RECORD.pack_into
+        size = RECORD.size
+        end = len(buffer)
+        V = self.__V
+
+        def traced():
+            cycle = self.__cycles
+            instruction()
+            offset = cursor[0]
+            pack(buffer, offset, cycle, address, opCode, self.__I & 0xFFFF,
+                 register, V[register])
+            offset += size
+            cursor[0] = offset if offset != end else wrap(offset)
+
+        def tracedNoRegister():
+            cycle = self.__cycles
+            instruction()
+            offset = cursor[0]
+            pack(buffer, offset, cycle, address, opCode, self.__I & 0xFFFF,
+                 NO_REGISTER, 0)
+            offset += size
+            cursor[0] = offset if offset != end else wrap(offset)
+        return traced if register != NO_REGISTER else tracedNoRegister
+
+    def __debugged(self, instruction, address, opCode, family):
+        '''Return a function that checks the breakpoint at address and the
+        watchpoints of a decoded instruction, or the instruction itself if it
+        has neither.'''
+        if family in ('FX33', 'FX55') and self.__debugger.getWatchpoints():
+            size = 3 if family == 'FX33' else ((opCode >> 8) & 0xF) + 1
+            instruction = self.__watched(instruction, address, size)
+        breakpoints = self.__debugger.getBreakpoints()
+        if address in breakpoints:
+            instruction = self.__breakpoint(instruction, address,
+                                            breakpoints[address])
+        return instruction
+
+    def __breakpoint(self, instruction, address, condition):
+        '''Return a function that stops before executing a decoded instruction
+        and raises EVENT_BREAK, when VX holds the value of the (X, value)
+        condition if there is one. The stopped instruction takes no cycle
+        and executes when the system runs again.'''
+        debugger = self.__debugger
+        V = self.__V
+        register, value = condition or (0, None)
+
+        def hitBreakpoint():
+            if self.__breakCycle != self.__cycles and \
+               (value is None or V[register] == value):
+                debugger.recordBreak('breakpoint', address, self.__cycles)
+                self.__breakCycle = self.__cycles
+                self.__cycles -= 1
+                self.__event |= self.EVENT_BREAK
+                return
+            instruction()
+        return hitBreakpoint
+
+    def __watched(self, instruction, address, size):
+        '''Return a function that executes a decoded instruction writing size
+        bytes at I and raises EVENT_BREAK if they overlap a watchpoint.'''
+        debugger = self.__debugger
+        watchpoints = debugger.getWatchpoints()
+
+        def watched():
+            start = self.__I
+            instruction()
+            for low, high in watchpoints:
+                if start < high and low < start + size:
+                    debugger.recordBreak('watchpoint', address, self.__cycles,
+                                         start)
+                    self.__event |= self.EVENT_BREAK
+                    return
+        return watched
+
+    def __invalidate(self, start, end):
+        '''Remove the decoded instructions and compiled blocks that overlap
+        the memory addresses from start up to end.'''
+        # Nothing but code is ever decoded, as shown by a sound analysis
+        if self.__codeMap is not None and \
+           self.__codeMap.find(1, start, end) == -1:
+            return
+        if self.__compiler is not None:
+            # Drop every compiled block that spans one of the addresses
+            blocks = self.__blocks
+            for address in range(max(start - self.__compiler.getMaxBytes(), 0),
+                                 end):
+                block = blocks.get(address)
+                if block is not None and block[2] > start:
+                    del blocks[address]
+        # An instruction starts up to one byte before the addresses and an
+        # idle loop up to five bytes before them
+        cache = self.__cache
+        for address in range(max(start - 5, 0), end):
+            cache.pop(address, None)
+
+    def __idle(self):
+        '''Skip the remaining cycles of the run, less the one the current
+        instruction takes, and raise EVENT_IDLE.'''
+        if self.__runEnd - 1 > self.__cycles:
+            self.__cycles = self.__runEnd - 1
+            self.__event |= self.EVENT_IDLE
+
+    def __waitVBlank(self):
+        '''Skip the remaining cycles of the frame, less the one the current
+        instruction takes, as drawing waits for the display interrupt (vblank
+        quirk). The wait lasts until the frame boundary even if the run ends
+        earlier, so a single cycle draws like a whole frame.'''
+        end = self.__frameEnd()
+        if end - 1 > self.__cycles:
+            self.__cycles = end - 1
+
+    def __idleJump(self):
+        '''1NNN jumping to itself: Idle until the end of the run.'''
+        self.__idle()
+
+    def __idleDelayPoll(self, x):
+        '''FX07 polling the delay timer with 3X00 and a 1NNN jump back: Skip
+        the iterations of the loop that read a non-zero value, each one being
+        three instructions, and raise EVENT_IDLE if they last until the end of
+        the run. Otherwise execute FX07.'''
+        cycles = self.__cycles
+        expiry = self.__timers[0]
+        if self.__tickAt(cycles) >= expiry or self.__runEnd - cycles < 3:
+            self.__instFX07(x)
+            return
+        # First cycle on which the delay timer reads zero, and the number of
+        # loops that start before it
+        zeroAt = self.__cycleBase - \
+            (-(expiry - self.__tickBase) * self.__ips // 60)
+        loops = -(-(zeroAt - cycles) // 3)
+        rest = self.__runEnd - cycles - 3 * loops
+        if rest < 0:
+            # The run ends first, emulate its last partial loop as well
+            loops, rest = divmod(self.__runEnd - cycles, 3)
+            self.__event |= self.EVENT_IDLE
+        else:
+            rest = 0
+        # Execute FX07 as the last loop skipped or the partial loop did
+        last = cycles + 3 * (loops - 1 if not rest else loops)
+        self.__V[x] = max(expiry - self.__tickAt(last), 0)
+        self.__pc += 2 * rest
+        self.__cycles += 3 * loops + rest - 1
 
     def __inst00E0(self):
         '''0x00E0: Clear the graphics buffer.'''
-        self.__gfx = [[0 for x in range(32)] for y in range(64)]
+        dirty = 0
+        for row in range(self.__gfxHeight):
+            if self.__gfx[row]:
+                dirty |= 1 << row
+        if dirty:
+            self.__gfx[:] = [0] * self.__gfxHeight
+            self.__dirtyRows |= dirty
+            self.__gfxVersion += 1
+        self.__event |= self.EVENT_DRAW
+        self.__pc += 2
+
+    def __inst00CN(self, n):
+        '''00CN: Scroll the graphics buffer down by N rows (SUPER-CHIP).'''
+        gfx = self.__gfx
+        n = min(n, self.__gfxHeight)
+        gfx[:] = [0] * n + gfx[:self.__gfxHeight - n]
+        self.__markAllRowsDirty()
+        self.__event |= self.EVENT_DRAW
+        self.__pc += 2
+
+    def __inst00FB(self):
+        '''00FB: Scroll the graphics buffer right by 4 pixels (SUPER-CHIP).'''
+        gfx = self.__gfx
+        gfx[:] = [row >> 4 for row in gfx]
+        self.__markAllRowsDirty()
+        self.__event |= self.EVENT_DRAW
+        self.__pc += 2
+
+    def __inst00FC(self):
+        '''00FC: Scroll the graphics buffer left by 4 pixels (SUPER-CHIP).'''
+        gfx = self.__gfx
+        mask = (1 << self.__gfxWidth) - 1
+        gfx[:] = [(row << 4) & mask for row in gfx]
+        self.__markAllRowsDirty()
+        self.__event |= self.EVENT_DRAW
+        self.__pc += 2
+
+    def __inst00FD(self):
+        '''00FD: Exit the interpreter, which idles at this instruction from
+        then on (SUPER-CHIP).'''
+        self.__idle()
+
+    def __inst00FE(self):
+        '''00FE: Switch to low resolution and clear the graphics buffer
+        (SUPER-CHIP).'''
+        self.__setResolution(False)
+        self.__event |= self.EVENT_DRAW
+        self.__pc += 2
+
+    def __inst00FF(self):
+        '''00FF: Switch to high resolution and clear the graphics buffer
+        (SUPER-CHIP).'''
+        self.__setResolution(True)
+        self.__event |= self.EVENT_DRAW
         self.__pc += 2
 
     def __inst00EE(self):
         '''00EE: Return from subroutine.'''
-        self.__pc = self.__stk.pop()
-        self.__pc += 2
+        if not self.__sp:
+            raise self.__emptyStackException
+        self.__sp -= 1
+        self.__pc = self.__stk[self.__sp] + 2
 
-    def __inst1NNN(self):
+    def __inst1NNN(self, nnn):
         '''1NNN: Jump to address NNN.'''
-        self.__pc = int(self.__opCode[1:4], 16)
+        self.__pc = nnn
 
-    def __inst2NNN(self):
+    def __inst2NNN(self, nnn):
         '''2NNN: Call subroutine at NNN.'''
-        self.__stk.push(self.__pc)
-        self.__pc = int(self.__opCode[1:4], 16)
+        if self.__sp == self.STACK_SIZE:
+            raise self.__stackOverflowException
+        self.__stk[self.__sp] = self.__pc
+        self.__sp += 1
+        self.__pc = nnn
 
-    def __inst3XNN(self):
+    def __inst3XNN(self, x, nn):
         '''3XNN: Skip the next instruction if VX equals NN.'''
-        if self.__V[int(self.__opCode[1], 16)] == int(self.__opCode[2:4], 16):
+        if self.__V[x] == nn:
             self.__pc += 4
         else:
             self.__pc += 2
 
-    def __inst4XNN(self):
+    def __inst4XNN(self, x, nn):
         '''4XNN: Skip the next instruction if VX doesn't equal NN.'''
-        if self.__V[int(self.__opCode[1], 16)] != int(self.__opCode[2:4], 16):
+        if self.__V[x] != nn:
             self.__pc += 4
         else:
             self.__pc += 2
 
-    def __inst5XY0(self):
+    def __inst5XY0(self, x, y):
         '''5XY0: Skip the next instruction if VX equals VY.'''
-        if self.__V[int(self.__opCode[1], 16)] == \
-           self.__V[int(self.__opCode[2], 16)]:
+        if self.__V[x] == self.__V[y]:
             self.__pc += 4
         else:
             self.__pc += 2
 
-    def __inst6XNN(self):
+    def __inst6XNN(self, x, nn):
         '''6XNN: Set VX to NN.'''
-        self.__V[int(self.__opCode[1], 16)] = int(self.__opCode[2:4], 16)
+        self.__V[x] = nn
         self.__pc += 2
 
-    def __inst7XNN(self):
+    def __inst7XNN(self, x, nn):
         '''7XNN: Add NN to VX.'''
-        self.__V[int(self.__opCode[1], 16)] += int(self.__opCode[2:4], 16)
-        self.__V[int(self.__opCode[1], 16)] &= 255  # Take the lowest 8 bits
+        # Take the lowest 8 bits
+        self.__V[x] = (self.__V[x] + nn) & 0xFF
         self.__pc += 2
 
-    def __inst8XY0(self):
+    def __inst8XY0(self, x, y):
         '''8XY0: Set VX to the value of VY.'''
-        self.__V[int(self.__opCode[1], 16)] = \
-            self.__V[int(self.__opCode[2], 16)]
+        self.__V[x] = self.__V[y]
         self.__pc += 2
 
-    def __inst8XY1(self):
+    def __inst8XY1(self, x, y):
         '''8XY1: Set VX to VX OR VY.'''
-        self.__V[int(self.__opCode[1], 16)] |= \
-            self.__V[int(self.__opCode[2], 16)]
+        self.__V[x] |= self.__V[y]
         self.__pc += 2
 
-    def __inst8XY2(self):
+    def __inst8XY2(self, x, y):
         '''8XY2: Set VX to VX AND VY.'''
-        self.__V[int(self.__opCode[1], 16)] &= \
-            self.__V[int(self.__opCode[2], 16)]
+        self.__V[x] &= self.__V[y]
         self.__pc += 2
 
-    def __inst8XY3(self):
+    def __inst8XY3(self, x, y):
         '''8XY3: Set VX to VX XOR VY.'''
-        self.__V[int(self.__opCode[1], 16)] ^= \
-            self.__V[int(self.__opCode[2], 16)]
+        self.__V[x] ^= self.__V[y]
         self.__pc += 2
 
-    def __inst8XY4(self):
+    def __instReset8XY1(self, x, y):
+        '''8XY1: Set VX to VX OR VY and VF to 0 (logic quirk).'''
+        self.__V[x] |= self.__V[y]
+        self.__V[15] = 0
+        self.__pc += 2
+
+    def __instReset8XY2(self, x, y):
+        '''8XY2: Set VX to VX AND VY and VF to 0 (logic quirk).'''
+        self.__V[x] &= self.__V[y]
+        self.__V[15] = 0
+        self.__pc += 2
+
+    def __instReset8XY3(self, x, y):
+        '''8XY3: Set VX to VX XOR VY and VF to 0 (logic quirk).'''
+        self.__V[x] ^= self.__V[y]
+        self.__V[15] = 0
+        self.__pc += 2
+
+    def __inst8XY4(self, x, y):
         '''8XY4: Add VY to VX. VF is set to 1 when there's a carry, and to 0 when there isn't.'''
-        x = int(self.__opCode[1], 16)
-        y = int(self.__opCode[2], 16)
         result = self.__V[x] + self.__V[y]
         self.__V[15] = 1 if result > 0xFF else 0
         self.__V[x] = result & 0xFF
         self.__pc += 2
 
-    def __inst8XY5(self):
+    def __inst8XY5(self, x, y):
         '''8XY5: Subtract VY from VX. VF is set to 0 when there's a borrow, and 1 when there isn't.'''
-        x = int(self.__opCode[1], 16)
-        y = int(self.__opCode[2], 16)
         self.__V[15] = 1 if self.__V[x] >= self.__V[y] else 0
         self.__V[x] = (self.__V[x] - self.__V[y]) & 0xFF
         self.__pc += 2
 
-    def __inst8XY6(self):
+    def __inst8XY6(self, x, y):
         '''8XY6: Shift VX right by 1. VF is set to the value of the least significant bit of VX before the shift.'''
-        x = int(self.__opCode[1], 16)
         self.__V[15] = self.__V[x] & 0x1
         self.__V[x] = (self.__V[x] >> 1) & 0xFF
         self.__pc += 2
 
-    def __inst8XY7(self):
+    def __instVY8XY6(self, x, y):
+        '''8XY6: Set VX to VY shifted right by 1. VF is set to the value of
+        the least significant bit of VY before the shift (without the shift
+        quirk).'''
+        self.__V[15] = self.__V[y] & 0x1
+        self.__V[x] = self.__V[y] >> 1
+        self.__pc += 2
+
+    def __inst8XY7(self, x, y):
         '''8XY7: Set VX to VY minus VX. VF is set to 0 when there's a borrow, and 1 when there isn't.'''
-        x = int(self.__opCode[1], 16)
-        y = int(self.__opCode[2], 16)
         self.__V[15] = 1 if self.__V[y] >= self.__V[x] else 0
         self.__V[x] = (self.__V[y] - self.__V[x]) & 0xFF
         self.__pc += 2
 
-    def __inst8XYE(self):
+    def __inst8XYE(self, x, y):
         '''8XYE: Shift VX left by one. VF is set to the value of the most significant bit of VX before the shift.'''
-        x = int(self.__opCode[1], 16)
         self.__V[15] = (self.__V[x] >> 7) & 0x1
         self.__V[x] = (self.__V[x] << 1) & 0xFF
         self.__pc += 2
 
-    def __inst9XY0(self):
+    def __instVY8XYE(self, x, y):
+        '''8XYE: Set VX to VY shifted left by one. VF is set to the value of
+        the most significant bit of VY before the shift (without the shift
+        quirk).'''
+        self.__V[15] = (self.__V[y] >> 7) & 0x1
+        self.__V[x] = (self.__V[y] << 1) & 0xFF
+        self.__pc += 2
+
+    def __inst9XY0(self, x, y):
         '''9XY0: Skip the next instruction if VX doesn't equal VY.'''
-        if self.__V[int(self.__opCode[1], 16)] != \
-           self.__V[int(self.__opCode[2], 16)]:
+        if self.__V[x] != self.__V[y]:
             self.__pc += 4
         else:
             self.__pc += 2
 
-    def __instANNN(self):
+    def __instANNN(self, nnn):
         '''ANNN: Set I to the address NNN.'''
-        self.__I = int(self.__opCode[1:4], 16)
+        self.__I = nnn
         self.__pc += 2
 
-    def __instBNNN(self):
+    def __instBNNN(self, nnn):
         '''BNNN: Jump to the address NNN plus V0.'''
-        self.__pc = int(self.__opCode[1:4], 16) + self.__V[0]
+        self.__pc = nnn + self.__V[0]
 
-    def __instCXNN(self):
+    def __instVXBNNN(self, x, nn):
+        '''BXNN: Jump to the address XNN plus VX (jump quirk).'''
+        self.__pc = (x << 8 | nn) + self.__V[x]
+
+    def __instCXNN(self, x, nn):
         '''CXNN: Set VX to a random number and NN.'''
-        seed()
-        self.__V[int(self.__opCode[1], 16)] = \
-            (randint(0, 255) & int(self.__opCode[2:4], 16))
+        # Advance the xorshift32 generator and use its highest byte
+        r = self.__rng
+        r ^= (r << 13) & 0xFFFFFFFF
+        r ^= r >> 17
+        r ^= (r << 5) & 0xFFFFFFFF
+        self.__rng = r
+        self.__V[x] = (r >> 24) & nn
         self.__pc += 2
 
-    def __instDXYN(self):
+    def __instDXYN(self, x, y, n):
         '''DXYN: Draw a sprite at coordinate (VX, VY) that has a width of 8 pixels and a height of N pixels.'''
-        x = self.__V[int(self.__opCode[1], 16)] % 64
-        y = self.__V[int(self.__opCode[2], 16)] % 32
-        height = int(self.__opCode[3], 16)
-        self.__V[15] = 0
-        for row in range(height):
-            sprite = int(self.__ram[self.__I + row], 16)
-            for col in range(8):
-                if (sprite & (0x80 >> col)) != 0:
-                    px = (x + col) % 64
-                    py = (y + row) % 32
-                    if self.__gfx[px][py] == 1:
-                        self.__V[15] = 1
-                    self.__gfx[px][py] ^= 1
-        self.__pc += 2
-
-    def __instEX9E(self):
+        width = self.__gfxWidth
+        height = self.__gfxHeight
+        mask = (1 << width) - 1
+        # Shift the sprite row into a double width window, the upper half
+        # holds the visible pixels and the lower half the wrapped ones
+        shift = 2 * width - 8 - self.__V[x] % width
+        y = self.__V[y] % height
+        gfx = self.__gfx
+        collision = 0
+        dirty = 0
+        for row in range(n):
+            bits = self.__ram[self.__I + row] << shift
+            if bits:
+                bits = (bits >> width | bits) & mask
+                line = (y + row) % height
+                collision |= gfx[line] & bits
+                gfx[line] ^= bits
+                dirty |= 1 << line
+        self.__V[15] = 1 if collision else 0
+        if dirty:
+            self.__dirtyRows |= dirty
+            self.__gfxVersion += 1
+        self.__event |= self.EVENT_DRAW
+        self.__pc += 2
+
+    def __instDXY0(self, x, y):
+        '''DXY0: Draw a 16x16 sprite at coordinate (VX, VY), two bytes per
+        row (SUPER-CHIP).'''
+        width = self.__gfxWidth
+        height = self.__gfxHeight
+        mask = (1 << width) - 1
+        shift = 2 * width - 16 - self.__V[x] % width
+        y = self.__V[y] % height
+        ram = self.__ram
+        address = self.__I
+        gfx = self.__gfx
+        collision = 0
+        dirty = 0
+        for row in range(16):
+            bits = (ram[address] << 8 | ram[address + 1]) << shift
+            address += 2
+            if bits:
+                bits = (bits >> width | bits) & mask
+                line = (y + row) % height
+                collision |= gfx[line] & bits
+                gfx[line] ^= bits
+                dirty |= 1 << line
+        self.__V[15] = 1 if collision else 0
+        if dirty:
+            self.__dirtyRows |= dirty
+            self.__gfxVersion += 1
+        self.__event |= self.EVENT_DRAW
+        self.__pc += 2
+
+    def __instClipDXYN(self, x, y, n):
+        '''DXYN: Draw a sprite at coordinate (VX, VY) that has a width of 8
+        pixels and a height of N pixels, clipped at the edges of the screen
+        (clip quirk).'''
+        width = self.__gfxWidth
+        height = self.__gfxHeight
+        # Shift the sprite row into a double width window and keep its upper
+        # half, the visible pixels
+        shift = 2 * width - 8 - self.__V[x] % width
+        y = self.__V[y] % height
+        gfx = self.__gfx
+        collision = 0
+        dirty = 0
+        for row in range(min(n, height - y)):
+            bits = self.__ram[self.__I + row] << shift >> width
+            if bits:
+                line = y + row
+                collision |= gfx[line] & bits
+                gfx[line] ^= bits
+                dirty |= 1 << line
+        self.__V[15] = 1 if collision else 0
+        if dirty:
+            self.__dirtyRows |= dirty
+            self.__gfxVersion += 1
+        self.__event |= self.EVENT_DRAW
+        self.__pc += 2
+
+    def __instClipDXY0(self, x, y):
+        '''DXY0: Draw a 16x16 sprite at coordinate (VX, VY), two bytes per
+        row, clipped at the edges of the screen (SUPER-CHIP, clip quirk).'''
+        width = self.__gfxWidth
+        height = self.__gfxHeight
+        shift = 2 * width - 16 - self.__V[x] % width
+        y = self.__V[y] % height
+        ram = self.__ram
+        address = self.__I
+        gfx = self.__gfx
+        collision = 0
+        dirty = 0
+        for row in range(min(16, height - y)):
+            bits = (ram[address] << 8 | ram[address + 1]) << shift >> width
+            address += 2
+            if bits:
+                line = y + row
+                collision |= gfx[line] & bits
+                gfx[line] ^= bits
+                dirty |= 1 << line
+        self.__V[15] = 1 if collision else 0
+        if dirty:
+            self.__dirtyRows |= dirty
+            self.__gfxVersion += 1
+        self.__event |= self.EVENT_DRAW
+        self.__pc += 2
+
+    def __instEX9E(self, x):
         '''EX9E: Skip the next instruction if the key stored in VX is
         pressed.'''
-        if self.__key[self.__V[int(self.__opCode[1], 16)]]:
+        if self.__key[self.__V[x]]:
             self.__pc += 4
         else:
             self.__pc += 2
 
-    def __instEXA1(self):
+    def __instEXA1(self, x):
         '''EXA1 Skip the next instruction if the key stored in VX is not
         pressed.'''
-        if not self.__key[self.__V[int(self.__opCode[1], 16)]]:
+        if not self.__key[self.__V[x]]:
             self.__pc += 4
         else:
             self.__pc += 2
 
-    def __instFX07(self):
+    def __instFX07(self, x):
         '''FX07: Set VX to the value of the delay timer.'''
-        self.__V[int(self.__opCode[1], 16)] = self.__timers[0]
+        self.__V[x] = max(self.__timers[0] - self.__tickAt(self.__cycles), 0)
         self.__pc += 2
 
-    def __instFX0A(self):
+    def __instFX0A(self, x):
         '''FX0A: Wait for a key press and store the key in VX.'''
         for i in range(16):
             if self.__key[i]:
-                self.__V[int(self.__opCode[1], 16)] = i
+                self.__V[x] = i
                 self.__pc += 2
                 return
         # If no key pressed, do not increment PC (repeat this instruction)
+        # and idle until the end of the run
+        self.__event |= self.EVENT_KEY_WAIT
+        self.__idle()
 
-    def __instFX15(self):
+    def __instFX15(self, x):
         '''FX15: Set the delay timer to VX.'''
-        self.__timers[0] = self.__V[int(self.__opCode[1], 16)]
+        self.__timers[0] = self.__tickAt(self.__cycles) + self.__V[x]
         self.__pc += 2
 
-    def __instFX18(self):
+    def __instFX18(self, x):
         '''FX18: Set the sound timer to VX.'''
-        self.__timers[1] = self.__V[int(self.__opCode[1], 16)]
+        self.__timers[1] = self.__tickAt(self.__cycles) + self.__V[x]
+        if self.__V[x]:
+            self.__event |= self.EVENT_SOUND
         self.__pc += 2
 
-    def __instFX1E(self):
+    def __instFX1E(self, x):
         '''FX1E: Add VX to I.'''
-        self.__I += self.__V[int(self.__opCode[1], 16)]
+        self.__I += self.__V[x]
         self.__pc += 2
 
-    def __instFX29(self):
+    def __instFX29(self, x):
         '''FX29: Set I to the location of the sprite for the character in
         VX.'''
-        self.__I = (self.__V[int(self.__opCode[1], 16)] * 5)
+        self.__I = (self.__V[x] * 5)
+        self.__pc += 2
+
+    def __instFX30(self, x):
+        '''FX30: Set I to the location of the large sprite for the digit in
+        VX (SUPER-CHIP).'''
+        self.__I = self.BIG_FONT_ADDRESS + (self.__V[x] & 0xF) * 10
         self.__pc += 2
 
-    def __instFX33(self):
+    def __instFX33(self, x):
         '''FX33: Store the Binary-coded decimal representation of VX at the addresses I, I+1, and I+2.'''
-        x = int(self.__opCode[1], 16)
         value = self.__V[x]
-        self.__ram[self.__I] = '{:02x}'.format(value // 100)
-        self.__ram[self.__I + 1] = '{:02x}'.format((value // 10) % 10)
-        self.__ram[self.__I + 2] = '{:02x}'.format(value % 10)
+        self.__ram[self.__I] = value // 100
+        self.__ram[self.__I + 1] = (value // 10) % 10
+        self.__ram[self.__I + 2] = value % 10
+        self.__invalidate(self.__I, self.__I + 3)
         self.__pc += 2
 
-    def __instFX55(self):
+    def __instFX55(self, x):
         '''FX55: Store V0 to VX in memory starting at address I.'''
-        x = int(self.__opCode[1], 16)
         for i in range(x + 1):
-            self.__ram[self.__I + i] = '{:02x}'.format(self.__V[i])
+            self.__ram[self.__I + i] = self.__V[i]
+        self.__invalidate(self.__I, self.__I + x + 1)
         self.__pc += 2
 
-    def __instFX65(self):
+    def __instFX65(self, x):
         '''FX65: Fill V0 to VX with values from memory starting at address I.'''
-        x = int(self.__opCode[1], 16)
         for i in range(x + 1):
-            self.__V[i] = int(self.__ram[self.__I + i], 16)
+            self.__V[i] = self.__ram[self.__I + i]
         self.__pc += 2
+
+    def __instIncrementFX55(self, x):
+        '''FX55: Store V0 to VX in memory starting at address I and then
+        increment I past them (memory quirk).'''
+        self.__instFX55(x)
+        self.__I += x + 1
+
+    def __instIncrementFX65(self, x):
+        '''FX65: Fill V0 to VX with values from memory starting at address I
+        and then increment I past them (memory quirk).'''
+        self.__instFX65(x)
+        self.__I += x + 1
+
+    def __instFX75(self, x):
+        '''FX75: Store V0 to VX in the RPL user flags (SUPER-CHIP).'''
+        self.__flags[:x + 1] = bytes(self.__V[:x + 1])
+        self.__pc += 2
+
+    def __instFX85(self, x):
+        '''FX85: Fill V0 to VX with the RPL user flags (SUPER-CHIP).'''
+        self.__V[:x + 1] = self.__flags[:x + 1]
+        self.__pc += 2
+
+    # Opcode instruction jump tables, shared by every instance. The handlers
+    # are plain functions, decoding binds them to the system and operands.
+    # Each instance decodes with copies specialized for its quirks, see
+    # __getTables
+    __opCodeTable = {0x1: (__inst1NNN, 'NNN'),
+                     0x2: (__inst2NNN, 'NNN'),
+                     0x3: (__inst3XNN, 'XNN'),
+                     0x4: (__inst4XNN, 'XNN'),
+                     0x5: (__inst5XY0, 'XY'),
+                     0x6: (__inst6XNN, 'XNN'),
+                     0x7: (__inst7XNN, 'XNN'),
+                     0x9: (__inst9XY0, 'XY'),
+                     0xA: (__instANNN, 'NNN'),
+                     0xB: (__instBNNN, 'NNN'),
+                     0xC: (__instCXNN, 'XNN')}
+    __table0NNN = dict.fromkeys(range(0xC0, 0xD0), (__inst00CN, 'N'))
+    __table0NNN.update({0xE0: (__inst00E0, ''),
+                        0xEE: (__inst00EE, ''),
+                        0xFB: (__inst00FB, ''),
+                        0xFC: (__inst00FC, ''),
+                        0xFD: (__inst00FD, ''),
+                        0xFE: (__inst00FE, ''),
+                        0xFF: (__inst00FF, '')})
+    __table8NNN = {0x0: (__inst8XY0, 'XY'),
+                   0x1: (__inst8XY1, 'XY'),
+                   0x2: (__inst8XY2, 'XY'),
+                   0x3: (__inst8XY3, 'XY'),
+                   0x4: (__inst8XY4, 'XY'),
+                   0x5: (__inst8XY5, 'XY'),
+                   0x6: (__inst8XY6, 'XY'),
+                   0x7: (__inst8XY7, 'XY'),
+                   0xE: (__inst8XYE, 'XY')}
+    __tableDNNN = dict.fromkeys(range(0x1, 0x10), (__instDXYN, 'XYN'))
+    __tableDNNN[0x0] = (__instDXY0, 'XY')
+    __tableENNN = {0x9E: (__instEX9E, 'X'),
+                   0xA1: (__instEXA1, 'X')}
+    __tableFNNN = {0x07: (__instFX07, 'X'),
+                   0x0A: (__instFX0A, 'X'),
+                   0x15: (__instFX15, 'X'),
+                   0x18: (__instFX18, 'X'),
+                   0x1E: (__instFX1E, 'X'),
+                   0x29: (__instFX29, 'X'),
+                   0x30: (__instFX30, 'X'),
+                   0x33: (__instFX33, 'X'),
+                   0x55: (__instFX55, 'X'),
+                   0x65: (__instFX65, 'X'),
+                   0x75: (__instFX75, 'X'),
+                   0x85: (__instFX85, 'X')}
+    # Sub tables for opcodes that share their first nibble, along with
+    # the mask used to select the handler within the table
+    __subTables = {0x0: (__table0NNN, 0xFF),
+                   0x8: (__table8NNN, 0xF),
+                   0xD: (__tableDNNN, 0xF),
+                   0xE: (__tableENNN, 0xFF),
+                   0xF: (__tableFNNN, 0xFF)}
+    # Keys of the SUPER-CHIP instructions in the sub tables, removed for
+    # variants without them
+    __superChipKeys = {0x0: list(range(0xC0, 0xD0)) + [0xFB, 0xFC, 0xFD,
+                                                       0xFE, 0xFF],
+                       0xF: [0x30, 0x75, 0x85]}
+    # Handlers replacing those of the tables above when a quirk has the given
+    # setting, by the first nibble of their opcodes and their key in its sub
+    # table, or None without one. Handlers of quirks are named after their
+    # opcode family like the others
+    __clipHandlers = dict.fromkeys([(0xD, n) for n in range(0x1, 0x10)],
+                                   (__instClipDXYN, 'XYN'))
+    __clipHandlers[(0xD, 0x0)] = (__instClipDXY0, 'XY')
+    __quirkHandlers = {('shift', False): {(0x8, 0x6): (__instVY8XY6, 'XY'),
+                                          (0x8, 0xE): (__instVY8XYE, 'XY')},
+                       ('memory', True): {(0xF, 0x55): (__instIncrementFX55,
+                                                        'X'),
+                                          (0xF, 0x65): (__instIncrementFX65,
+                                                        'X')},
+                       ('jump', True): {(0xB, None): (__instVXBNNN, 'XNN')},
+                       ('logic', True): {(0x8, 0x1): (__instReset8XY1, 'XY'),
+                                         (0x8, 0x2): (__instReset8XY2, 'XY'),
+                                         (0x8, 0x3): (__instReset8XY3, 'XY')},
+                       ('clip', True): __clipHandlers}
+    # Specialized tables by quirks, see __getTables
+    __quirkTables = {}
+    # The register changed by each opcode family, VX or a fixed register,
+    # as recorded by a tracer
+    __changedRegisters = {'6XNN': 'X', '7XNN': 'X', '8XY0': 'X', '8XY1': 'X',
+                          '8XY2': 'X', '8XY3': 'X', '8XY4': 'X', '8XY5': 'X',
+                          '8XY6': 'X', '8XY7': 'X', '8XYE': 'X', 'CXNN': 'X',
+                          'DXYN': 15, 'DXY0': 15, 'FX07': 'X', 'FX0A': 'X',
+                          'FX65': 'X', 'FX85': 'X'}
@@ -0,0 +1,316 @@
+import struct
+
+from .quirks import DEFAULT_PROFILE, PROFILES
+from .trace import NO_REGISTER, RECORD
+
+
+class BlockCompiler(object):
+    '''BlockCompiler translates basic blocks of CHIP-8 code into Python
+    functions. Each block starts at a given address and runs until an
+    instruction that the interpreter has to execute itself (drawing,
+    subroutines, input, sound and memory writes) or a jump out of the block.
+    Skips over a single instruction are compiled as conditionals, forward
+    jumps are followed and a jump back to the start of the block loops within
+    it for as long as the cycle budget allows. Register accesses are
+    specialized into local variables so a block runs as a single Python
+    function call. The code emitted follows the Quirks given, so that quirks
+    cost nothing when a block runs.'''
+
+    def __init__(self, maxLength=32, quirks=None):
+        '''Create a new BlockCompiler that emits blocks of at most maxLength
+        instructions with the Quirks given, or those of the default profile.'''
+        self.__maxLength = maxLength
+        self.__quirks = quirks or PROFILES[DEFAULT_PROFILE]
+
+    def getQuirks(self):
+        '''Return the Quirks followed by the compiled blocks.'''
+        return self.__quirks
+
+    def getMaxBytes(self):
+        '''Return the largest number of bytes a compiled block can span.'''
+        return self.__maxLength * 2
+
+    def compile(self, ram, address, tracer=None):
+        '''Compile the basic block starting at address. Return a tuple of the
+        block function, the largest number of instructions a pass through it
+        executes and the address after its last instruction, or None if the
+        instruction at address must be executed by the interpreter. The block
+        function is called with the registers, RAM, address register, timer
+        expiry ticks, the cycle count at the start of the block, a function
+        returning the timer tick at a cycle and the cycle budget, which must
+        allow for at least one pass. It returns the new program counter and
+        address register and the number of instructions executed. With a
+        TraceBuffer the block is compiled as straight-line code that also
+        records every instruction it executes, packing all the records into
+        the buffer at once at its end.'''
+        # Blocks count the instructions executed in n, except for those of
+        # the straight-line code since the last update, offset in total. A
+        # skip sets s, which guards the instruction after it.
+        body = []
+        pc = address
+        count = 0
+        offset = 0
+        guarded = False
+        fields = []
+        addressRegister = 'j'
+        structured = tracer is None
+        # Keep the block within the span Chip8 invalidates on writes
+        limit = min(len(ram), address + self.getMaxBytes())
+        while count < self.__maxLength and pc + 1 < limit:
+            opCode = (ram[pc] << 8) | ram[pc + 1]
+            nibble = opCode >> 12
+            condition = self.__skipCondition(opCode)
+            if guarded:
+                lines = self.__guardedLines(opCode, pc, address)
+                if lines is None:
+                    break
+                if condition is not None:
+                    body += ['if s:', '    s = False', 'else:']
+                else:
+                    body.append('if not s:')
+                    guarded = False
+                body += ['    ' + line for line in lines]
+                count += 1
+                pc += 2
+                continue
+            if nibble == 0x1 and structured and \
+               pc < opCode & 0xFFF < limit - 1:
+                # Follow forward jumps
+                count += 1
+                offset += 1
+                pc = opCode & 0xFFF
+                continue
+            if nibble == 0x1 and structured:
+                count += 1
+                body += self.__countLines(offset + 1)
+                offset = 0
+                body += self.__jumpLines(opCode & 0xFFF, address)
+                pc += 2
+                break
+            if condition is not None and structured:
+                body += self.__countLines(offset + 1)
+                offset = 0
+                body.append('s = {}'.format(condition))
+                guarded = True
+                count += 1
+                pc += 2
+                continue
+            lines = self.__translate(opCode, pc, offset)
+            if lines is None:
+                break
+            body.extend(lines)
+            if tracer is not None:
+                # Keep the fields that later instructions may change
+                register = self.__tracedRegister(opCode)
+                value = '0'
+                if register != NO_REGISTER:
+                    value = 'r{}'.format(count)
+                    body.append('{} = v{:x}'.format(value, register))
+                if any(line.startswith('I ') for line in lines):
+                    addressRegister = 'j{}'.format(count)
+                    body.append('{} = I & 65535'.format(addressRegister))
+                fields.append('cycles + {}, {}, {}, {}, {}, {}'.format(
+                    count, pc, opCode, addressRegister, register, value))
+            count += 1
+            offset += 1
+            pc += 2
+            if nibble in (0x1, 0x3, 0x4, 0x5, 0x9, 0xB):
+                # The instruction set the program counter
+                body += self.__countLines(offset)
+                offset = 0
+                body.append('break')
+                break
+        if not count:
+            return None
+        if guarded:
+            body += ['pc = {} if s else {}'.format(pc + 2, pc), 'break']
+        elif offset or body[-1] != 'break':
+            body += self.__countLines(offset)
+            body += ['pc = {}'.format(pc), 'break']
+        namespace = {}
+        after = []
+        if tracer is not None:
+            body.insert(0, 'j = I & 65535')
+            after = self.__recordLines(count, ', '.join(fields))
+            buffer, cursor, wrap = tracer.getRecorder()
+            records = struct.Struct('<' + RECORD.format[1:] * count)
+            namespace.update(buffer=buffer, cursor=cursor, wrap=wrap,
+                             end=len(buffer), pack=records.pack_into,
+                             packBytes=records.pack, write=tracer.write)
+        source = self.__assemble(body, after, count)
+        exec(compile(source, '<block {:#05x}>'.format(address), 'exec'),
+             namespace)
+        return namespace['block'], count, pc
+
+    @staticmethod
+    def __countLines(offset):
+        '''Return the statements that add offset instructions to the count
+        of those executed.'''
+        return ['n += {}'.format(offset)] if offset else []
+
+    def __guardedLines(self, opCode, pc, address):
+        '''Return the statements for the instruction opCode at address pc
+        after a skip, counting it as executed, for a block starting at
+        address, or None if it cannot be part of a compiled block. Skips set s
+        and jumps leave the block.'''
+        condition = self.__skipCondition(opCode)
+        if condition is not None:
+            return ['n += 1', 's = {}'.format(condition)]
+        elif opCode >> 12 == 0x1:
+            return ['n += 1'] + self.__jumpLines(opCode & 0xFFF, address)
+        lines = self.__translate(opCode, pc, 0)
+        if lines is None:
+            return None
+        if opCode >> 12 == 0xB:
+            return ['n += 1'] + lines + ['break']
+        return lines + ['n += 1']
+
+    @staticmethod
+    def __jumpLines(target, address):
+        '''Return the statements of a jump to target from a block starting at
+        address, looping back within the block if the budget allows for
+        another pass.'''
+        lines = []
+        if target == address:
+            lines = ['if n + passLength <= budget:', '    continue']
+        return lines + ['pc = {}'.format(target), 'break']
+
+    @staticmethod
+    def __skipCondition(opCode):
+        '''Return the Python expression under which the skip instruction
+        opCode skips the next instruction, or None if it is no skip.'''
+        nibble = opCode >> 12
+        x = 'v{:x}'.format((opCode >> 8) & 0xF)
+        y = 'v{:x}'.format((opCode >> 4) & 0xF)
+        if nibble == 0x3:
+            return '{} == {}'.format(x, opCode & 0xFF)
+        elif nibble == 0x4:
+            return '{} != {}'.format(x, opCode & 0xFF)
+        elif nibble == 0x5 and opCode & 0xF == 0:
+            return '{} == {}'.format(x, y)
+        elif nibble == 0x9 and opCode & 0xF == 0:
+            return '{} != {}'.format(x, y)
+        return None
+
+    @staticmethod
+    def __tracedRegister(opCode):
+        '''Return the register a tracer records for a compiled instruction,
+        VX for those that change it as in Chip8, or NO_REGISTER.'''
+        if opCode >> 12 in (0x6, 0x7, 0x8) or \
+           opCode & 0xF0FF in (0xF007, 0xF065):
+            return (opCode >> 8) & 0xF
+        return NO_REGISTER
+
+    @staticmethod
+    def __recordLines(count, fields):
+        '''Return the statements that pack the records of the count
+        instructions of a block, from their fields, into the trace buffer.
+        Blocks that would run past the end of the buffer hand their records
+        to the tracer to wrap it.'''
+        size = count * RECORD.size
+        return ['offset = cursor[0]',
+                'if offset + {} <= end:'.format(size),
+                '    pack(buffer, offset, {})'.format(fields),
+                '    offset += {}'.format(size),
+                '    cursor[0] = offset if offset != end else wrap(offset)',
+                'else:',
+                '    write(packBytes({}))'.format(fields)]
+
+    def __assemble(self, body, after, passLength):
+        '''Wrap the body of a block into a function definition that loads the
+        registers it uses into locals, runs the body in a loop that it leaves
+        with break, runs the statements after and stores the registers back at
+        the end.'''
+        code = '\n'.join(body)
+        used = [r for r in range(16) if 'v{:x}'.format(r) in code]
+        lines = ['def block(V, ram, I, timers, cycles, tickAt, budget):']
+        lines += ['    v{0:x} = V[{0}]'.format(r) for r in used]
+        lines += ['    n = 0', '    passLength = {}'.format(passLength),
+                  '    while True:']
+        lines += ['        ' + line for line in body]
+        lines += ['    ' + line for line in after]
+        lines += ['    V[{0}] = v{0:x}'.format(r) for r in used]
+        lines.append('    return pc, I, n')
+        return '\n'.join(lines) + '\n'
+
+    def __translate(self, opCode, pc, index):
+        '''Return the Python statements for the instruction opCode at address
+        pc, executed index instructions after the n counted so far, or None if
+        the instruction cannot be part of a compiled block.'''
+        nibble = opCode >> 12
+        x = 'v{:x}'.format((opCode >> 8) & 0xF)
+        y = 'v{:x}'.format((opCode >> 4) & 0xF)
+        nn = opCode & 0xFF
+        nnn = opCode & 0xFFF
+        condition = self.__skipCondition(opCode)
+        if nibble == 0x1:
+            return ['pc = {}'.format(nnn)]
+        elif condition is not None:
+            return ['pc = {} if {} else {}'.format(pc + 4, condition, pc + 2)]
+        elif nibble == 0x6:
+            return ['{} = {}'.format(x, nn)]
+        elif nibble == 0x7:
+            return ['{0} = ({0} + {1}) & 255'.format(x, nn)]
+        elif nibble == 0x8:
+            return self.__translate8XYN(opCode & 0xF, x, y)
+        elif nibble == 0xA:
+            return ['I = {}'.format(nnn)]
+        elif nibble == 0xB:
+            # BXNN with the jump quirk
+            return ['pc = {} + {}'.format(
+                nnn, x if self.__quirks.jump else 'v0')]
+        elif nibble == 0xF:
+            return self.__translateFXNN(nn, x, (opCode >> 8) & 0xF, index)
+        return None
+
+    def __translate8XYN(self, n, x, y):
+        '''Return the Python statements for the 8XYN arithmetic and logic
+        instructions.'''
+        # Shifts read VY without the shift quirk
+        source = x if self.__quirks.shift else y
+        if n in (0x1, 0x2, 0x3):
+            lines = ['{} {}= {}'.format(x, '|&^'[n - 1], y)]
+            if self.__quirks.logic:
+                lines.append('vf = 0')
+            return lines
+        elif n == 0x0:
+            return ['{} = {}'.format(x, y)]
+        elif n == 0x4:
+            return ['r = {} + {}'.format(x, y),
+                    'vf = r >> 8',
+                    '{} = r & 255'.format(x)]
+        elif n == 0x5:
+            return ['vf = 1 if {} >= {} else 0'.format(x, y),
+                    '{0} = ({0} - {1}) & 255'.format(x, y)]
+        elif n == 0x6:
+            return ['vf = {} & 1'.format(source),
+                    '{} = {} >> 1'.format(x, source)]
+        elif n == 0x7:
+            return ['vf = 1 if {1} >= {0} else 0'.format(x, y),
+                    '{0} = ({1} - {0}) & 255'.format(x, y)]
+        elif n == 0xE:
+            return ['vf = ({} >> 7) & 1'.format(source),
+                    '{} = ({} << 1) & 255'.format(x, source)]
+        return None
+
+    def __translateFXNN(self, nn, x, register, index):
+        '''Return the Python statements for the FXNN timer and address
+        register instructions. Timers are read and written relative to the
+        timer tick at the cycle the instruction executes on.'''
+        tick = 'tickAt(cycles + n + {})'.format(index)
+        if nn == 0x07:
+            return ['t = timers[0] - {}'.format(tick),
+                    '{} = t if t > 0 else 0'.format(x)]
+        elif nn == 0x15:
+            return ['timers[0] = {} + {}'.format(tick, x)]
+        elif nn == 0x1E:
+            return ['I += {}'.format(x)]
+        elif nn == 0x29:
+            return ['I = {} * 5'.format(x)]
+        elif nn == 0x65:
+            lines = ['v{0:x} = ram[I + {0}]'.format(i)
+                     for i in range(register + 1)]
+            if self.__quirks.memory:
+                lines.append('I += {}'.format(register + 1))
+            return lines
+        return None
@@ -0,0 +1,181 @@
+from collections import namedtuple
+from .chip8 import Chip8
+
+# Why a Debugger stopped its system: reason is 'breakpoint' or 'watchpoint',
+# pc the address of the instruction, cycle the cycle it executes on and
+# address the first address written by a watched instruction, None for
+# breakpoints
+Break = namedtuple('Break', ['reason', 'pc', 'cycle', 'address'])
+
+
+def parseBreakpoint(text):
+    '''Parse a breakpoint of the form ADDRESS or ADDRESS VX=NN, in
+    hexadecimal, such as '2a4' or '2a4 v3=0f'. Return a tuple of the
+    address, register and value, the last two None without a condition.'''
+    fields = text.split()
+    try:
+        if len(fields) not in (1, 2):
+            raise ValueError
+        address = int(fields[0], 16)
+        register = value = None
+        if len(fields) == 2:
+            name, _, number = fields[1].partition('=')
+            if len(name) != 2 or name[0] not in 'vV':
+                raise ValueError
+            register = int(name[1], 16)
+            value = int(number, 16)
+    except ValueError:
+        raise ValueError('Invalid breakpoint: {}'.format(text)) from None
+    if not 0 <= address < 4096 or value is not None and not 0 <= value < 256:
+        raise ValueError('Invalid breakpoint: {}'.format(text))
+    return address, register, value
+
+
+def parseWatchpoint(text):
+    '''Parse a watchpoint of the form START or START-END, in hexadecimal and
+    END included, such as '300-30f'. Return a tuple of the first address and
+    the address after the last.'''
+    start, _, last = text.strip().partition('-')
+    try:
+        start = int(start, 16)
+        end = int(last, 16) + 1 if last else start + 1
+    except ValueError:
+        raise ValueError('Invalid watchpoint: {}'.format(text)) from None
+    if not 0 <= start < end <= 4096:
+        raise ValueError('Invalid watchpoint: {}'.format(text))
+    return start, end
+
+
+class Debugger(object):
+    '''Debugger stops a Chip8 object at breakpoints and watchpoints and steps
+    it one instruction or one subroutine call at a time. Breakpoints stop
+    before the instruction at their address executes, only when a register
+    holds a value if they have a condition, and watchpoints stop after FX33
+    or FX55 write to their addresses. Both end the run with
+    Chip8.EVENT_BREAK and running again resumes from there. The debugger is
+    attached to the system only while it has breakpoints or watchpoints and
+    only the instructions they concern check them, so the system otherwise
+    runs at full speed.'''
+
+    def __init__(self, chip8):
+        '''Create a new Debugger of the Chip8 object chip8, without any
+        breakpoints or watchpoints.'''
+        self.__chip8 = chip8
+        self.__breakpoints = {}     # Address to (register, value) or None
+        self.__watchpoints = []     # Watched (start, end) address ranges
+        self.__break = None         # The last Break
+
+    def addBreakpoint(self, address, register=None, value=None):
+        '''Stop before the instruction at address executes, only when VX,
+        X being register, holds value if both are given. Replace the
+        condition of an existing breakpoint.'''
+        if (register is None) != (value is None):
+            raise ValueError('A condition needs both a register and a value')
+        self.__breakpoints[address] = \
+            None if register is None else (register, value)
+        self.__armed()
+
+    def removeBreakpoint(self, address):
+        '''Remove the breakpoint at address, if there is one.'''
+        if self.__breakpoints.pop(address, False) is not False:
+            self.__armed()
+
+    def getBreakpoints(self):
+        '''Return a dictionary of the (register, value) condition, or None,
+        of each breakpoint by address.'''
+        return dict(self.__breakpoints)
+
+    def addWatchpoint(self, start, end=None):
+        '''Stop after FX33 or FX55 writes to any of the addresses from start
+        up to end, or to start alone if end is None.'''
+        watchpoint = (start, start + 1 if end is None else end)
+        if watchpoint[0] >= watchpoint[1]:
+            raise ValueError('A watchpoint needs at least one address')
+        if watchpoint not in self.__watchpoints:
+            self.__watchpoints.append(watchpoint)
+            self.__armed()
+
+    def removeWatchpoint(self, start, end=None):
+        '''Remove the watchpoint of the addresses from start up to end, or of
+        start alone if end is None, if there is one.'''
+        watchpoint = (start, start + 1 if end is None else end)
+        if watchpoint in self.__watchpoints:
+            self.__watchpoints.remove(watchpoint)
+            self.__armed()
+
+    def getWatchpoints(self):
+        '''Return the list of (start, end) address ranges watched.'''
+        return list(self.__watchpoints)
+
+    def clear(self):
+        '''Remove every breakpoint and watchpoint.'''
+        self.__breakpoints.clear()
+        self.__watchpoints.clear()
+        self.__armed()
+
+    def isArmed(self):
+        '''Return whether there is any breakpoint or watchpoint.'''
+        return bool(self.__breakpoints or self.__watchpoints)
+
+    def __armed(self):
+        '''Attach the debugger to the system while it has breakpoints or
+        watchpoints and detach it otherwise, which instruments the
+        instructions decoded from now on accordingly.'''
+        self.__chip8.setDebugger(self if self.isArmed() else None)
+
+    def recordBreak(self, reason, pc, cycle, address=None):
+        '''Record why the system stopped, called by the Chip8 object.'''
+        self.__break = Break(reason, pc, cycle, address)
+
+    def getBreak(self):
+        '''Return the Break of the last stop, or None if there was none.'''
+        return self.__break
+
+    def step(self):
+        '''Execute the instruction at the program counter, even if a
+        breakpoint is set on it. Return the events it raised as a
+        combination of the Chip8 EVENT flags.'''
+        chip8 = self.__chip8
+        cycles = chip8.getCycles()
+        event = chip8.run(1)
+        # A breakpoint stopped before executing, running again resumes
+        if chip8.getCycles() == cycles and event & Chip8.EVENT_BREAK:
+            event = chip8.run(1)
+        return event
+
+    def stepOver(self, cycles=1000000):
+        '''Execute the instruction at the program counter like step, but run
+        a 2NNN call until the subroutine returns, for no more than the
+        specified number of cycles. The call stops early on a breakpoint or
+        watchpoint, or when it waits for a key press. Return the events that
+        ended it, EVENT_BREAK only if the subroutine did not return.'''
+        chip8 = self.__chip8
+        if chip8.getOpCode() >> 12 != 0x2:
+            return self.step()
+        returnAddress = chip8.getPC() + 2
+        depth = chip8.getStackDepth()
+        # Stop at the return address with a breakpoint of our own, unless
+        # there already is one
+        temporary = returnAddress not in self.__breakpoints
+        if temporary:
+            self.addBreakpoint(returnAddress)
+        try:
+            end = chip8.getCycles() + cycles
+            event = self.step()
+            while not event & Chip8.EVENT_KEY_WAIT and \
+                    chip8.getCycles() < end:
+                event = chip8.run(end - chip8.getCycles())
+                if not event & Chip8.EVENT_BREAK:
+                    continue
+                stop = self.__break
+                if stop.reason != 'breakpoint' or stop.pc != returnAddress:
+                    break
+                # Recursive calls return to the same address deeper down
+                if chip8.getStackDepth() == depth:
+                    if temporary:
+                        event &= ~Chip8.EVENT_BREAK
+                    break
+            return event
+        finally:
+            if temporary:
+                self.removeBreakpoint(returnAddress)
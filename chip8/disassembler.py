@@ -0,0 +1,432 @@
+import argparse
+
+# Value of the address register when it cannot be known statically
+UNKNOWN = None
+# Address of the SUPER-CHIP large font, after the 80 bytes of the font
+BIG_FONT_ADDRESS = 80
+
+
+def disassemble(opCode):
+    '''Return the mnemonic of an opcode, or a DW directive if it is not a
+    CHIP-8 instruction.'''
+    nibble = opCode >> 12
+    x = (opCode >> 8) & 0xF
+    y = (opCode >> 4) & 0xF
+    n = opCode & 0xF
+    nn = opCode & 0xFF
+    nnn = opCode & 0xFFF
+    if opCode == 0x00E0:
+        return 'CLS'
+    if opCode == 0x00EE:
+        return 'RET'
+    if opCode & 0xFFF0 == 0x00C0:
+        return 'SCD {}'.format(n)
+    if opCode in SUPER_MNEMONICS:
+        return SUPER_MNEMONICS[opCode]
+    if nibble == 0x1:
+        return 'JP {:#05x}'.format(nnn)
+    if nibble == 0x2:
+        return 'CALL {:#05x}'.format(nnn)
+    if nibble == 0x3:
+        return 'SE V{:X}, {:#04x}'.format(x, nn)
+    if nibble == 0x4:
+        return 'SNE V{:X}, {:#04x}'.format(x, nn)
+    # The last nibble of 5XY0 and 9XY0 is ignored, as by the core
+    if nibble == 0x5:
+        return 'SE V{:X}, V{:X}'.format(x, y)
+    if nibble == 0x6:
+        return 'LD V{:X}, {:#04x}'.format(x, nn)
+    if nibble == 0x7:
+        return 'ADD V{:X}, {:#04x}'.format(x, nn)
+    if nibble == 0x8 and n in ALU_MNEMONICS:
+        if n in (0x6, 0xE):
+            return '{} V{:X}'.format(ALU_MNEMONICS[n], x)
+        return '{} V{:X}, V{:X}'.format(ALU_MNEMONICS[n], x, y)
+    if nibble == 0x9:
+        return 'SNE V{:X}, V{:X}'.format(x, y)
+    if nibble == 0xA:
+        return 'LD I, {:#05x}'.format(nnn)
+    if nibble == 0xB:
+        return 'JP V0, {:#05x}'.format(nnn)
+    if nibble == 0xC:
+        return 'RND V{:X}, {:#04x}'.format(x, nn)
+    if nibble == 0xD:
+        return 'DRW V{:X}, V{:X}, {}'.format(x, y, n)
+    if nibble == 0xE and nn == 0x9E:
+        return 'SKP V{:X}'.format(x)
+    if nibble == 0xE and nn == 0xA1:
+        return 'SKNP V{:X}'.format(x)
+    if nibble == 0xF and nn in FX_MNEMONICS:
+        return FX_MNEMONICS[nn].format(x)
+    return 'DW {:#06x}'.format(opCode)
+
+
+# Mnemonics of the 8XYN instructions by N
+ALU_MNEMONICS = {0x0: 'LD', 0x1: 'OR', 0x2: 'AND', 0x3: 'XOR', 0x4: 'ADD',
+                 0x5: 'SUB', 0x6: 'SHR', 0x7: 'SUBN', 0xE: 'SHL'}
+# Mnemonics of the FXNN instructions by NN
+FX_MNEMONICS = {0x07: 'LD V{:X}, DT', 0x0A: 'LD V{:X}, K',
+                0x15: 'LD DT, V{:X}', 0x18: 'LD ST, V{:X}',
+                0x1E: 'ADD I, V{:X}', 0x29: 'LD F, V{:X}',
+                0x30: 'LD HF, V{:X}', 0x33: 'LD B, V{:X}',
+                0x55: 'LD [I], V{:X}', 0x65: 'LD V{:X}, [I]',
+                0x75: 'LD R, V{:X}', 0x85: 'LD V{:X}, R'}
+# Mnemonics of the SUPER-CHIP display and exit instructions
+SUPER_MNEMONICS = {0x00FB: 'SCR', 0x00FC: 'SCL', 0x00FD: 'EXIT',
+                   0x00FE: 'LOW', 0x00FF: 'HIGH'}
+
+
+def isInstruction(opCode):
+    '''Return true if an opcode is a CHIP-8 instruction, false otherwise.'''
+    return not disassemble(opCode).startswith('DW')
+
+
+class Analysis(object):
+    '''Analysis is the result of the static control-flow analysis of a
+    program in RAM, made by analyze. It holds the instructions reachable from
+    the entry point, their basic blocks, the BNNN computed jumps that could
+    not be followed and the memory ranges written by FX33 and FX55. The
+    analysis is sound if it has no computed jumps and the address register
+    is known at every write, then no other address can ever be executed or
+    written. Reaching an invalid opcode does not make it unsound, the core
+    stops there with an error.'''
+
+    def __init__(self, instructions, blocks, subroutines, computedJumps,
+                 invalid, writes, unknownWrites, dataReferences):
+        '''Create a new Analysis, used by analyze.'''
+        self.__instructions = instructions
+        self.__blocks = blocks
+        self.__subroutines = subroutines
+        self.__computedJumps = computedJumps
+        self.__invalid = invalid
+        self.__writes = writes
+        self.__unknownWrites = unknownWrites
+        self.__dataReferences = dataReferences
+        # One byte per address, set for the bytes of every instruction and
+        # for every byte written
+        self.__codeMap = bytearray(4096)
+        for address in instructions:
+            self.__codeMap[address:address + 2] = b'\x01\x01'
+        self.__writeMap = bytearray(4096)
+        for start, end in writes:
+            self.__writeMap[start:end] = b'\x01' * (end - start)
+
+    def getInstructions(self):
+        '''Return a dictionary of the reachable instructions by address.'''
+        return dict(self.__instructions)
+
+    def getBlocks(self):
+        '''Return a dictionary of the basic blocks by start address, each one
+        a tuple of the address after its last instruction and the list of
+        start addresses of its successors. A call is followed by its target
+        and its return address.'''
+        return dict(self.__blocks)
+
+    def getSubroutines(self):
+        '''Return the sorted list of subroutine addresses.'''
+        return sorted(self.__subroutines)
+
+    def getComputedJumps(self):
+        '''Return the sorted list of addresses of BNNN computed jumps, whose
+        targets were not followed.'''
+        return sorted(self.__computedJumps)
+
+    def getInvalid(self):
+        '''Return the sorted list of reachable addresses that do not hold a
+        CHIP-8 instruction.'''
+        return sorted(self.__invalid)
+
+    def getWrites(self):
+        '''Return the sorted list of (start, end) ranges of addresses written
+        by FX33 and FX55 with a known address register.'''
+        return list(self.__writes)
+
+    def getUnknownWrites(self):
+        '''Return the sorted list of addresses of the FX33 and FX55
+        instructions that write to an address register that is not known.'''
+        return sorted(self.__unknownWrites)
+
+    def getDataReferences(self):
+        '''Return the sorted list of addresses loaded into I by ANNN.'''
+        return sorted(self.__dataReferences)
+
+    def isSound(self):
+        '''Return true if no address other than the instructions found can be
+        executed and no address other than the ranges found can be written,
+        false otherwise. Self-modifying code is never sound, as the written
+        instructions can lead anywhere.'''
+        return not self.__computedJumps and not self.__unknownWrites and \
+            not self.isSelfModifying()
+
+    def isSelfModifying(self):
+        '''Return true if a known write range overlaps an instruction.'''
+        return any(code and written for code, written
+                   in zip(self.__codeMap, self.__writeMap))
+
+    def isCode(self, address):
+        '''Return true if address holds a byte of a reachable instruction.'''
+        return bool(self.__codeMap[address])
+
+    def isWritten(self, address):
+        '''Return true if address is in a known write range.'''
+        return bool(self.__writeMap[address])
+
+    def getCodeMap(self):
+        '''Return a bytearray of 4096 flags set for every byte of every
+        reachable instruction.'''
+        return bytearray(self.__codeMap)
+
+    def getWriteMap(self):
+        '''Return a bytearray of 4096 flags set for every byte in a known
+        write range.'''
+        return bytearray(self.__writeMap)
+
+    def getDataRanges(self, start=0x200, end=4096):
+        '''Return the (start, end) ranges of addresses between start and end
+        that are not part of any reachable instruction.'''
+        ranges = []
+        address = start
+        while address < end:
+            if self.__codeMap[address]:
+                address += 1
+                continue
+            first = address
+            while address < end and not self.__codeMap[address]:
+                address += 1
+            ranges.append((first, address))
+        return ranges
+
+
+def successors(address, opCode):
+    '''Return the addresses that can execute after the instruction at
+    address, with calls followed by their target and return address, or
+    None for a BNNN computed jump. Returns and the SUPER-CHIP exit have
+    none.'''
+    nibble = opCode >> 12
+    if opCode in (0x00EE, 0x00FD):
+        return []
+    if nibble == 0x1:
+        return [opCode & 0xFFF]
+    if nibble == 0x2:
+        return [opCode & 0xFFF, address + 2]
+    if nibble == 0xB:
+        return None
+    if nibble in (0x3, 0x4, 0x5, 0x9, 0xE):
+        return [address + 2, address + 4]
+    return [address + 2]
+
+
+def analyze(ram, entry=0x200, quirks=None):
+    '''Follow every path of the program in ram from the entry point and
+    return its Analysis. The address register is tracked along the paths as
+    the range of values it can hold, to find the ranges written by FX33 and
+    FX55. ANNN sets the range to one address, FX1E widens it by 255, FX29
+    and FX30 set it to a font area, FX55 and FX65 move it past the registers
+    with the memory quirk of the Quirks given and it is unknown after a call
+    or once it can leave RAM.'''
+    increment = quirks is not None and quirks.memory
+    instructions = {}
+    subroutines = set()
+    computedJumps = set()
+    invalid = set()
+    dataReferences = set()
+    writes = []
+    unknownWrites = set()
+    # Range of the address register on entry to each instruction
+    registers = {entry: UNKNOWN}
+    # Addresses to follow, again if the range on entry to them widened
+    pending = [entry]
+    while pending:
+        address = pending.pop()
+        if address + 1 >= len(ram):
+            invalid.add(address)
+            continue
+        opCode = (ram[address] << 8) | ram[address + 1]
+        if not isInstruction(opCode):
+            invalid.add(address)
+            continue
+        instructions[address] = opCode
+        nibble = opCode >> 12
+        I = registers[address]
+        if nibble == 0xA:
+            I = (opCode & 0xFFF, opCode & 0xFFF)
+            dataReferences.add(opCode & 0xFFF)
+        elif opCode & 0xF0FF == 0xF01E:
+            I = widenRange(I, 0, 255, len(ram))
+        elif opCode & 0xF0FF == 0xF029:
+            I = (0, 255 * 5)
+        elif opCode & 0xF0FF == 0xF030:
+            I = (BIG_FONT_ADDRESS, BIG_FONT_ADDRESS + 15 * 10)
+        elif increment and opCode & 0xF0FF in (0xF055, 0xF065):
+            size = ((opCode >> 8) & 0xF) + 1
+            if I is not UNKNOWN:
+                I = (I[0] + size, I[1] + size) \
+                    if I[1] + size < len(ram) else UNKNOWN
+        targets = successors(address, opCode)
+        if targets is None:
+            computedJumps.add(address)
+            continue
+        if nibble == 0x2:
+            subroutines.add(opCode & 0xFFF)
+        for target in targets:
+            # The subroutine may have changed the address register
+            value = UNKNOWN if nibble == 0x2 and target == address + 2 else I
+            if target not in registers:
+                registers[target] = value
+                pending.append(target)
+            elif registers[target] is not UNKNOWN:
+                merged = UNKNOWN if value is UNKNOWN else widenRange(
+                    registers[target], value[0] - registers[target][0],
+                    value[1] - registers[target][1], len(ram))
+                if merged != registers[target]:
+                    registers[target] = merged
+                    pending.append(target)
+    # Write ranges, now that the address register ranges have settled
+    for address, opCode in instructions.items():
+        if opCode & 0xF0FF in (0xF033, 0xF055):
+            I = registers[address]
+            size = 3 if opCode & 0xFF == 0x33 else ((opCode >> 8) & 0xF) + 1
+            if I is UNKNOWN or I[1] + size > len(ram):
+                unknownWrites.add(address)
+            else:
+                writes.append((I[0], I[1] + size))
+    blocks = findBlocks(instructions, entry, subroutines)
+    return Analysis(instructions, blocks, subroutines, computedJumps,
+                    invalid, mergeRanges(writes), unknownWrites,
+                    dataReferences)
+
+
+def widenRange(addresses, low, high, size):
+    '''Return the range of addresses with its first address lowered by low
+    if it is negative and its last address raised by high if it is positive,
+    or UNKNOWN if addresses is UNKNOWN or the last address reaches size.'''
+    if addresses is UNKNOWN:
+        return UNKNOWN
+    first = addresses[0] + min(low, 0)
+    last = addresses[1] + max(high, 0)
+    return (first, last) if last < size else UNKNOWN
+
+
+def findBlocks(instructions, entry, subroutines):
+    '''Split the instructions into basic blocks and return them as a
+    dictionary of the address after the last instruction and the successors
+    of each block by start address.'''
+    leaders = {entry} | subroutines
+    for address, opCode in instructions.items():
+        targets = successors(address, opCode)
+        if targets is None or targets != [address + 2]:
+            leaders.update(targets or [])
+            leaders.add(address + 2)
+    blocks = {}
+    for leader in sorted(leaders):
+        if leader not in instructions:
+            continue
+        address = leader
+        while True:
+            targets = successors(address, instructions[address])
+            end = address + 2
+            if targets != [end] or end in leaders or \
+               end not in instructions:
+                break
+            address = end
+        blocks[leader] = (end, [target for target in targets or []
+                                if target in instructions])
+    return blocks
+
+
+def mergeRanges(ranges):
+    '''Return the sorted list of (start, end) ranges with the overlapping and
+    adjacent ranges merged.'''
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def formatListing(ram, analysis, start=0x200, end=None):
+    '''Return a listing of the memory from start up to end, the instructions
+    disassembled with labels for the blocks and subroutines and the data as
+    hexadecimal bytes.'''
+    if end is None:
+        end = len(ram)
+    instructions = analysis.getInstructions()
+    blocks = analysis.getBlocks()
+    subroutines = set(analysis.getSubroutines())
+    computedJumps = set(analysis.getComputedJumps())
+    unknownWrites = set(analysis.getUnknownWrites())
+    lines = []
+    address = start
+    while address < end:
+        if address in instructions:
+            if address in subroutines:
+                lines.append('sub_{:03x}:'.format(address))
+            elif address in blocks:
+                lines.append('loc_{:03x}:'.format(address))
+            notes = []
+            if address in computedJumps:
+                notes.append('computed jump')
+            if address in unknownWrites:
+                notes.append('writes to unknown address')
+            if analysis.isWritten(address) or analysis.isWritten(address + 1):
+                notes.append('self-modified')
+            opCode = instructions[address]
+            lines.append('    {:03x}: {:04x}  {:<20}{}'.format(
+                address, opCode, disassemble(opCode),
+                '; ' + ', '.join(notes) if notes else '').rstrip())
+            address += 2
+            continue
+        # Data up to the next instruction, eight bytes per line
+        first = address
+        while address < end and address not in instructions and \
+                address - first < 8:
+            address += 1
+        lines.append('    {:03x}: {}'.format(
+            first, ' '.join('{:02x}'.format(byte)
+                            for byte in ram[first:address])))
+    return '\n'.join(lines)
+
+
+def main(args=None):
+    '''Disassemble a ROM from the command line and print its listing and a
+    summary of the analysis.'''
+    parser = argparse.ArgumentParser(
+        prog='python -m chip8.disassembler',
+        description='Disassemble and analyze a CHIP-8 ROM.')
+    parser.add_argument('rom', help='path to the ROM file')
+    parser.add_argument('--cfg', action='store_true',
+                        help='print the basic blocks and their successors '
+                             'instead of the listing')
+    options = parser.parse_args(args)
+    with open(options.rom, 'rb') as fileBuffer:
+        romData = fileBuffer.read()
+    ram = bytearray(4096)
+    ram[0x200:0x200 + len(romData)] = romData
+    analysis = analyze(ram)
+    if options.cfg:
+        for start, (end, targets) in sorted(analysis.getBlocks().items()):
+            print('{:03x}-{:03x} -> {}'.format(
+                start, end - 2,
+                ', '.join('{:03x}'.format(target) for target in targets)))
+    else:
+        print(formatListing(ram, analysis, 0x200, 0x200 + len(romData)))
+    print()
+    print('Instructions:    {}'.format(len(analysis.getInstructions())))
+    print('Basic blocks:    {}'.format(len(analysis.getBlocks())))
+    print('Subroutines:     {}'.format(len(analysis.getSubroutines())))
+    print('Computed jumps:  {}'.format(' '.join(
+        '{:03x}'.format(a) for a in analysis.getComputedJumps()) or 'none'))
+    print('Writes:          {}'.format(' '.join(
+        '{:03x}-{:03x}'.format(start, end - 1)
+        for start, end in analysis.getWrites()) or 'none'))
+    print('Unknown writes:  {}'.format(' '.join(
+        '{:03x}'.format(a) for a in analysis.getUnknownWrites()) or 'none'))
+    print('Self-modifying:  {}'.format(
+        'yes' if analysis.isSelfModifying() else 'no'))
+    print('Sound:           {}'.format('yes' if analysis.isSound() else 'no'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import Manager
+from .chip8 import Chip8, UnknownOpcodeError
+from .headless import hashGFX, runChip8
+from .quirks import DEFAULT_PROFILE, PROFILES
+
+# Columns of the CSV report, in order
+FIELDS = ['rom', 'status', 'error', 'cycles', 'frames', 'idleFrames',
+          'draws', 'seconds', 'ips', 'pc', 'opcode', 'gfxHash']
+
+
+def farmROM(filename, cycles=None, frames=None, seconds=None,
+            engine='interpreter', ips=600, seed=None, quirks=DEFAULT_PROFILE):
+    '''Emulate a single ROM headless and return a report entry for it, with
+    the quirks of a profile name or Quirks as in Chip8.setQuirks. The
+    status is 'ok' if the run reached its limit, 'unknown-opcode' if it hit
+    an opcode missing from the jump tables and 'error' for any other failure.
+    The failures keep the program counter and opcode they happened at.'''
+    entry = dict.fromkeys(FIELDS)
+    entry['rom'] = filename
+    chip8 = None
+    start = time.perf_counter()
+    try:
+        chip8 = Chip8(engine=engine, ips=ips, seed=seed, quirks=quirks)
+        chip8.loadROM(filename)
+        result = runChip8(chip8, cycles=cycles, frames=frames,
+                          seconds=seconds)
+        for field in FIELDS:
+            if field in result:
+                entry[field] = result[field]
+        entry['status'] = 'ok'
+    except UnknownOpcodeError as error:
+        entry['status'] = 'unknown-opcode'
+        entry['error'] = str(error)
+        entry['pc'] = error.pc
+        entry['opcode'] = error.opCode
+    except Exception as error:
+        entry['status'] = 'error'
+        entry['error'] = '{}: {}'.format(type(error).__name__, error)
+    if entry['status'] != 'ok':
+        entry['seconds'] = time.perf_counter() - start
+        if chip8 is not None:
+            entry['cycles'] = chip8.getCycles()
+            entry['ips'] = chip8.getCycles() / entry['seconds']
+            entry['gfxHash'] = hashGFX(chip8)
+            if entry['status'] == 'error':
+                state = chip8.getState()
+                entry['pc'] = state['PRC']
+                entry['opcode'] = state['OPC']
+    return entry
+
+
+def farmStartedROM(started, filename, *args):
+    '''Record filename in the shared dictionary started and emulate it like
+    farmROM with the remaining arguments, in a worker process.'''
+    started[filename] = True
+    return farmROM(filename, *args)
+
+
+def failedEntry(filename, error):
+    '''Return a report entry for a ROM whose worker raised error.'''
+    entry = dict.fromkeys(FIELDS)
+    entry.update(rom=filename, status='error',
+                 error='Worker failed: {!r}'.format(error))
+    return entry
+
+
+def farmROMs(filenames, cycles=None, frames=None, seconds=None,
+             engine='interpreter', ips=600, seed=None, quirks=DEFAULT_PROFILE,
+             workers=None):
+    '''Emulate every ROM in a process pool, one ROM per task, with the same
+    limits, random number generator seed and quirks for each ROM. A ROM that
+    fails is reported as failed without stopping the others. A worker process
+    that dies breaks the pool, so the ROMs left unfinished are run again in a
+    new one. Those that were already running are each run alone first, and
+    the one that breaks the pool alone is reported as failed. Return a report
+    with a summary and one entry per ROM in the order of filenames.'''
+    workers = workers or os.cpu_count() or 1
+    args = (cycles, frames, seconds, engine, ips, seed, quirks)
+    entries = {}
+    start = time.perf_counter()
+    pending = list(filenames)
+    suspects = []               # ROMs running when a worker process died
+    with Manager() as manager:
+        started = manager.dict()
+        while pending or suspects:
+            if suspects:
+                batch = [suspects.pop()]
+            else:
+                batch, pending = pending, []
+            started.clear()
+            broken = []
+            with ProcessPoolExecutor(
+                    max_workers=min(workers, len(batch))) as pool:
+                futures = {pool.submit(farmStartedROM, started, filename,
+                                       *args): filename
+                           for filename in batch}
+                for future in as_completed(futures):
+                    filename = futures[future]
+                    try:
+                        entries[filename] = future.result()
+                    except BrokenProcessPool as error:
+                        broken.append(filename)
+                        failure = error
+                    except Exception as error:
+                        entries[filename] = failedEntry(filename, error)
+            # Only the ROMs that had started can have killed the worker,
+            # unless it died before starting any
+            crashed = [filename for filename in broken
+                       if filename in started] or broken
+            if len(crashed) == 1:
+                entries[crashed[0]] = failedEntry(crashed[0], failure)
+            else:
+                suspects.extend(crashed)
+            pending.extend(filename for filename in broken
+                           if filename not in crashed)
+    elapsed = time.perf_counter() - start
+    roms = [entries[filename] for filename in filenames]
+    totalCycles = sum(entry['cycles'] or 0 for entry in roms)
+    summary = {
+        'roms': len(roms),
+        'ok': sum(entry['status'] == 'ok' for entry in roms),
+        'unknownOpcodes': sum(entry['status'] == 'unknown-opcode'
+                              for entry in roms),
+        'errors': sum(entry['status'] == 'error' for entry in roms),
+        'engine': engine,
+        'workers': workers,
+        'cycles': totalCycles,
+        'seconds': elapsed,
+        'ips': totalCycles / elapsed if elapsed else 0.0
+    }
+    return {'summary': summary, 'roms': roms}
+
+
+def writeJSON(report, filename):
+    '''Write a farm report to a JSON file.'''
+    with open(filename, 'w') as fileBuffer:
+        json.dump(report, fileBuffer, indent=2)
+
+
+def writeCSV(report, filename):
+    '''Write the ROM entries of a farm report to a CSV file.'''
+    with open(filename, 'w', newline='') as fileBuffer:
+        writer = csv.DictWriter(fileBuffer, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(report['roms'])
+
+
+def main(args=None):
+    '''Run every ROM in a directory headless on all cores and print or save
+    the aggregated report.'''
+    parser = argparse.ArgumentParser(
+        prog='python -m chip8.farm',
+        description='Run a directory of CHIP-8 ROMs in parallel without a '
+                    'display.')
+    parser.add_argument('directory', help='directory containing the ROMs')
+    parser.add_argument('--pattern', default='*.ch8',
+                        help='file name pattern of the ROMs (default: *.ch8)')
+    parser.add_argument('--cycles', type=int,
+                        help='stop each ROM after this many cycles')
+    parser.add_argument('--frames', type=int,
+                        help='stop each ROM after this many 60 Hz frames')
+    parser.add_argument('--seconds', type=float,
+                        help='stop each ROM after this many seconds of wall '
+                             'time')
+    parser.add_argument('--engine', default='interpreter',
+                        choices=['interpreter', 'recompiler'],
+                        help='execution engine; the recompiler only speeds up '
+                             'loops of arithmetic, skips and jumps and is up '
+                             'to 20%% slower on code that draws, calls and '
+                             'uses memory (default: interpreter)')
+    parser.add_argument('--ips', type=int, default=600,
+                        help='emulated instructions per second (default: 600)')
+    parser.add_argument('--seed', type=int,
+                        help='random number generator seed, set it to compare '
+                             'framebuffer hashes between runs (default: '
+                             'random)')
+    parser.add_argument('--quirks', default=DEFAULT_PROFILE,
+                        choices=sorted(PROFILES),
+                        help='quirk profile of the CHIP-8 variant the ROMs '
+                             'were written for (default: {})'.format(
+                                 DEFAULT_PROFILE))
+    parser.add_argument('--workers', type=int,
+                        help='number of worker processes (default: all cores)')
+    parser.add_argument('--json', help='write the report to this JSON file')
+    parser.add_argument('--csv', help='write the report to this CSV file')
+    options = parser.parse_args(args)
+    if options.cycles is None and options.frames is None and \
+       options.seconds is None:
+        parser.error('one of --cycles, --frames or --seconds is required')
+    filenames = sorted(glob.glob(os.path.join(options.directory,
+                                              options.pattern)))
+    if not filenames:
+        parser.error('no ROMs match {}'.format(
+            os.path.join(options.directory, options.pattern)))
+    report = farmROMs(filenames,
+                      cycles=options.cycles,
+                      frames=options.frames,
+                      seconds=options.seconds,
+                      engine=options.engine,
+                      ips=options.ips,
+                      seed=options.seed,
+                      quirks=options.quirks,
+                      workers=options.workers)
+    if options.json:
+        writeJSON(report, options.json)
+    if options.csv:
+        writeCSV(report, options.csv)
+    for entry in report['roms']:
+        if entry['status'] == 'ok':
+            print('{:<40} ok     {:>12.0f} IPS  {}'.format(
+                os.path.basename(entry['rom']), entry['ips'],
+                entry['gfxHash']))
+        else:
+            print('{:<40} FAILED {}'.format(
+                os.path.basename(entry['rom']),
+                entry['error']))
+    summary = report['summary']
+    print('ROMs:        {} ({} ok, {} unknown opcodes, {} errors)'.format(
+        summary['roms'], summary['ok'], summary['unknownOpcodes'],
+        summary['errors']))
+    print('Workers:     {}'.format(summary['workers']))
+    print('Cycles:      {}'.format(summary['cycles']))
+    print('Time:        {:.3f} s'.format(summary['seconds']))
+    print('IPS:         {:.0f}'.format(summary['ips']))
+
+
+if __name__ == '__main__':
+    main()
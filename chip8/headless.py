@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import time
+from .chip8 import Chip8
+from .pack import ROMPack
+from .profiler import Profiler
+from .quirks import DEFAULT_PROFILE, PROFILES
+from .trace import TraceBuffer
+
+
+def parseKeyScript(script):
+    '''Parse a key script of comma separated FRAME:KEY[:FRAMES] entries, where
+    KEY is a hexadecimal CHIP-8 key that is held down from FRAME for FRAMES
+    frames (one frame by default). Return a list of (frame, key, frames)
+    tuples.'''
+    presses = []
+    for entry in script.split(','):
+        if not entry.strip():
+            continue
+        fields = entry.strip().split(':')
+        if len(fields) not in (2, 3):
+            raise ValueError('Invalid key script entry: {}'.format(entry))
+        frame = int(fields[0])
+        key = int(fields[1], 16)
+        frames = int(fields[2]) if len(fields) == 3 else 1
+        if not 0 <= key <= 0xF:
+            raise ValueError('Invalid CHIP-8 key: {}'.format(fields[1]))
+        presses.append((frame, key, frames))
+    return presses
+
+
+def hashGFX(chip8):
+    '''Return the SHA-1 hex digest of the packed graphics buffer.'''
+    return hashlib.sha1(chip8.getGFXBytes()).hexdigest()
+
+
+def runROM(filename, cycles=None, frames=None, seconds=None,
+           engine='interpreter', ips=600, keys=(), onFrame=None, seed=None,
+           profiler=None, tracer=None, pack=None, quirks=DEFAULT_PROFILE):
+    '''Load a ROM and emulate it without a display until the cycle, frame or
+    wall-clock time limit is reached, whichever comes first. The keys are a
+    list of (frame, key, frames) presses applied at frame boundaries and
+    onFrame is called with the Chip8 object and frame number after every
+    frame. The seed makes the random numbers, and so the run, reproducible.
+    The profiler and tracer, if given, record every instruction of the run.
+    With a ROMPack, filename is the name or SHA-1 of a ROM in the pack. The
+    quirks are a profile name or Quirks, see Chip8.setQuirks, and are not
+    taken from the pack, which only records the quirk-sensitive instructions
+    a ROM uses. Return a
+    dictionary describing the run and the final state.'''
+    chip8 = Chip8(engine=engine, ips=ips, seed=seed, quirks=quirks)
+    chip8.setProfiler(profiler)
+    chip8.setTracer(tracer)
+    if pack is not None:
+        chip8.loadROMData(pack.getROM(filename))
+    else:
+        chip8.loadROM(filename)
+    result = {'rom': filename, 'engine': engine}
+    result.update(runChip8(chip8, cycles, frames, seconds, keys, onFrame))
+    return result
+
+
+def runChip8(chip8, cycles=None, frames=None, seconds=None, keys=(),
+             onFrame=None):
+    '''Emulate a Chip8 object that already has a ROM loaded, with the same
+    limits and key script as runROM. Return a dictionary describing the run
+    and the final state.'''
+    frame = 0
+    draws = 0
+    idleFrames = 0
+    start = time.perf_counter()
+    deadline = start + seconds if seconds is not None else None
+    while (frames is None or frame < frames) and \
+          (cycles is None or chip8.getCycles() < cycles) and \
+          (deadline is None or time.perf_counter() < deadline):
+        # Hold down the keys scripted for this frame
+        for pressFrame, key, pressFrames in keys:
+            chip8.setKeyState(
+                key, int(pressFrame <= frame < pressFrame + pressFrames))
+        event = 0
+        idle = False
+        while not event & Chip8.EVENT_FRAME:
+            if cycles is not None:
+                if chip8.getCycles() >= cycles:
+                    break
+                event = chip8.runFrame(cycles - chip8.getCycles())
+            else:
+                event = chip8.runFrame()
+            if event & Chip8.EVENT_DRAW:
+                draws += 1
+            idle = bool(event & Chip8.EVENT_IDLE)
+        if event & Chip8.EVENT_FRAME:
+            frame += 1
+            idleFrames += idle
+            if onFrame is not None:
+                onFrame(chip8, frame)
+    elapsed = time.perf_counter() - start
+    state = chip8.getState()
+    return {
+        'cycles': chip8.getCycles(),
+        'frames': frame,
+        'draws': draws,
+        'idleFrames': idleFrames,
+        'seconds': elapsed,
+        'ips': chip8.getCycles() / elapsed if elapsed else 0.0,
+        'pc': state['PRC'],
+        'I': state['ADR'],
+        'V': list(state['REG']),
+        'timers': state['TIM'],
+        'gfxHash': hashGFX(chip8)
+    }
+
+
+def main(args=None):
+    '''Run a ROM headless from the command line and print the throughput,
+    final state and framebuffer hash.'''
+    parser = argparse.ArgumentParser(
+        prog='python -m chip8',
+        description='Run a CHIP-8 ROM without a display.')
+    parser.add_argument('rom', help='path to the ROM file, or its name or '
+                                    'SHA-1 with --pack')
+    parser.add_argument('--pack',
+                        help='load the ROM from this pack, see python -m '
+                             'chip8.pack; the quirks still come from '
+                             '--quirks')
+    parser.add_argument('--cycles', type=int,
+                        help='stop after this many cycles')
+    parser.add_argument('--frames', type=int,
+                        help='stop after this many 60 Hz frames')
+    parser.add_argument('--seconds', type=float,
+                        help='stop after this many seconds of wall time')
+    parser.add_argument('--engine', default='interpreter',
+                        choices=['interpreter', 'recompiler'],
+                        help='execution engine; the recompiler only speeds up '
+                             'loops of arithmetic, skips and jumps and is up '
+                             'to 20%% slower on code that draws, calls and '
+                             'uses memory (default: interpreter)')
+    parser.add_argument('--ips', type=int, default=600,
+                        help='emulated instructions per second (default: 600)')
+    parser.add_argument('--quirks', default=DEFAULT_PROFILE,
+                        choices=sorted(PROFILES),
+                        help='quirk profile of the CHIP-8 variant the ROM was '
+                             'written for (default: {})'.format(
+                                 DEFAULT_PROFILE))
+    parser.add_argument('--seed', type=int,
+                        help='random number generator seed (default: random)')
+    parser.add_argument('--keys', default='',
+                        help='key script of FRAME:KEY[:FRAMES] entries')
+    parser.add_argument('--frame-hashes', action='store_true',
+                        help='print the framebuffer hash whenever it changes')
+    parser.add_argument('--profile', type=int, nargs='?', const=10,
+                        metavar='TOP',
+                        help='profile the run and print the TOP opcode '
+                             'families and addresses (default: 10)')
+    parser.add_argument('--profile-json',
+                        help='profile the run and write the profile to this '
+                             'JSON file')
+    parser.add_argument('--trace',
+                        help='write a trace of every instruction to this '
+                             'file, read it with python -m chip8.trace')
+    options = parser.parse_args(args)
+    if options.cycles is None and options.frames is None and \
+       options.seconds is None:
+        parser.error('one of --cycles, --frames or --seconds is required')
+    try:
+        keys = parseKeyScript(options.keys)
+    except ValueError as error:
+        parser.error(str(error))
+    lastVersion = [None]
+    profiler = None
+    if options.profile is not None or options.profile_json:
+        profiler = Profiler()
+
+    def printFrameHash(chip8, frame):
+        if chip8.getGFXVersion() != lastVersion[0]:
+            lastVersion[0] = chip8.getGFXVersion()
+            print('Frame {:6d}: {}'.format(frame, hashGFX(chip8)))
+
+    pack = None
+    if options.pack:
+        try:
+            pack = ROMPack(options.pack)
+        except ValueError as error:
+            parser.error(str(error))
+        if options.rom not in pack:
+            parser.error('no ROM {} in {}'.format(options.rom, options.pack))
+    traceFile = open(options.trace, 'wb') if options.trace else None
+    tracer = TraceBuffer(stream=traceFile) if traceFile else None
+    onFrame = printFrameHash if options.frame_hashes else None
+    try:
+        result = runROM(options.rom,
+                        cycles=options.cycles,
+                        frames=options.frames,
+                        seconds=options.seconds,
+                        engine=options.engine,
+                        ips=options.ips,
+                        keys=keys,
+                        seed=options.seed,
+                        profiler=profiler,
+                        tracer=tracer,
+                        pack=pack,
+                        quirks=options.quirks,
+                        onFrame=onFrame)
+        if tracer is not None:
+            tracer.flush()
+    finally:
+        if traceFile is not None:
+            traceFile.close()
+        if pack is not None:
+            pack.close()
+    print('ROM:         {}'.format(result['rom']))
+    print('Engine:      {}'.format(result['engine']))
+    print('Cycles:      {}'.format(result['cycles']))
+    print('Frames:      {} ({} idle)'.format(result['frames'],
+                                             result['idleFrames']))
+    print('Time:        {:.3f} s'.format(result['seconds']))
+    print('IPS:         {:.0f}'.format(result['ips']))
+    print('PC:          {:#05x}'.format(result['pc']))
+    print('I:           {:#05x}'.format(result['I']))
+    print('V:           {}'.format(' '.join('{:02x}'.format(v)
+                                            for v in result['V'])))
+    print('Timers:      delay {}, sound {}'.format(*result['timers']))
+    print('Framebuffer: {}'.format(result['gfxHash']))
+    if options.profile is not None:
+        print()
+        print(profiler.formatTable(options.profile))
+    if options.profile_json:
+        profiler.writeJSON(options.profile_json)
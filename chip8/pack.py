@@ -0,0 +1,296 @@
+import argparse
+import glob
+import hashlib
+import mmap
+import os
+import struct
+from collections import namedtuple
+from .disassembler import analyze
+from .quirks import QUIRKS
+
+# Pack files start with a header of the magic, version and number of entries
+PACK_MAGIC = b'C8PK'
+PACK_VERSION = 1
+HEADER = struct.Struct('<4sHxxI')
+# SHA-1, offset and size of the ROM data, quirk-sensitive instructions,
+# offset of the name and title in the string table and their lengths in
+# bytes. Entries are sorted by SHA-1 and then name and are followed by the
+# string table and the ROM data
+ENTRY = struct.Struct('<20sIHHIHH')
+# The largest ROM that fits in memory
+MAX_ROM_SIZE = 4096 - 0x200
+# Extensions of the ROM files found in directories
+ROM_EXTENSIONS = ('.ch8', '.c8')
+
+# An entry of the pack index, sha1 is a hex digest and quirkSensitive a tuple
+# of the names from QUIRKS whose instructions the ROM uses
+PackEntry = namedtuple('PackEntry', ['sha1', 'name', 'title', 'size',
+                                     'quirkSensitive'])
+
+
+def detectQuirkSensitive(romData):
+    '''Return the bitmask of the QUIRKS that change the behavior of an
+    instruction reachable in the static analysis of a ROM, one bit each in
+    their order. This tells which quirks a ROM could be sensitive to, not
+    which variant it was written for, so it does not select a profile.
+    Sprites only count for clip when drawn at coordinates known statically
+    that reach the edge of the screen. Whether a program depends on vblank
+    cannot be told from its instructions, so it is never detected.'''
+    ram = bytearray(4096)
+    ram[0x200:0x200 + len(romData)] = romData
+    instructions = analyze(ram).getInstructions().values()
+    constants = getConstantRegisters(instructions)
+    sensitive = 0
+    for opCode in instructions:
+        nibble = opCode >> 12
+        if nibble == 0x8 and opCode & 0xF in (0x6, 0xE):
+            sensitive |= 1 << QUIRKS.index('shift')
+        elif nibble == 0x8 and opCode & 0xF in (0x1, 0x2, 0x3):
+            sensitive |= 1 << QUIRKS.index('logic')
+        elif nibble == 0xF and opCode & 0xFF in (0x55, 0x65):
+            sensitive |= 1 << QUIRKS.index('memory')
+        elif nibble == 0xB:
+            sensitive |= 1 << QUIRKS.index('jump')
+        elif nibble == 0xD:
+            xs = constants.get((opCode >> 8) & 0xF, ())
+            ys = constants.get((opCode >> 4) & 0xF, ())
+            # DXY0 draws 16x16 sprites
+            width = 16 if opCode & 0xF == 0 else 8
+            height = opCode & 0xF or 16
+            if any(x % 64 + width > 64 for x in xs) or \
+               any(y % 32 + height > 32 for y in ys):
+                sensitive |= 1 << QUIRKS.index('clip')
+    return sensitive
+
+
+def getConstantRegisters(instructions):
+    '''Return a dictionary of the registers that only 6XNN instructions set
+    among instructions, or that none sets, to the set of values they can
+    hold.'''
+    values = {}
+    changed = set()
+    for opCode in instructions:
+        nibble = opCode >> 12
+        x = (opCode >> 8) & 0xF
+        if nibble == 0x6:
+            values.setdefault(x, set()).add(opCode & 0xFF)
+        elif nibble in (0x7, 0xC):
+            changed.add(x)
+        elif nibble == 0x8:
+            changed.add(x)
+            if opCode & 0xF in (0x4, 0x5, 0x6, 0x7, 0xE):
+                changed.add(0xF)
+        elif nibble == 0xF and opCode & 0xFF in (0x07, 0x0A):
+            changed.add(x)
+        elif nibble == 0xF and opCode & 0xFF in (0x65, 0x85):
+            changed.update(range(x + 1))
+    return {register: values.get(register, {0})
+            for register in range(16) if register not in changed}
+
+
+def getTitle(name):
+    '''Return a title made from a ROM file name, without its extension and
+    with underscores as spaces.'''
+    return os.path.splitext(os.path.basename(name))[0].replace('_', ' ')
+
+
+def writePack(filename, roms):
+    '''Write a pack file holding roms, a list of (name, data) or (name, data,
+    title) tuples. The title defaults to one made from the name and the
+    quirk-sensitive instructions are detected. ROMs with the same contents
+    share their data. Return the number of entries written.'''
+    entries = []
+    for rom in roms:
+        name, data = rom[0], bytes(rom[1])
+        title = rom[2] if len(rom) > 2 else getTitle(name)
+        if len(data) > MAX_ROM_SIZE:
+            raise ValueError('The ROM {} is too large to fit in memory!'
+                             .format(name))
+        entries.append((hashlib.sha1(data).digest(), name, title, data))
+    entries.sort(key=lambda entry: entry[:2])
+    strings = bytearray()
+    stringOffsets = []
+    for sha1, name, title, data in entries:
+        encodedName, encodedTitle = name.encode(), title.encode()
+        stringOffsets.append((len(strings), len(encodedName),
+                              len(encodedTitle)))
+        strings += encodedName + encodedTitle
+    # The ROM data is stored once per SHA-1, after the string table
+    offset = HEADER.size + ENTRY.size * len(entries) + len(strings)
+    dataOffsets = {}
+    romData = bytearray()
+    index = bytearray()
+    for (sha1, name, title, data), strOffset in zip(entries, stringOffsets):
+        if sha1 not in dataOffsets:
+            dataOffsets[sha1] = (offset + len(romData),
+                                 detectQuirkSensitive(data))
+            romData += data
+        dataOffset, sensitive = dataOffsets[sha1]
+        index += ENTRY.pack(sha1, dataOffset, len(data), sensitive,
+                            *strOffset)
+    with open(filename, 'wb') as fileBuffer:
+        fileBuffer.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, len(entries)))
+        fileBuffer.write(index)
+        fileBuffer.write(strings)
+        fileBuffer.write(romData)
+    return len(entries)
+
+
+def findROMs(paths):
+    '''Return the sorted ROM files among paths, searching directories and
+    their subdirectories for files with one of the ROM_EXTENSIONS.'''
+    filenames = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for extension in ROM_EXTENSIONS:
+                filenames.update(glob.glob(os.path.join(
+                    path, '**', '*' + extension), recursive=True))
+        else:
+            filenames.add(path)
+    return sorted(filenames)
+
+
+def buildPack(filename, paths):
+    '''Write a pack file holding the ROM files found in paths, named after
+    their file names. Return the number of entries written.'''
+    roms = []
+    for path in findROMs(paths):
+        with open(path, 'rb') as fileBuffer:
+            roms.append((os.path.basename(path), fileBuffer.read()))
+    return writePack(filename, roms)
+
+
+class ROMPack(object):
+    '''ROMPack reads a pack file written by writePack through a read-only
+    memory map, so opening a pack only reads its header. The index is decoded
+    on first use, ROMs are looked up by name or SHA-1 hex digest and their
+    data is sliced straight out of the map, ready for Chip8.loadROMData.'''
+
+    def __init__(self, filename):
+        '''Open the pack file filename.'''
+        self.__file = open(filename, 'rb')
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self.__file.close()
+            raise ValueError('The ROM pack is invalid!')
+        if len(self.__map) < HEADER.size:
+            self.close()
+            raise ValueError('The ROM pack is invalid!')
+        magic, version, self.__count = HEADER.unpack_from(self.__map)
+        if magic != PACK_MAGIC:
+            self.close()
+            raise ValueError('The ROM pack is invalid!')
+        if version != PACK_VERSION:
+            self.close()
+            raise ValueError('The ROM pack was written by an unsupported '
+                             'version!')
+        if len(self.__map) < HEADER.size + ENTRY.size * self.__count:
+            self.close()
+            raise ValueError('The ROM pack is invalid!')
+        self.__entries = None   # Decoded entries, in pack order
+        self.__locations = None  # Offset and size of the data by key
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.__count
+
+    def __contains__(self, key):
+        self.__decodeIndex()
+        return key in self.__locations
+
+    def close(self):
+        '''Unmap and close the pack file.'''
+        self.__map.close()
+        self.__file.close()
+
+    def getEntries(self):
+        '''Return the list of PackEntry of every ROM, sorted by SHA-1.'''
+        self.__decodeIndex()
+        return list(self.__entries)
+
+    def getEntry(self, key):
+        '''Return the PackEntry of the ROM named key or with key as SHA-1 hex
+        digest.'''
+        self.__decodeIndex()
+        return self.__entries[self.__find(key)[2]]
+
+    def getROM(self, key):
+        '''Return the data of the ROM named key or with key as SHA-1 hex
+        digest as bytes.'''
+        self.__decodeIndex()
+        offset, size, _ = self.__find(key)
+        return self.__map[offset:offset + size]
+
+    def __find(self, key):
+        '''Return the offset and size of the data of a ROM and the index of
+        its entry.'''
+        try:
+            return self.__locations[key]
+        except KeyError:
+            raise KeyError('No ROM {} in the pack'.format(key)) from None
+
+    def __decodeIndex(self):
+        '''Decode the index into PackEntry tuples and a dictionary of data
+        locations by name and SHA-1, once.'''
+        if self.__entries is not None:
+            return
+        strings = HEADER.size + ENTRY.size * self.__count
+        entries = []
+        locations = {}
+        index = ENTRY.iter_unpack(self.__map[HEADER.size:strings])
+        for i, (sha1, offset, size, sensitive, strOffset, nameLength,
+                titleLength) in enumerate(index):
+            start = strings + strOffset
+            name = self.__map[start:start + nameLength].decode()
+            title = self.__map[start + nameLength:
+                               start + nameLength + titleLength].decode()
+            digest = sha1.hex()
+            entries.append(PackEntry(digest, name, title, size, tuple(
+                quirk for bit, quirk in enumerate(QUIRKS)
+                if sensitive >> bit & 1)))
+            locations.setdefault(name, (offset, size, i))
+            locations.setdefault(digest, (offset, size, i))
+        self.__entries = entries
+        self.__locations = locations
+
+
+def main(args=None):
+    '''Build a pack from ROM files and directories or list the ROMs of a pack
+    from the command line.'''
+    parser = argparse.ArgumentParser(
+        prog='python -m chip8.pack',
+        description='Build and list CHIP-8 ROM packs.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build a pack from ROM files')
+    build.add_argument('pack', help='path of the pack file to write')
+    build.add_argument('paths', nargs='+',
+                       help='ROM files and directories searched for {} files'
+                            .format(' and '.join(ROM_EXTENSIONS)))
+    listing = commands.add_parser('list', help='list the ROMs of a pack')
+    listing.add_argument('pack', help='path of the pack file')
+    options = parser.parse_args(args)
+    if options.command == 'build':
+        count = buildPack(options.pack, options.paths)
+        print('{} ROMs written to {}'.format(count, options.pack))
+        return
+    try:
+        pack = ROMPack(options.pack)
+    except ValueError as error:
+        parser.error(str(error))
+    with pack:
+        for entry in pack.getEntries():
+            print('{}  {:>5}  {:<32} {}'.format(
+                entry.sha1, entry.size, entry.name,
+                ' '.join(entry.quirkSensitive)))
+
+
+if __name__ == '__main__':
+    main()
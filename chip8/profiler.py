@@ -0,0 +1,106 @@
+import json
+import time
+
+
+class Profiler(object):
+    '''Profiler counts the instructions a Chip8 object executes by opcode
+    family, such as '8XY4' or 'DXYN', by address and by DXYN sprite height,
+    and the wall time spent in the handler of each family. Idle loops that
+    are skipped over are counted as the 'IDLE' family. It is attached with
+    Chip8.setProfiler, which only instruments the instructions decoded while
+    it is attached, so an unprofiled system runs at full speed.'''
+
+    def __init__(self):
+        '''Create a new empty Profiler.'''
+        self.__families = {}        # Family to [executions, seconds]
+        self.__addresses = {}       # Address to executions
+        self.__heights = [0] * 16   # DXYN executions by sprite height
+
+    def clear(self):
+        '''Reset every count and time to zero.'''
+        for stats in self.__families.values():
+            stats[:] = [0, 0.0]
+        self.__addresses.clear()
+        self.__heights[:] = [0] * 16
+
+    def instrument(self, instruction, address, family, height=None):
+        '''Return a function that executes a decoded instruction and records
+        its execution at address, in family and, for DXYN, at the sprite
+        height.'''
+        stats = self.__families.setdefault(family, [0, 0.0])
+        addresses = self.__addresses
+        heights = self.__heights
+        clock = time.perf_counter
+
+        def profiled():
+            start = clock()
+            instruction()
+            stats[1] += clock() - start
+            stats[0] += 1
+            addresses[address] = addresses.get(address, 0) + 1
+            if height is not None:
+                heights[height] += 1
+        return profiled
+
+    def getFamilies(self):
+        '''Return a dictionary of the executions and seconds of each opcode
+        family that was executed.'''
+        return {family: {'executions': stats[0], 'seconds': stats[1]}
+                for family, stats in self.__families.items() if stats[0]}
+
+    def getAddresses(self):
+        '''Return a dictionary of the executions at each address.'''
+        return dict(self.__addresses)
+
+    def getSpriteHeights(self):
+        '''Return a dictionary of the DXYN executions at each sprite height
+        that was drawn.'''
+        return {height: count for height, count in enumerate(self.__heights)
+                if count}
+
+    def getReport(self):
+        '''Return the profile as a dictionary that can be written as JSON,
+        with the addresses as hexadecimal strings.'''
+        families = self.getFamilies()
+        return {
+            'executions': sum(stats['executions']
+                              for stats in families.values()),
+            'seconds': sum(stats['seconds'] for stats in families.values()),
+            'families': families,
+            'addresses': {'{:#05x}'.format(address): count for address, count
+                          in sorted(self.__addresses.items())},
+            'spriteHeights': {str(height): count for height, count
+                              in self.getSpriteHeights().items()}
+        }
+
+    def writeJSON(self, filename):
+        '''Write the profile to a JSON file.'''
+        with open(filename, 'w') as fileBuffer:
+            json.dump(self.getReport(), fileBuffer, indent=2)
+
+    def formatTable(self, top=10):
+        '''Return the profile as text tables of the top opcode families by
+        wall time, the top addresses by executions and the sprite heights.'''
+        families = sorted(self.getFamilies().items(),
+                          key=lambda item: item[1]['seconds'], reverse=True)
+        total = sum(stats['executions'] for _, stats in families) or 1
+        lines = ['Family  Executions      %   Time (ms)  ns/exec']
+        for family, stats in families[:top]:
+            lines.append('{:<6} {:>11} {:>6.1f} {:>11.3f} {:>8.0f}'.format(
+                family, stats['executions'],
+                100.0 * stats['executions'] / total, stats['seconds'] * 1e3,
+                stats['seconds'] * 1e9 / stats['executions']))
+        lines.append('')
+        lines.append('Address Executions      %')
+        addresses = sorted(self.__addresses.items(),
+                           key=lambda item: item[1], reverse=True)
+        for address, count in addresses[:top]:
+            lines.append('0x{:03x}   {:>10} {:>6.1f}'.format(
+                address, count, 100.0 * count / total))
+        heights = self.getSpriteHeights()
+        if heights:
+            lines.append('')
+            lines.append('Height  Draws')
+            for height, count in sorted(heights.items()):
+                lines.append('{:>6} {:>6}'.format(height, count))
+        return '\n'.join(lines)
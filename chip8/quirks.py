@@ -0,0 +1,37 @@
+from collections import namedtuple
+
+# Behaviours that differ between CHIP-8 variants, each one a flag of Quirks
+# that is set when a variant behaves as follows:
+#   shift      8XY6 and 8XYE shift VX in place rather than VY into VX
+#   memory     FX55 and FX65 leave I past the last register they access
+#   jump       BNNN jumps to NNN plus VX, X being the top nibble of NNN, not
+#              V0
+#   logic      8XY1, 8XY2 and 8XY3 reset VF to 0
+#   clip       sprites are clipped at the edges of the screen, not wrapped
+#   vblank     drawing waits for the display interrupt at the end of the
+#              frame
+#   superchip  the SUPER-CHIP instructions exist and DXY0 draws a 16x16
+#              sprite, rather than being unknown opcodes and drawing nothing
+QUIRKS = ('shift', 'memory', 'jump', 'logic', 'clip', 'vblank', 'superchip')
+
+# The quirks a Chip8 object emulates, one flag for each name in QUIRKS. The
+# SUPER-CHIP instructions are there unless disabled
+Quirks = namedtuple('Quirks', QUIRKS, defaults=(True,))
+
+# Quirk profiles by name. CHIP-48 left I one short of the VIP after FX55 and
+# FX65, which is approximated by the VIP behaviour
+PROFILES = {
+    # The original interpreter of the COSMAC VIP
+    'vip': Quirks(shift=False, memory=True, jump=False, logic=True,
+                  clip=True, vblank=True, superchip=False),
+    # CHIP-48 on the HP-48 calculators
+    'chip48': Quirks(shift=True, memory=True, jump=True, logic=False,
+                     clip=True, vblank=False, superchip=False),
+    # SUPER-CHIP 1.1
+    'schip': Quirks(shift=True, memory=False, jump=True, logic=False,
+                    clip=True, vblank=False, superchip=True),
+    # What most modern interpreters and ROMs written for them expect
+    'modern': Quirks(shift=True, memory=False, jump=False, logic=False,
+                     clip=False, vblank=False, superchip=True)
+}
+DEFAULT_PROFILE = 'modern'
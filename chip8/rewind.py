@@ -0,0 +1,98 @@
+import zlib
+from collections import deque
+
+
+class RewindBuffer(object):
+    '''RewindBuffer is a ring buffer of Chip8 save states, newest last. Every
+    keyframeInterval snapshots a full keyframe is stored and the snapshots in
+    between are stored as the XOR of the snapshot and its keyframe, which is
+    almost all zero bytes between nearby frames. Keyframes and deltas are
+    compressed with zlib. The oldest keyframe and its deltas are evicted once
+    the buffer holds more than maxFrames snapshots or maxBytes of data.'''
+
+    def __init__(self, maxFrames=3600, maxBytes=4 * 1024 * 1024,
+                 keyframeInterval=60):
+        '''Create a new empty RewindBuffer.'''
+        # Exceptions
+        self.__emptyBufferException = Exception(
+            'Cannot pop from empty rewind buffer!')
+        self.__sizeException = Exception(
+            'The snapshot size does not match its keyframe!')
+        self.__maxFrames = maxFrames
+        self.__maxBytes = maxBytes
+        self.__keyframeInterval = keyframeInterval
+        # Groups of [compressed keyframe, compressed deltas], oldest first
+        self.__groups = deque()
+        self.__keyframe = None      # Newest keyframe as an integer
+        self.__size = 0             # Size of a snapshot in bytes
+        self.__frames = 0           # Number of snapshots stored
+        self.__bytes = 0            # Size of the compressed data stored
+
+    def isEmpty(self):
+        '''Return true if the buffer holds no snapshots, false otherwise.'''
+        return self.__frames == 0
+
+    def getFrameCount(self):
+        '''Return the number of snapshots in the buffer.'''
+        return self.__frames
+
+    def getSize(self):
+        '''Return the number of bytes of compressed data in the buffer.'''
+        return self.__bytes
+
+    def clear(self):
+        '''Remove every snapshot from the buffer.'''
+        self.__groups.clear()
+        self.__keyframe = None
+        self.__frames = 0
+        self.__bytes = 0
+
+    def push(self, snapshot):
+        '''Add a snapshot as the newest entry of the buffer, evicting the
+        oldest entries if the buffer is full. Every snapshot in the buffer
+        must have the same size.'''
+        groups = self.__groups
+        if self.__frames and len(snapshot) != self.__size:
+            raise self.__sizeException
+        if not groups or len(groups[-1][1]) + 1 >= self.__keyframeInterval:
+            data = zlib.compress(snapshot, 1)
+            groups.append([data, []])
+            self.__keyframe = int.from_bytes(snapshot, 'little')
+            self.__size = len(snapshot)
+        else:
+            if self.__keyframe is None:
+                self.__keyframe = self.__loadKeyframe()
+            delta = int.from_bytes(snapshot, 'little') ^ self.__keyframe
+            data = zlib.compress(delta.to_bytes(self.__size, 'little'), 1)
+            groups[-1][1].append(data)
+        self.__frames += 1
+        self.__bytes += len(data)
+        # Evict whole groups, oldest first, but always keep the newest one
+        while len(groups) > 1 and (self.__frames > self.__maxFrames or
+                                   self.__bytes > self.__maxBytes):
+            data, deltas = groups.popleft()
+            self.__frames -= 1 + len(deltas)
+            self.__bytes -= len(data) + sum(len(delta) for delta in deltas)
+
+    def pop(self):
+        '''Remove the newest snapshot from the buffer and return it.'''
+        if not self.__groups:
+            raise self.__emptyBufferException
+        if self.__keyframe is None:
+            self.__keyframe = self.__loadKeyframe()
+        data, deltas = self.__groups[-1]
+        if deltas:
+            data = deltas.pop()
+            snapshot = int.from_bytes(zlib.decompress(data), 'little') ^ \
+                self.__keyframe
+        else:
+            snapshot = self.__keyframe
+            self.__groups.pop()
+            self.__keyframe = None
+        self.__frames -= 1
+        self.__bytes -= len(data)
+        return snapshot.to_bytes(self.__size, 'little')
+
+    def __loadKeyframe(self):
+        '''Decompress the newest keyframe and return it as an integer.'''
+        return int.from_bytes(zlib.decompress(self.__groups[-1][0]), 'little')
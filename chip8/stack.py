@@ -12,6 +12,10 @@ class Stack(object):
         '''Return true if stack is empty, false otherwise.'''
         return len(self.__stk_pointer) == 0
 
+    def getItems(self):
+        '''Return a list of the items on the stack, from bottom to top.'''
+        return list(self.__stk_pointer)
+
     def clear(self):
         '''Clear the stack.'''
         self.__stk_pointer = []
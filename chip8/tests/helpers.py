@@ -0,0 +1,29 @@
+'''ROM fixtures shared by the tests.'''
+import os
+import tempfile
+
+
+def assemble(program):
+    '''Return the bytes of a program given as a list of 16-bit words at
+    0x200, or as a dictionary of lists of words by address. Gaps are filled
+    with zeros.'''
+    if not isinstance(program, dict):
+        program = {0x200: program}
+    rom = bytearray()
+    for address, words in sorted(program.items()):
+        rom.extend(bytes(address - 0x200 - len(rom)))
+        rom.extend(b''.join(word.to_bytes(2, 'big') for word in words))
+    return bytes(rom)
+
+
+def writeROM(testCase, program, filename=None):
+    '''Write the program, as taken by assemble, to a ROM file and return its
+    name. Without a filename the ROM is written to a temporary file that is
+    removed when testCase finishes.'''
+    if filename is None:
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            filename = tmp.name
+        testCase.addCleanup(os.remove, filename)
+    with open(filename, 'wb') as fileBuffer:
+        fileBuffer.write(assemble(program))
+    return filename
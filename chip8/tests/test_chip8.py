@@ -1,5 +1,6 @@
 import unittest
-from chip8.chip8 import Chip8
+from chip8.chip8 import Chip8, UnknownOpcodeError
+from chip8.quirks import PROFILES, Quirks
 
 class TestChip8(unittest.TestCase):
     def setUp(self):
@@ -10,9 +11,14 @@ class TestChip8(unittest.TestCase):
         # Set opcode in RAM at current PC, always use lowercase for CHIP-8
         opcode_hex = opcode_hex.lower()
         pc = self.chip8.getState()['PRC']
-        self.chip8._Chip8__ram[pc] = opcode_hex[:2]
-        self.chip8._Chip8__ram[pc+1] = opcode_hex[2:]
-        self.chip8._Chip8__opCode = opcode_hex
+        self.chip8._Chip8__ram[pc] = int(opcode_hex[:2], 16)
+        self.chip8._Chip8__ram[pc+1] = int(opcode_hex[2:], 16)
+
+    def load_program(self, words):
+        # Write a list of 16-bit opcodes into RAM starting at 0x200
+        for i, word in enumerate(words):
+            self.chip8._Chip8__ram[0x200 + 2 * i] = word >> 8
+            self.chip8._Chip8__ram[0x201 + 2 * i] = word & 0xFF
 
     def test_reset_initializes_state(self):
         self.chip8.reset()
@@ -45,6 +51,16 @@ class TestChip8(unittest.TestCase):
         self.chip8._Chip8__timers[1] = 5
         self.assertEqual(self.chip8.getSoundTimer(), 5)
 
+    def test_getPC_getOpCode_getStackDepth(self):
+        self.load_program([0x2204, 0x0000, 0x6005])
+        self.assertEqual(self.chip8.getPC(), 0x200)
+        self.assertEqual(self.chip8.getOpCode(), 0x2204)
+        self.assertEqual(self.chip8.getStackDepth(), 0)
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8.getPC(), 0x204)
+        self.assertEqual(self.chip8.getOpCode(), 0x6005)
+        self.assertEqual(self.chip8.getStackDepth(), 1)
+
     def test_getGFX(self):
         self.chip8.reset()
         gfx = self.chip8.getGFX()
@@ -76,15 +92,22 @@ class TestChip8(unittest.TestCase):
 
     def test_00E0_clear_screen(self):
         self.set_opcode('00E0')
-        self.chip8._Chip8__gfx[0][0] = 1
+        self.chip8._Chip8__gfx[0] = 1 << 63
         self.chip8.emulateCycle()
         self.assertTrue(all(all(px == 0 for px in row) for row in self.chip8.getGFX()))
 
     def test_00EE_return_subroutine(self):
-        self.chip8._Chip8__stk.push(600)
+        self.chip8._Chip8__stk[0] = 600
+        self.chip8._Chip8__sp = 1
         self.set_opcode('00EE')
         self.chip8.emulateCycle()
         self.assertEqual(self.chip8.getState()['PRC'], 602)
+        self.assertTrue(self.chip8.getState()['STK'].isEmpty())
+
+    def test_00EE_empty_stack_raises(self):
+        self.set_opcode('00EE')
+        with self.assertRaises(Exception):
+            self.chip8.emulateCycle()
 
     def test_1NNN_jump(self):
         self.set_opcode('1123')
@@ -96,7 +119,14 @@ class TestChip8(unittest.TestCase):
         old_pc = self.chip8.getState()['PRC']
         self.chip8.emulateCycle()
         self.assertEqual(self.chip8.getState()['PRC'], 0x456)
-        self.assertEqual(self.chip8._Chip8__stk.pop(), old_pc)
+        self.assertEqual(self.chip8.getState()['STK'].pop(), old_pc)
+
+    def test_2NNN_stack_overflow_raises(self):
+        self.set_opcode('2200')
+        for _ in range(Chip8.STACK_SIZE):
+            self.chip8.emulateCycle()
+        with self.assertRaises(Exception):
+            self.chip8.emulateCycle()
 
     def test_3XNN_skip_if_equal(self):
         self.chip8._Chip8__V[1] = 0xAB
@@ -217,6 +247,38 @@ class TestChip8(unittest.TestCase):
         self.chip8.emulateCycle()
         self.assertTrue(0 <= self.chip8._Chip8__V[0] <= 0xFF)
 
+    def test_CXNN_masks_random_number(self):
+        self.set_opcode('C00F')
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__V[0] & 0xF0, 0)
+
+    def test_CXNN_is_reproducible_with_seed(self):
+        sequences = []
+        for seed in (1234, 1234, 4321):
+            chip8 = Chip8(seed=seed)
+            chip8.reset()
+            sequences.append([])
+            for _ in range(20):
+                chip8._Chip8__pc = 0x200
+                chip8._Chip8__ram[0x200:0x202] = bytes([0xC0, 0xFF])
+                chip8.emulateCycle()
+                sequences[-1].append(chip8._Chip8__V[0])
+        self.assertEqual(sequences[0], sequences[1])
+        self.assertNotEqual(sequences[0], sequences[2])
+        self.assertGreater(len(set(sequences[0])), 10)
+
+    def test_reset_applies_seed(self):
+        self.chip8.reset(seed=99)
+        self.assertEqual(self.chip8.getSeed(), 99)
+        self.load_program([0xC0FF, 0x1200])
+        self.chip8.emulateCycle()
+        first = self.chip8._Chip8__V[0]
+        # Later resets reuse the seed
+        self.chip8.reset()
+        self.load_program([0xC0FF, 0x1200])
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__V[0], first)
+
     def test_EX9E_skip_if_key_pressed(self):
         self.chip8._Chip8__V[1] = 2
         self.chip8._Chip8__key[2] = 1
@@ -241,15 +303,15 @@ class TestChip8(unittest.TestCase):
         self.chip8._Chip8__V[1] = 9
         self.set_opcode('F115')
         self.chip8.emulateCycle()
-        # Timer is set to 9, then decremented to 8 in the same cycle
-        self.assertEqual(self.chip8._Chip8__timers[0], 8)
+        # Timers count down at 60 Hz, not once per cycle
+        self.assertEqual(self.chip8.getState()['TIM'][0], 9)
 
     def test_FX18_set_sound_timer(self):
         self.chip8._Chip8__V[1] = 8
         self.set_opcode('F118')
         self.chip8.emulateCycle()
-        # Timer is set to 8, then decremented to 7 in the same cycle
-        self.assertEqual(self.chip8._Chip8__timers[1], 7)
+        # Timers count down at 60 Hz, not once per cycle
+        self.assertEqual(self.chip8.getSoundTimer(), 8)
 
     def test_FX1E_add_vx_to_I(self):
         self.chip8._Chip8__V[1] = 5
@@ -269,9 +331,9 @@ class TestChip8(unittest.TestCase):
         self.set_opcode('F133')
         self.chip8.emulateCycle()
         ram = self.chip8._Chip8__ram
-        self.assertEqual(ram[100], '01')
-        self.assertEqual(ram[101], '02')
-        self.assertEqual(ram[102], '03')
+        self.assertEqual(ram[100], 0x01)
+        self.assertEqual(ram[101], 0x02)
+        self.assertEqual(ram[102], 0x03)
 
     def test_FX55_store_registers(self):
         self.chip8._Chip8__V[0] = 1
@@ -280,14 +342,544 @@ class TestChip8(unittest.TestCase):
         self.set_opcode('F155')
         self.chip8.emulateCycle()
         ram = self.chip8._Chip8__ram
-        self.assertEqual(ram[200], '01')
-        self.assertEqual(ram[201], '02')
+        self.assertEqual(ram[200], 0x01)
+        self.assertEqual(ram[201], 0x02)
 
     def test_FX65_load_registers(self):
-        self.chip8._Chip8__ram[200] = '01'
-        self.chip8._Chip8__ram[201] = '02'
+        self.chip8._Chip8__ram[200] = 0x01
+        self.chip8._Chip8__ram[201] = 0x02
         self.chip8._Chip8__I = 200
         self.set_opcode('F165')
         self.chip8.emulateCycle()
         self.assertEqual(self.chip8._Chip8__V[0], 1)
         self.assertEqual(self.chip8._Chip8__V[1], 2)
+
+    def test_state_is_slotted_and_reset_in_place(self):
+        self.assertFalse(hasattr(self.chip8, '__dict__'))
+        ram = self.chip8._Chip8__ram
+        registers = self.chip8._Chip8__V
+        self.chip8._Chip8__V[3] = 7
+        self.chip8.reset()
+        self.assertIs(self.chip8._Chip8__ram, ram)
+        self.assertIs(self.chip8._Chip8__V, registers)
+        self.assertEqual(registers[3], 0)
+
+    def test_setState_restores_stack(self):
+        self.set_opcode('2300')
+        self.chip8.emulateCycle()
+        state = self.chip8.getState()
+        self.chip8.reset()
+        self.chip8.setState(state)
+        self.assertEqual(self.chip8.getState()['STK'].getItems(), [0x200])
+        state['STK'] = [0x200, 0x300]
+        self.chip8.setState(state)
+        self.assertEqual(self.chip8.getState()['STK'].getItems(),
+                         [0x200, 0x300])
+
+    def test_setState_accepts_hex_string_ram(self):
+        state = self.chip8.getState()
+        state['RAM'][512] = 'a2'
+        state['RAM'][513] = 'f0'
+        self.chip8.setState(state)
+        self.assertEqual(self.chip8._Chip8__ram[512], 0xA2)
+        self.assertEqual(self.chip8.getState()['OPC'], 0xA2F0)
+
+    def test_decode_cache_invalidated_by_FX55(self):
+        # 6A12 at 0x200 is decoded, then overwritten with 00E0 by FX55
+        self.set_opcode('6A12')
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__V[0xA], 0x12)
+        self.chip8._Chip8__V[0] = 0x00
+        self.chip8._Chip8__V[1] = 0xE0
+        self.chip8._Chip8__I = 0x200
+        self.set_opcode('F155')
+        self.chip8.emulateCycle()
+        self.chip8._Chip8__pc = 0x200
+        self.chip8._Chip8__gfx[0] = 1 << 63
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8.getGFX()[0][0], 0)
+
+    def test_run_stops_after_draw(self):
+        self.load_program([0x6000, 0xD001, 0x6105])
+        self.assertEqual(self.chip8.run(100), Chip8.EVENT_DRAW)
+        self.assertEqual(self.chip8.getState()['PRC'], 0x204)
+        self.assertEqual(self.chip8.getCycles(), 2)
+
+    def test_run_stops_when_sound_starts(self):
+        self.load_program([0x6003, 0xF018, 0x1204])
+        self.assertEqual(self.chip8.run(100), Chip8.EVENT_SOUND)
+        self.assertEqual(self.chip8.getSoundTimer(), 3)
+
+    def test_run_stops_on_key_wait(self):
+        self.load_program([0xF00A])
+        # Waiting for a key idles for the rest of the run
+        self.assertEqual(self.chip8.run(100),
+                         Chip8.EVENT_KEY_WAIT | Chip8.EVENT_IDLE)
+        self.assertEqual(self.chip8.getCycles(), 100)
+        self.assertEqual(self.chip8.getState()['PRC'], 0x200)
+        self.chip8.setKeyState(7, 1)
+        self.assertEqual(self.chip8.run(1), 0)
+        self.assertEqual(self.chip8._Chip8__V[0], 7)
+
+    def test_run_uses_cycle_budget(self):
+        self.load_program([0x7001, 0x1200])
+        self.assertEqual(self.chip8.run(50), 0)
+        self.assertEqual(self.chip8.getCycles(), 50)
+        self.assertEqual(self.chip8._Chip8__V[0], 25)
+
+    def test_run_skips_jump_to_self(self):
+        self.load_program([0x6001, 0x1202])
+        self.assertEqual(self.chip8.run(1000), Chip8.EVENT_IDLE)
+        self.assertEqual(self.chip8.getCycles(), 1000)
+        self.assertEqual(self.chip8.getState()['PRC'], 0x202)
+        # Single cycles are emulated one at a time
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8.getCycles(), 1001)
+        self.assertEqual(self.chip8.run(1), 0)
+
+    def test_run_skips_delay_timer_polling(self):
+        # Set the delay timer, poll it until it is zero, then count in V2
+        program = [0x6A07, 0xFA15, 0xF107, 0x3100, 0x1204, 0x7201, 0x120A]
+        # The timer reads zero from cycle 70, the run idles if it ends first
+        for budget in (3, 4, 5, 6, 7, 50, 68, 69, 70, 71, 72, 73, 100):
+            stepped = Chip8(seed=1)
+            stepped.reset()
+            skipped = Chip8(seed=1)
+            skipped.reset()
+            for chip8 in (stepped, skipped):
+                chip8._Chip8__ram[0x200:0x20E] = b''.join(
+                    word.to_bytes(2, 'big') for word in program)
+            for _ in range(budget):
+                stepped.emulateCycle()
+            event = skipped.run(budget)
+            self.assertEqual(skipped.getCycles(), budget)
+            for key in ('PRC', 'REG', 'TIM'):
+                self.assertEqual(skipped.getState()[key],
+                                 stepped.getState()[key], (budget, key))
+            self.assertEqual(bool(event & Chip8.EVENT_IDLE),
+                             5 <= budget <= 70, budget)
+
+    def test_runFrame_ends_at_frame_boundary(self):
+        self.load_program([0x7001, 0x1200])
+        self.assertEqual(self.chip8.runFrame(), Chip8.EVENT_FRAME)
+        self.assertEqual(self.chip8.getCycles(), 10)
+        self.chip8.run(3)
+        self.assertEqual(self.chip8.runFrame(), Chip8.EVENT_FRAME)
+        self.assertEqual(self.chip8.getCycles(), 20)
+
+    def test_timers_count_down_at_60_hz(self):
+        self.chip8.setSpeed(600)
+        self.load_program([0x6003, 0xF015, 0xF018, 0x1206])
+        self.chip8.run(3)
+        self.assertEqual(self.chip8.getState()['TIM'], [3, 3])
+        # 600 instructions per second is 10 cycles per tick
+        self.chip8.run(7)
+        self.assertEqual(self.chip8.getState()['TIM'], [2, 2])
+        self.chip8.run(100)
+        self.assertEqual(self.chip8.getState()['TIM'], [0, 0])
+
+    def test_setSpeed_keeps_timer_values(self):
+        self.load_program([0x6005, 0xF015, 0x1204])
+        self.chip8.run(15)
+        self.assertEqual(self.chip8.getState()['TIM'][0], 4)
+        self.chip8.setSpeed(2000)
+        self.assertEqual(self.chip8.getState()['TIM'][0], 4)
+        self.chip8.run(34)
+        self.assertEqual(self.chip8.getState()['TIM'][0], 3)
+
+    def test_runFrame_follows_speed(self):
+        self.chip8.setSpeed(1000)
+        self.load_program([0x1200])
+        frames = []
+        for _ in range(3):
+            self.assertEqual(self.chip8.runFrame(),
+                             Chip8.EVENT_FRAME | Chip8.EVENT_IDLE)
+            frames.append(self.chip8.getCycles())
+        self.assertEqual(frames, [17, 34, 50])
+
+    def test_setSpeed_rejects_invalid_speed(self):
+        with self.assertRaises(Exception):
+            self.chip8.setSpeed(0)
+
+    def test_DXYN_draw_sprite(self):
+        self.chip8._Chip8__V[1] = 2
+        self.chip8._Chip8__V[2] = 3
+        self.chip8._Chip8__I = 0    # Font sprite for 0
+        self.set_opcode('D125')
+        self.chip8.emulateCycle()
+        gfx = self.chip8.getGFX()
+        self.assertEqual([gfx[x][3] for x in range(2, 6)], [1, 1, 1, 1])
+        self.assertEqual([gfx[x][4] for x in range(2, 6)], [1, 0, 0, 1])
+        self.assertEqual(gfx[6][3], 0)
+        self.assertEqual(self.chip8._Chip8__V[15], 0)
+
+    def test_DXYN_collision_erases_pixels(self):
+        self.load_program([0xD125, 0xD125])
+        self.chip8.emulateCycle()
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__V[15], 1)
+        self.assertTrue(all(all(px == 0 for px in col)
+                            for col in self.chip8.getGFX()))
+
+    def test_DXYN_wraps_around_screen(self):
+        self.chip8._Chip8__V[1] = 62
+        self.chip8._Chip8__V[2] = 30
+        self.chip8._Chip8__I = 0
+        self.set_opcode('D125')
+        self.chip8.emulateCycle()
+        gfx = self.chip8.getGFX()
+        # Top row of the 0 sprite is split between columns 62-63 and 0-1
+        self.assertEqual([gfx[x][30] for x in (62, 63, 0, 1, 2)],
+                         [1, 1, 1, 1, 0])
+        # The last three rows wrap to the top of the screen
+        self.assertEqual([gfx[62][y] for y in (31, 0, 1, 2, 3)],
+                         [1, 1, 1, 1, 0])
+
+    def test_default_quirks(self):
+        self.assertEqual(self.chip8.getQuirks(), PROFILES['modern'])
+        self.assertRaises(Exception, Chip8, quirks='unknown')
+        # Instances with the same quirks share their specialized tables
+        self.assertIs(Chip8(quirks='vip')._Chip8__handlers,
+                      Chip8(quirks=PROFILES['vip'])._Chip8__handlers)
+
+    def test_shift_quirk(self):
+        self.chip8._Chip8__V[1] = 0x10
+        self.chip8._Chip8__V[2] = 0x81
+        self.load_program([0x8126, 0x812E])
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__V[1], 0x08)
+        self.assertEqual(self.chip8._Chip8__V[15], 0)
+        # Without the quirk VY is shifted into VX
+        self.chip8.setQuirks('vip')
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__V[1], 0x02)
+        self.assertEqual(self.chip8._Chip8__V[15], 1)
+
+    def test_memory_quirk(self):
+        self.chip8.setQuirks('vip')
+        self.chip8._Chip8__V[0:3] = [1, 2, 3]
+        self.chip8._Chip8__I = 0x300
+        self.load_program([0xF255, 0xF165])
+        self.chip8.emulateCycle()
+        self.assertEqual(list(self.chip8._Chip8__ram[0x300:0x303]), [1, 2, 3])
+        self.assertEqual(self.chip8._Chip8__I, 0x303)
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__I, 0x305)
+
+    def test_jump_quirk(self):
+        self.chip8.setQuirks('schip')
+        self.chip8._Chip8__V[0] = 1
+        self.chip8._Chip8__V[3] = 4
+        self.set_opcode('B310')
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8.getState()['PRC'], 0x314)
+
+    def test_logic_quirk(self):
+        self.chip8.setQuirks(Quirks(shift=True, memory=False, jump=False,
+                                    logic=True, clip=False, vblank=False))
+        self.chip8._Chip8__V[1] = 0x0C
+        self.chip8._Chip8__V[2] = 0x0A
+        self.chip8._Chip8__V[15] = 1
+        self.load_program([0x8122, 0x8F21])
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__V[1], 0x08)
+        self.assertEqual(self.chip8._Chip8__V[15], 0)
+        # VF is reset after the operation even when it is VX
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__V[15], 0)
+
+    def test_clip_quirk(self):
+        self.chip8.setQuirks('schip')
+        self.chip8._Chip8__V[1] = 62
+        self.chip8._Chip8__V[2] = 30
+        self.chip8._Chip8__I = 0
+        self.set_opcode('D125')
+        self.chip8.popDirtyRows()
+        self.chip8.emulateCycle()
+        gfx = self.chip8.getGFX()
+        self.assertEqual([gfx[x][30] for x in (62, 63, 0, 1)], [1, 1, 0, 0])
+        self.assertEqual([gfx[62][y] for y in (30, 31, 0, 1)], [1, 1, 0, 0])
+        self.assertEqual(self.chip8.popDirtyRows(), [30, 31])
+
+    def test_superchip_quirk(self):
+        for profile in PROFILES:
+            with self.subTest(profile=profile):
+                self.chip8.setQuirks(profile)
+                superchip = PROFILES[profile].superchip
+                for opcode in (0x00C1, 0x00FB, 0x00FF, 0xF030, 0xF075):
+                    self.chip8.reset()
+                    self.load_program([opcode])
+                    if superchip:
+                        self.chip8.emulateCycle()
+                    else:
+                        with self.assertRaises(UnknownOpcodeError) as raised:
+                            self.chip8.emulateCycle()
+                        self.assertEqual(raised.exception.pc, 0x200)
+                        self.assertEqual(raised.exception.opCode, opcode)
+                # DXY0 draws a 16x16 sprite or nothing
+                self.chip8.reset()
+                self.chip8.popDirtyRows()
+                self.load_program([0xA000, 0xD000])
+                self.chip8.run(2)
+                self.assertEqual(self.chip8.popDirtyRows(),
+                                 list(range(16)) if superchip else [])
+
+    def test_vblank_quirk(self):
+        self.chip8.setQuirks('vip')
+        self.load_program([0x7001, 0xA000, 0xD015, 0x7001])
+        # The draw on the third cycle waits for the end of the frame, the
+        # tenth cycle at 600 instructions per second
+        self.assertEqual(self.chip8.run(100), Chip8.EVENT_DRAW)
+        self.assertEqual(self.chip8.getCycles(), 10)
+        self.assertEqual(self.chip8.runFrame(1), 0)
+        self.assertEqual(self.chip8._Chip8__V[0], 2)
+
+    def test_vblank_quirk_single_steps(self):
+        self.chip8.setQuirks('vip')
+        self.load_program([0x7001, 0xA000, 0xD015, 0x7001])
+        # Emulating the draw alone, or running it short of the frame, waits
+        # for the end of the frame like a whole run does
+        self.chip8.emulateCycle()
+        self.chip8.emulateCycle()
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8.getCycles(), 10)
+        self.chip8.reset()
+        self.load_program([0x7001, 0xA000, 0xD015, 0x7001])
+        self.assertEqual(self.chip8.runFrame(4), Chip8.EVENT_DRAW |
+                         Chip8.EVENT_FRAME)
+        self.assertEqual(self.chip8.getCycles(), 10)
+
+    def test_loadROMData_selects_quirks(self):
+        self.chip8.loadROMData(bytes([0xA3, 0x00, 0xF1, 0x55, 0xF1, 0x55]),
+                               quirks='vip')
+        self.assertEqual(self.chip8.getQuirks(), PROFILES['vip'])
+        self.assertEqual(self.chip8.getAnalysis().getWrites(),
+                         [(0x300, 0x304)])
+        # Changing the quirks drops the analysis made with the old ones
+        self.chip8.setQuirks('modern')
+        self.assertIsNone(self.chip8.getAnalysis())
+
+    def test_gfx_version_and_dirty_rows(self):
+        self.chip8.popDirtyRows()
+        version = self.chip8.getGFXVersion()
+        self.chip8._Chip8__V[2] = 30
+        self.load_program([0xD125, 0x00E0, 0x00E0])
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8.getGFXVersion(), version + 1)
+        self.assertEqual(self.chip8.popDirtyRows(), [0, 1, 2, 30, 31])
+        self.assertEqual(self.chip8.popDirtyRows(), [])
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8.getGFXVersion(), version + 2)
+        self.assertEqual(self.chip8.popDirtyRows(), [0, 1, 2, 30, 31])
+        # Clearing an empty screen changes nothing
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8.getGFXVersion(), version + 2)
+        self.assertEqual(self.chip8.popDirtyRows(), [])
+
+    def test_publishFrame_swaps_framebuffers(self):
+        self.chip8.popDirtyRows()
+        self.chip8._Chip8__V[2] = 30
+        self.load_program([0xD125, 0x00E0, 0x00FF, 0xD125])
+        self.chip8.emulateCycle()
+        front, rows = self.chip8.publishFrame()
+        self.assertTrue(front.readonly)
+        self.assertEqual(bytes(front), self.chip8.getGFXBytes())
+        self.assertEqual(rows, [0, 1, 2, 30, 31])
+        # An unchanged frame stays published
+        view, rows = self.chip8.publishFrame()
+        self.assertIs(view, front)
+        self.assertEqual(rows, [])
+        # The next frame goes to the other framebuffer, leaving the previous
+        # one as it was
+        drawn = bytes(front)
+        self.chip8.emulateCycle()
+        view, rows = self.chip8.publishFrame()
+        self.assertIsNot(view.obj, front.obj)
+        self.assertFalse(any(view))
+        self.assertEqual(bytes(front), drawn)
+        # High resolution frames fill the whole framebuffer
+        self.chip8.emulateCycle()
+        self.chip8.emulateCycle()
+        view, rows = self.chip8.publishFrame()
+        self.assertIs(view.obj, front.obj)
+        self.assertEqual(len(view), 1024)
+        self.assertEqual(bytes(view), self.chip8.getGFXBytes())
+        self.assertEqual(rows, list(range(64)))
+
+    def test_00FF_and_00FE_switch_resolution(self):
+        self.load_program([0xD125, 0x00FF, 0xD125, 0x00FE])
+        self.chip8.emulateCycle()
+        self.chip8.popDirtyRows()
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8.getResolution(), (128, 64))
+        self.assertEqual(len(self.chip8.getGFX()), 128)
+        self.assertEqual(len(self.chip8.getGFXBytes()), 1024)
+        self.assertEqual(self.chip8.popDirtyRows(), list(range(64)))
+        self.assertFalse(any(self.chip8.getGFXBytes()))
+        self.chip8._Chip8__V[1] = 120
+        self.chip8._Chip8__V[2] = 60
+        self.chip8.emulateCycle()
+        gfx = self.chip8.getGFX()
+        # Sprites wrap around the larger screen
+        self.assertEqual([gfx[x][60] for x in (120, 123, 124)], [1, 1, 0])
+        self.assertEqual(gfx[120][0], 1)
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8.getResolution(), (64, 32))
+        self.assertFalse(any(self.chip8.getGFXBytes()))
+
+    def test_00CN_scroll_down(self):
+        self.load_program([0x00C3, 0x00CF])
+        self.chip8._Chip8__gfx[0] = 1
+        self.chip8._Chip8__gfx[30] = 2
+        self.chip8.popDirtyRows()
+        self.chip8.emulateCycle()
+        gfx = self.chip8._Chip8__gfx
+        self.assertEqual((gfx[0], gfx[3], gfx[30], gfx[31]), (0, 1, 0, 0))
+        self.assertEqual(len(gfx), 32)
+        self.assertEqual(self.chip8.popDirtyRows(), list(range(32)))
+        self.chip8.emulateCycle()
+        self.assertEqual(gfx[18], 1)
+
+    def test_00FB_and_00FC_scroll_right_and_left(self):
+        self.load_program([0x00FB, 0x00FC, 0x00FC])
+        self.chip8._Chip8__gfx[5] = 1 << 63 | 1
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__gfx[5], 1 << 59)
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__gfx[5], 1 << 63)
+        # Pixels scrolled off the left edge are lost
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__gfx[5], 0)
+
+    def test_00FD_exits(self):
+        self.load_program([0x6001, 0x00FD])
+        self.assertEqual(self.chip8.run(100), Chip8.EVENT_IDLE)
+        self.assertEqual(self.chip8.getCycles(), 100)
+        self.assertEqual(self.chip8.getState()['PRC'], 0x202)
+
+    def test_DXY0_draws_16x16_sprite(self):
+        self.load_program([0x00FF, 0xD120, 0xD120])
+        for i in range(32):
+            self.chip8._Chip8__ram[0x300 + i] = 0x80 if i % 2 else 0x01
+        self.chip8._Chip8__I = 0x300
+        self.chip8._Chip8__V[1] = 4
+        self.chip8._Chip8__V[2] = 56
+        self.chip8.emulateCycle()
+        self.chip8.emulateCycle()
+        gfx = self.chip8.getGFX()
+        # Bit 0 of the first byte and bit 7 of the second of each row
+        self.assertEqual([gfx[x][56] for x in (10, 11, 12, 13)],
+                         [0, 1, 1, 0])
+        self.assertEqual(gfx[11][7], 1)
+        self.assertEqual(gfx[11][8], 0)
+        self.assertEqual(self.chip8._Chip8__V[15], 0)
+        self.chip8.emulateCycle()
+        self.assertEqual(self.chip8._Chip8__V[15], 1)
+        self.assertFalse(any(self.chip8.getGFXBytes()))
+
+    def test_FX30_large_font(self):
+        self.chip8._Chip8__V[3] = 0x19
+        self.set_opcode('F330')
+        self.chip8.emulateCycle()
+        address = self.chip8.getState()['ADR']
+        self.assertEqual(address, Chip8.BIG_FONT_ADDRESS + 90)
+        self.assertEqual(bytes(self.chip8._Chip8__ram[address:address + 10]),
+                         Chip8.BIG_FONT_SET[90:100])
+
+    def test_FX75_and_FX85_RPL_flags(self):
+        self.load_program([0xF275, 0xF785])
+        self.chip8._Chip8__V[0:4] = [1, 2, 3, 4]
+        self.chip8.emulateCycle()
+        self.chip8.reset()
+        self.load_program([0xF275, 0xF785])
+        self.chip8._Chip8__pc = 0x202
+        self.chip8._Chip8__V[5] = 9
+        self.chip8.emulateCycle()
+        # The flags survive the reset, unset flags are 0
+        self.assertEqual(self.chip8._Chip8__V[0:8], [1, 2, 3, 0, 0, 0, 0, 0])
+
+    def test_high_resolution_states(self):
+        self.load_program([0x00FF, 0x6042, 0xF075])
+        for _ in range(3):
+            self.chip8.emulateCycle()
+        self.chip8._Chip8__gfx[63] = 1 << 127 | 1
+        data = self.chip8.saveState()
+        state = self.chip8.getState()
+        other = Chip8()
+        other.loadState(data)
+        self.assertEqual(other.getResolution(), (128, 64))
+        self.assertEqual(other.getGFXBytes(), self.chip8.getGFXBytes())
+        self.assertEqual(other._Chip8__flags[0], 0x42)
+        self.assertEqual(other.saveState(), data)
+        other.reset()
+        other.setState(state)
+        self.assertEqual(other.getGFXBytes(), self.chip8.getGFXBytes())
+        # Loading a low resolution state switches back
+        other.reset()
+        self.chip8.loadState(other.saveState())
+        self.assertEqual(self.chip8.getResolution(), (64, 32))
+
+    def test_saveState_and_loadState_round_trip(self):
+        # Call a subroutine that sets the delay timer, draws and loops
+        self.load_program([0x2206, 0x1202, 0x0000, 0x6A40, 0xFA15, 0xD015,
+                           0x7B01, 0x1208])
+        self.chip8.run(3)
+        self.chip8.run(10)
+        data = self.chip8.saveState()
+        self.assertEqual(len(data), Chip8.STATE_SIZE)
+        self.assertEqual(data[:4], Chip8.STATE_MAGIC)
+        other = Chip8()
+        other.loadState(bytes(data))
+        expected = self.chip8.getState()
+        actual = other.getState()
+        for key in ('PRC', 'ADR', 'TIM', 'GFX', 'REG', 'RAM'):
+            self.assertEqual(actual[key], expected[key], key)
+        self.assertEqual(actual['STK'].getItems(), [0x200])
+        self.assertEqual(other.getCycles(), self.chip8.getCycles())
+        # Both systems continue identically, timers included
+        for _ in range(500):
+            self.chip8.emulateCycle()
+            other.emulateCycle()
+        self.assertEqual(other.getState()['TIM'],
+                         self.chip8.getState()['TIM'])
+        self.assertEqual(other.getState()['REG'],
+                         self.chip8.getState()['REG'])
+
+    def test_saveState_includes_random_number_generator(self):
+        self.load_program([0xC0FF, 0xC1FF, 0x1200])
+        self.chip8.emulateCycle()
+        data = self.chip8.saveState()
+        self.chip8.emulateCycle()
+        expected = self.chip8.getState()['REG'][1]
+        other = Chip8(seed=1)
+        other.loadState(data)
+        other.emulateCycle()
+        self.assertEqual(other.getState()['REG'][1], expected)
+
+    def test_saveState_writes_into_buffer(self):
+        buffer = bytearray(Chip8.STATE_SIZE)
+        self.assertIs(self.chip8.saveState(buffer), buffer)
+        self.assertEqual(buffer, self.chip8.saveState())
+
+    def test_loadState_keeps_decoded_instructions(self):
+        self.load_program([0x6A12, 0x1200])
+        data = self.chip8.saveState()
+        self.chip8.run(2)
+        self.chip8.popDirtyRows()
+        version = self.chip8.getGFXVersion()
+        self.chip8.loadState(data)
+        self.assertIn(0x200, self.chip8._Chip8__cache)
+        self.assertEqual(self.chip8.getGFXVersion(), version)
+        self.assertEqual(self.chip8.popDirtyRows(), [])
+        self.assertEqual(self.chip8.getState()['REG'][0xA], 0)
+
+    def test_loadState_rejects_invalid_data(self):
+        data = self.chip8.saveState()
+        corrupted = bytearray(data)
+        corrupted[600] ^= 0xFF
+        wrongVersion = bytearray(data)
+        wrongVersion[4] += 1
+        for invalid in (data[:-1], b'XXXX' + data[4:], corrupted,
+                        wrongVersion):
+            with self.assertRaises(Exception):
+                self.chip8.loadState(invalid)
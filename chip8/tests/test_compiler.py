@@ -0,0 +1,167 @@
+import unittest
+from chip8.chip8 import Chip8
+from chip8.compiler import BlockCompiler
+from chip8.quirks import PROFILES
+from chip8.tests.helpers import assemble, writeROM
+
+# A self-modifying program exercising arithmetic, skips, subroutines, timers,
+# drawing and memory writes. It finishes in a jump-to-self loop at 0x22A.
+PROGRAM = {
+    0x200: [0x6105, 0x6230, 0x63FF, 0xF315, 0x6E00, 0x8E14, 0x8124, 0x8F16,
+            0x8127, 0x812E, 0x7301, 0x606E, 0xA208, 0xF155, 0x2240, 0xF407,
+            0x3400, 0x1208, 0xA300, 0xFE33, 0xF265, 0x122A],
+    0x240: [0x8530, 0x8512, 0x8523, 0x8531, 0x5510, 0x7501, 0x9120, 0x7601,
+            0x4600, 0x6680, 0xF529, 0xD565, 0xF61E, 0x00EE]
+}
+
+
+class TestBlockCompiler(unittest.TestCase):
+    def setUp(self):
+        self.romFile = writeROM(self, PROGRAM)
+
+    def test_compile_stops_at_interpreted_instruction(self):
+        ram = bytearray(4096)
+        ram[0x200:0x206] = bytes([0x60, 0x01, 0x70, 0x02, 0xD0, 0x15])
+        function, cycles, end = BlockCompiler().compile(ram, 0x200)
+        self.assertEqual(cycles, 2)
+        self.assertEqual(end, 0x204)
+        V = [0] * 16
+        self.assertEqual(function(V, ram, 0, [0, 0], 0, None, 2),
+                         (0x204, 0, 2))
+        self.assertEqual(V[0], 3)
+
+    def test_compile_reads_timers_at_instruction_cycle(self):
+        ram = bytearray(4096)
+        ram[0x200:0x206] = bytes([0x60, 0x01, 0x60, 0x02, 0xF1, 0x07])
+        function, cycles, end = BlockCompiler().compile(ram, 0x200)
+        V = [0] * 16
+        # The delay timer expires on tick 5, FX07 executes on cycle 12
+        function(V, ram, 0, [5, 0], 10, lambda cycle: cycle // 4, 3)
+        self.assertEqual(V[1], 2)
+
+    def test_compile_skips_within_block(self):
+        ram = bytearray(4096)
+        ram[0x200:0x20A] = bytes([0x30, 0x05, 0x70, 0x01, 0x70, 0x02,
+                                  0xD0, 0x15])
+        function, cycles, end = BlockCompiler().compile(ram, 0x200)
+        self.assertEqual(cycles, 3)
+        self.assertEqual(end, 0x206)
+        V = [5] + [0] * 15
+        self.assertEqual(function(V, ram, 0, [0, 0], 0, None, 3),
+                         (0x206, 0, 2))
+        self.assertEqual(V[0], 7)
+        V = [4] + [0] * 15
+        self.assertEqual(function(V, ram, 0, [0, 0], 0, None, 3),
+                         (0x206, 0, 3))
+        self.assertEqual(V[0], 7)
+
+    def test_compile_loops_within_budget(self):
+        ram = bytearray(4096)
+        # Count V0 up to 16, then jump forward out of the loop to 00E0
+        ram[0x202:0x20A] = bytes([0x70, 0x01, 0x30, 0x10, 0x12, 0x02,
+                                  0x12, 0x34])
+        function, cycles, end = BlockCompiler().compile(ram, 0x202)
+        self.assertEqual(cycles, 4)
+        self.assertEqual(end, 0x234)
+        V = [0] * 16
+        self.assertEqual(function(V, ram, 0, [0, 0], 0, None, 48),
+                         (0x202, 0, 45))
+        self.assertEqual(V[0], 15)
+        self.assertEqual(function(V, ram, 0, [0, 0], 0, None, 48),
+                         (0x234, 0, 3))
+        self.assertEqual(V[0], 16)
+
+    def test_compile_returns_none_for_interpreted_instruction(self):
+        ram = bytearray(4096)
+        ram[0x200:0x202] = bytes([0x00, 0xE0])
+        self.assertIsNone(BlockCompiler().compile(ram, 0x200))
+
+    def test_recompiler_matches_interpreter(self):
+        interpreter = Chip8()
+        interpreter.loadROM(self.romFile)
+        recompiler = Chip8(engine='recompiler')
+        recompiler.loadROM(self.romFile)
+        cycles = 0
+        while cycles < 3000:
+            cycles += recompiler.emulateBlock()
+        for _ in range(cycles):
+            interpreter.emulateCycle()
+        expected = interpreter.getState()
+        actual = recompiler.getState()
+        self.assertEqual(actual['PRC'], 0x22A)
+        for key in ('PRC', 'ADR', 'TIM', 'GFX', 'REG', 'RAM'):
+            self.assertEqual(actual[key], expected[key], key)
+
+    def test_recompiler_follows_quirks(self):
+        for profile in PROFILES:
+            with self.subTest(profile=profile):
+                interpreter = Chip8(quirks=profile)
+                interpreter.loadROM(self.romFile)
+                recompiler = Chip8(engine='recompiler', quirks=profile)
+                recompiler.loadROM(self.romFile)
+                cycles = 0
+                while cycles < 3000:
+                    cycles += recompiler.emulateBlock()
+                for _ in range(cycles):
+                    interpreter.emulateCycle()
+                expected = interpreter.getState()
+                actual = recompiler.getState()
+                for key in ('PRC', 'ADR', 'TIM', 'GFX', 'REG', 'RAM'):
+                    self.assertEqual(actual[key], expected[key], key)
+
+    def test_compile_jump_quirk(self):
+        ram = bytearray(4096)
+        ram[0x200:0x202] = bytes([0xB3, 0x10])
+        V = [1, 0, 0, 4] + [0] * 12
+        function = BlockCompiler(quirks=PROFILES['schip']).compile(
+            ram, 0x200)[0]
+        self.assertEqual(function(V, ram, 0, [0, 0], 0, None, 1),
+                         (0x314, 0, 1))
+        function = BlockCompiler().compile(ram, 0x200)[0]
+        self.assertEqual(function(V, ram, 0, [0, 0], 0, None, 1),
+                         (0x311, 0, 1))
+
+    def test_recompiler_run_uses_exact_cycle_budget(self):
+        interpreter = Chip8()
+        interpreter.loadROM(self.romFile)
+        recompiler = Chip8(engine='recompiler')
+        recompiler.loadROM(self.romFile)
+        for _ in range(137):
+            interpreter.emulateCycle()
+        while recompiler.getCycles() < 137:
+            recompiler.run(137 - recompiler.getCycles())
+        self.assertEqual(recompiler.getCycles(), 137)
+        self.assertEqual(recompiler.getState()['REG'],
+                         interpreter.getState()['REG'])
+        self.assertEqual(recompiler.getState()['PRC'],
+                         interpreter.getState()['PRC'])
+
+    def test_recompiler_run_matches_interpreter_in_loops(self):
+        programs = [
+            # Count in V4 until the delay timer expires, count in V2 and V3
+            # and start over
+            [0x6005, 0xF015, 0xF107, 0x7401, 0x3100, 0x1204, 0x7201, 0x4204,
+             0x7310, 0x3303, 0x1200, 0x130C],
+            # Skips over skips, jumps and arithmetic
+            [0x6001, 0x3001, 0x4001, 0x7101, 0x5010, 0x9010, 0x7201, 0x4103,
+             0x1218, 0x7001, 0x3102, 0x1202, 0x8124, 0x1202]]
+        for words in programs:
+            rom = assemble(words)
+            interpreter = Chip8()
+            interpreter.loadROMData(rom)
+            recompiler = Chip8(engine='recompiler')
+            recompiler.loadROMData(rom)
+            for cycles in (7, 50, 311, 1000, 2999):
+                recompiler.run(cycles)
+                for _ in range(cycles):
+                    interpreter.emulateCycle()
+                self.assertEqual(recompiler.getCycles(),
+                                 interpreter.getCycles())
+                expected = interpreter.getState()
+                actual = recompiler.getState()
+                for key in ('PRC', 'TIM', 'REG'):
+                    self.assertEqual(actual[key], expected[key], key)
+
+    def test_unknown_engine_raises(self):
+        with self.assertRaises(Exception):
+            Chip8(engine='unknown')
@@ -0,0 +1,125 @@
+import unittest
+from chip8.chip8 import Chip8
+from chip8.debugger import Break, Debugger, parseBreakpoint, parseWatchpoint
+
+
+class TestDebugger(unittest.TestCase):
+    def loaded(self, words, engine='interpreter'):
+        chip8 = Chip8(engine=engine)
+        chip8.loadROMData(b''.join(word.to_bytes(2, 'big') for word in words))
+        return chip8, Debugger(chip8)
+
+    def test_breakpoint_stops_before_instruction(self):
+        for engine in ('interpreter', 'recompiler'):
+            with self.subTest(engine=engine):
+                # Count V0 up in a loop of 0x202 and 0x204
+                chip8, debugger = self.loaded([0x6000, 0x7001, 0x1202],
+                                              engine)
+                debugger.addBreakpoint(0x202)
+                self.assertEqual(chip8.run(100), Chip8.EVENT_BREAK)
+                self.assertEqual(chip8.getCycles(), 1)
+                self.assertEqual(chip8.getState()['PRC'], 0x202)
+                self.assertEqual(chip8.getState()['REG'][0], 0)
+                self.assertEqual(debugger.getBreak(),
+                                 Break('breakpoint', 0x202, 1, None))
+                # Running again resumes, until the next iteration
+                self.assertEqual(chip8.run(100), Chip8.EVENT_BREAK)
+                self.assertEqual(chip8.getCycles(), 3)
+                self.assertEqual(chip8.getState()['REG'][0], 1)
+
+    def test_breakpoint_inside_compiled_block(self):
+        chip8, debugger = self.loaded([0x6000, 0x7001, 0x7001, 0x7001,
+                                       0x1202], 'recompiler')
+        debugger.addBreakpoint(0x204)
+        self.assertEqual(chip8.run(100), Chip8.EVENT_BREAK)
+        self.assertEqual(chip8.getCycles(), 2)
+        self.assertEqual(chip8.getState()['REG'][0], 1)
+
+    def test_conditional_breakpoint(self):
+        chip8, debugger = self.loaded([0x6000, 0x7001, 0x1202])
+        debugger.addBreakpoint(0x202, 0, 5)
+        self.assertEqual(chip8.run(100), Chip8.EVENT_BREAK)
+        self.assertEqual(chip8.getCycles(), 11)
+        self.assertEqual(chip8.getState()['REG'][0], 5)
+        self.assertRaises(ValueError, debugger.addBreakpoint, 0x202, 0)
+
+    def test_watchpoint_stops_after_write(self):
+        chip8, debugger = self.loaded([0xA310, 0x7001, 0xF033, 0x1202])
+        debugger.addWatchpoint(0x312)
+        self.assertEqual(chip8.run(100), Chip8.EVENT_BREAK)
+        self.assertEqual(chip8.getCycles(), 3)
+        self.assertEqual(chip8.getState()['PRC'], 0x206)
+        self.assertEqual(debugger.getBreak(),
+                         Break('watchpoint', 0x204, 2, 0x310))
+        # Writes outside the watched addresses do not stop
+        debugger.removeWatchpoint(0x312)
+        debugger.addWatchpoint(0x313, 0x320)
+        self.assertEqual(chip8.run(100), 0)
+
+    def test_attached_only_while_armed(self):
+        chip8, debugger = self.loaded([0x6000, 0x7001, 0x1202])
+        self.assertIsNone(chip8.getDebugger())
+        debugger.addBreakpoint(0x202)
+        debugger.addWatchpoint(0x300, 0x310)
+        self.assertIs(chip8.getDebugger(), debugger)
+        debugger.removeBreakpoint(0x202)
+        self.assertIs(chip8.getDebugger(), debugger)
+        debugger.clear()
+        self.assertIsNone(chip8.getDebugger())
+        self.assertFalse(debugger.isArmed())
+        self.assertEqual(chip8.run(100), 0)
+
+    def test_step_executes_breakpoint(self):
+        chip8, debugger = self.loaded([0x6005, 0x6106])
+        debugger.addBreakpoint(0x200)
+        self.assertEqual(debugger.step(), 0)
+        self.assertEqual(chip8.getState()['REG'][0], 5)
+        self.assertEqual(chip8.getCycles(), 1)
+        debugger.step()
+        self.assertEqual(chip8.getState()['REG'][1], 6)
+
+    def test_step_waits_for_vblank(self):
+        chip8, debugger = self.loaded([0x7001, 0xA000, 0xD015, 0x7001])
+        chip8.setQuirks('vip')
+        debugger.step()
+        debugger.step()
+        # The draw waits for the end of the frame, the tenth cycle
+        self.assertEqual(debugger.step(), Chip8.EVENT_DRAW)
+        self.assertEqual(chip8.getCycles(), 10)
+        debugger.step()
+        self.assertEqual(chip8.getCycles(), 11)
+
+    def test_stepOver_runs_subroutine(self):
+        # Call the subroutine at 0x208, which sets V0 to 7
+        program = [0x2208, 0x7101, 0x1204, 0x0000, 0x6005, 0x7002, 0x00EE]
+        chip8, debugger = self.loaded(program)
+        self.assertEqual(debugger.stepOver(), 0)
+        self.assertEqual(chip8.getState()['PRC'], 0x202)
+        self.assertEqual(chip8.getState()['REG'][0], 7)
+        self.assertEqual(debugger.getBreakpoints(), {})
+        self.assertIsNone(chip8.getDebugger())
+        # Other instructions are stepped
+        debugger.stepOver()
+        self.assertEqual(chip8.getState()['REG'][1], 1)
+        # Breakpoints inside the subroutine stop it
+        chip8.reset()
+        chip8.loadROMData(b''.join(word.to_bytes(2, 'big')
+                                   for word in program))
+        debugger.addBreakpoint(0x20A)
+        self.assertEqual(debugger.stepOver(), Chip8.EVENT_BREAK)
+        self.assertEqual(chip8.getState()['PRC'], 0x20A)
+        self.assertEqual(debugger.getBreakpoints(), {0x20A: None})
+
+    def test_parse(self):
+        self.assertEqual(parseBreakpoint('2a4'), (0x2A4, None, None))
+        self.assertEqual(parseBreakpoint('2A4 vB=0f'), (0x2A4, 11, 15))
+        self.assertEqual(parseWatchpoint('300'), (0x300, 0x301))
+        self.assertEqual(parseWatchpoint('300-30f'), (0x300, 0x310))
+        for text in ('', 'xyz', '2a4 v3', '2a4 r3=1', '1000', '2a4 v3=100'):
+            self.assertRaises(ValueError, parseBreakpoint, text)
+        for text in ('', '310-300', '300-fff0'):
+            self.assertRaises(ValueError, parseWatchpoint, text)
+
+
+if __name__ == '__main__':
+    unittest.main()
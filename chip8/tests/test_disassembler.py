@@ -0,0 +1,167 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from chip8.chip8 import Chip8
+from chip8.disassembler import analyze, disassemble, main
+from chip8.quirks import PROFILES
+
+
+def program(words, data=None):
+    '''Return a RAM buffer holding words at 0x200 and the optional data words
+    at 0x300.'''
+    ram = bytearray(4096)
+    for start, values in ((0x200, words), (0x300, data or [])):
+        for i, word in enumerate(values):
+            ram[start + 2 * i:start + 2 * i + 2] = word.to_bytes(2, 'big')
+    return ram
+
+
+class TestDisassembler(unittest.TestCase):
+    def test_disassemble_mnemonics(self):
+        self.assertEqual(disassemble(0x00E0), 'CLS')
+        self.assertEqual(disassemble(0x00EE), 'RET')
+        self.assertEqual(disassemble(0x1234), 'JP 0x234')
+        self.assertEqual(disassemble(0x3A0F), 'SE VA, 0x0f')
+        self.assertEqual(disassemble(0x8AB4), 'ADD VA, VB')
+        self.assertEqual(disassemble(0x8A0E), 'SHL VA')
+        self.assertEqual(disassemble(0xB300), 'JP V0, 0x300')
+        self.assertEqual(disassemble(0xD125), 'DRW V1, V2, 5')
+        self.assertEqual(disassemble(0xF355), 'LD [I], V3')
+        self.assertEqual(disassemble(0x0123), 'DW 0x0123')
+        self.assertEqual(disassemble(0x8AB8), 'DW 0x8ab8')
+        # SUPER-CHIP
+        self.assertEqual(disassemble(0x00C4), 'SCD 4')
+        self.assertEqual(disassemble(0x00FF), 'HIGH')
+        self.assertEqual(disassemble(0xF330), 'LD HF, V3')
+        self.assertEqual(disassemble(0xF785), 'LD V7, R')
+
+    def test_exit_ends_path(self):
+        analysis = analyze(program([0x00FF, 0x00FD, 0x1200]))
+        self.assertEqual(sorted(analysis.getInstructions()), [0x200, 0x202])
+
+    def test_follows_jumps_calls_and_skips(self):
+        # Call a subroutine, skip over a jump into data and loop
+        ram = program([0x2208, 0x3000, 0x1300, 0x1200, 0x6001, 0x00EE])
+        analysis = analyze(ram)
+        self.assertEqual(sorted(analysis.getInstructions()),
+                         [0x200, 0x202, 0x204, 0x206, 0x208, 0x20A])
+        self.assertEqual(analysis.getSubroutines(), [0x208])
+        self.assertEqual(analysis.getInvalid(), [0x300])
+        blocks = analysis.getBlocks()
+        self.assertEqual(blocks[0x200], (0x202, [0x208, 0x202]))
+        self.assertEqual(blocks[0x202], (0x204, [0x204, 0x206]))
+        self.assertEqual(blocks[0x206], (0x208, [0x200]))
+        self.assertEqual(blocks[0x208], (0x20C, []))
+        self.assertTrue(analysis.isSound())
+
+    def test_separates_code_from_data(self):
+        ram = program([0xA300, 0xD015, 0x1202], data=[0xF090, 0x9090, 0xF000])
+        analysis = analyze(ram)
+        self.assertEqual(analysis.getDataReferences(), [0x300])
+        self.assertTrue(analysis.isCode(0x205))
+        self.assertFalse(analysis.isCode(0x300))
+        self.assertEqual(analysis.getDataRanges(0x200, 0x306),
+                         [(0x206, 0x306)])
+
+    def test_flags_computed_jumps(self):
+        analysis = analyze(program([0x6002, 0xB204, 0x1204]))
+        self.assertEqual(analysis.getComputedJumps(), [0x202])
+        self.assertNotIn(0x204, analysis.getInstructions())
+        self.assertFalse(analysis.isSound())
+
+    def test_finds_write_ranges(self):
+        # FX33 at a known address and FX55 after FX1E in a loop
+        ram = program([0xA300, 0xF033, 0xA310, 0xF11E, 0xF255, 0x1204])
+        analysis = analyze(ram)
+        self.assertEqual(analysis.getWrites(), [(0x300, 0x303),
+                                                (0x310, 0x412)])
+        self.assertTrue(analysis.isWritten(0x411))
+        self.assertFalse(analysis.isWritten(0x303))
+        self.assertFalse(analysis.isSelfModifying())
+        self.assertTrue(analysis.isSound())
+
+    def test_memory_quirk_moves_address_register(self):
+        ram = program([0xA300, 0xF255, 0xF165, 0xF055, 0x1200])
+        self.assertEqual(analyze(ram).getWrites(), [(0x300, 0x303)])
+        self.assertEqual(analyze(ram, quirks=PROFILES['vip']).getWrites(),
+                         [(0x300, 0x303), (0x305, 0x306)])
+
+    def test_unknown_writes(self):
+        # I is unknown after the call and at the entry point
+        analysis = analyze(program([0x2206, 0xF055, 0x1202, 0x00EE]))
+        self.assertEqual(analysis.getUnknownWrites(), [0x202])
+        self.assertFalse(analysis.isSound())
+
+    def test_self_modifying_code(self):
+        # Store V0 over the instruction at 0x206
+        analysis = analyze(program([0x6012, 0xA206, 0xF055, 0x1200]))
+        self.assertEqual(analysis.getWrites(), [(0x206, 0x207)])
+        self.assertTrue(analysis.isSelfModifying())
+
+    def test_main_prints_listing(self):
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            tmp.write(bytes(program([0xA206, 0xF033, 0x1200, 0xFF00])[0x200:
+                                                                      0x208]))
+        self.addCleanup(os.remove, tmp.name)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main([tmp.name])
+        text = output.getvalue()
+        self.assertIn('loc_200:', text)
+        self.assertIn('202: f033  LD B, V0', text)
+        self.assertIn('206: ff 00', text)
+        self.assertIn('Writes:          206-208', text)
+
+
+class TestChip8Analysis(unittest.TestCase):
+    def loaded(self, words, engine='recompiler'):
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            tmp.write(b''.join(word.to_bytes(2, 'big') for word in words))
+        self.addCleanup(os.remove, tmp.name)
+        chip8 = Chip8(engine=engine, ips=10000)
+        chip8.loadROM(tmp.name)
+        return chip8
+
+    def test_loadROM_analyzes_program(self):
+        chip8 = self.loaded([0xA300, 0xF033, 0x1200])
+        self.assertEqual(chip8.getAnalysis().getWrites(), [(0x300, 0x303)])
+        chip8.reset()
+        self.assertIsNone(chip8.getAnalysis())
+
+    def test_writes_to_data_keep_compiled_blocks(self):
+        chip8 = self.loaded([0xA300, 0x7001, 0xF033, 0x1202])
+        chip8.run(19)
+        self.assertIsNotNone(chip8._Chip8__blocks[0x202][0])
+        value = chip8._Chip8__V[0]
+        self.assertEqual(list(chip8._Chip8__ram[0x300:0x303]),
+                         [value // 100, value // 10 % 10, value % 10])
+
+    def test_self_modified_code_is_interpreted(self):
+        # Rewrite the 7201 at 0x206 with V0 and V1, 0x7205
+        chip8 = self.loaded([0x6072, 0x6105, 0xA206, 0x7201, 0xF155, 0x1206])
+        self.assertTrue(chip8.getAnalysis().isSelfModifying())
+        chip8.run(10)
+        self.assertEqual(chip8.getState()['REG'][2], 1 + 5 + 5)
+        self.assertIsNone(chip8._Chip8__blocks[0x206][0])
+
+    def test_self_modified_jump_into_unreached_code(self):
+        # Write 1300 over the 00E0 at 0x20A, then the code at 0x300, which
+        # the analysis never reached, rewrites its 6505 at 0x30C to 6607
+        words = [0xA20A, 0x6013, 0x6100, 0xF155, 0x6200, 0x00E0, 0x120C]
+        words += [0x0000] * (0x80 - len(words))
+        words += [0x130C] + [0x0000] * 5
+        words += [0x6505, 0x3E00, 0x1310, 0x6E01, 0xA30C, 0x6066, 0x6107,
+                  0xF155, 0x130C]
+        for engine in ('interpreter', 'recompiler'):
+            with self.subTest(engine=engine):
+                chip8 = self.loaded(words, engine)
+                self.assertTrue(chip8.getAnalysis().isSelfModifying())
+                self.assertFalse(chip8.getAnalysis().isSound())
+                chip8.run(100)
+                self.assertEqual(chip8.getState()['REG'][5:7], [5, 7])
+
+
+if __name__ == '__main__':
+    unittest.main()
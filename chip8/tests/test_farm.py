@@ -0,0 +1,90 @@
+import csv
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+from chip8.farm import farmROM, farmROMs, writeCSV, writeJSON
+from chip8.tests.helpers import writeROM
+
+
+def crashingFarmROM(filename, *args):
+    '''Kill the worker process on ROMs named crash, farm the others.'''
+    if os.path.basename(filename).startswith('crash'):
+        os._exit(1)
+    return farmROM(filename, *args)
+
+
+class TestFarm(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        # Draw the font sprite for 0 and loop
+        self.good = self.writeROM('good.ch8', [0xD005, 0x1202])
+        # Clear the screen and hit an opcode missing from the jump tables
+        self.bad = self.writeROM('bad.ch8', [0x00E0, 0x0123])
+        self.large = self.writeROM('large.ch8', [0x1200] * 2000)
+
+    def writeROM(self, name, words):
+        return writeROM(self, words, os.path.join(self.directory, name))
+
+    def test_farmROM_reports_run(self):
+        entry = farmROM(self.good, cycles=100)
+        self.assertEqual(entry['status'], 'ok')
+        self.assertEqual(entry['cycles'], 100)
+        self.assertEqual(entry['draws'], 1)
+        self.assertEqual(len(entry['gfxHash']), 40)
+
+    def test_farmROM_reports_unknown_opcode(self):
+        entry = farmROM(self.bad, cycles=100)
+        self.assertEqual(entry['status'], 'unknown-opcode')
+        self.assertEqual(entry['pc'], 0x202)
+        self.assertEqual(entry['opcode'], 0x0123)
+        self.assertEqual(entry['cycles'], 1)
+
+    def test_farmROM_reports_other_key_errors(self):
+        with mock.patch('chip8.farm.runChip8',
+                        side_effect=KeyError('frames')):
+            entry = farmROM(self.good, cycles=100)
+        self.assertEqual(entry['status'], 'error')
+        self.assertEqual(entry['error'], "KeyError: 'frames'")
+        self.assertEqual(entry['pc'], 0x200)
+
+    def test_farmROMs_uses_quirks(self):
+        # Scroll right, a SUPER-CHIP instruction the VIP does not have
+        schip = self.writeROM('schip.ch8', [0x00FB, 0x1202])
+        report = farmROMs([schip], cycles=100, quirks='vip', workers=1)
+        self.assertEqual(report['roms'][0]['status'], 'unknown-opcode')
+        self.assertEqual(farmROM(schip, cycles=100)['status'], 'ok')
+
+    def test_farmROMs_keeps_running_after_failures(self):
+        report = farmROMs([self.bad, self.good, self.large], frames=10,
+                          workers=2)
+        self.assertEqual([entry['status'] for entry in report['roms']],
+                         ['unknown-opcode', 'ok', 'error'])
+        self.assertEqual(report['summary']['ok'], 1)
+        self.assertEqual(report['summary']['cycles'], 101)
+        jsonFile = os.path.join(self.directory, 'report.json')
+        csvFile = os.path.join(self.directory, 'report.csv')
+        writeJSON(report, jsonFile)
+        writeCSV(report, csvFile)
+        with open(jsonFile) as fileBuffer:
+            self.assertEqual(json.load(fileBuffer), report)
+        with open(csvFile, newline='') as fileBuffer:
+            rows = list(csv.DictReader(fileBuffer))
+        self.assertEqual([row['rom'] for row in rows],
+                         [self.bad, self.good, self.large])
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork',
+                         'workers only see the patch when forked')
+    def test_farmROMs_survives_dead_worker(self):
+        crash = self.writeROM('crash.ch8', [0x1200])
+        filenames = [self.good, crash, self.bad, self.large, self.good]
+        with mock.patch('chip8.farm.farmROM', crashingFarmROM):
+            report = farmROMs(filenames, frames=10, workers=2)
+        self.assertEqual([entry['status'] for entry in report['roms']],
+                         ['ok', 'error', 'unknown-opcode', 'error', 'ok'])
+        self.assertIn('BrokenProcessPool', report['roms'][1]['error'])
+        self.assertNotIn('Worker failed', report['roms'][3]['error'])
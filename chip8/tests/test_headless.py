@@ -0,0 +1,62 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from chip8.headless import main, parseKeyScript, runROM
+from chip8.tests.helpers import writeROM
+
+
+class TestHeadless(unittest.TestCase):
+    def setUp(self):
+        # Wait for a key, store it in V0, draw its font sprite and loop
+        self.romFile = writeROM(self, [0xF00A, 0xF029, 0xD005, 0x1206])
+
+    def test_parseKeyScript(self):
+        self.assertEqual(parseKeyScript('5:a, 10:3:20'),
+                         [(5, 0xA, 1), (10, 0x3, 20)])
+        self.assertEqual(parseKeyScript(''), [])
+        with self.assertRaises(ValueError):
+            parseKeyScript('5')
+
+    def test_runROM_stops_at_cycle_limit(self):
+        result = runROM(self.romFile, cycles=1234, keys=[(0, 1, 1)])
+        self.assertEqual(result['cycles'], 1234)
+        self.assertEqual(result['pc'], 0x206)
+
+    def test_runROM_stops_at_frame_limit(self):
+        result = runROM(self.romFile, frames=7, keys=[(0, 1, 1)])
+        self.assertEqual(result['frames'], 7)
+        self.assertEqual(result['cycles'], 70)
+
+    def test_runROM_applies_key_script(self):
+        result = runROM(self.romFile, frames=10, keys=[(3, 0xB, 2)])
+        self.assertEqual(result['V'][0], 0xB)
+        self.assertEqual(result['draws'], 1)
+        idle = runROM(self.romFile, frames=10)
+        self.assertEqual(idle['pc'], 0x200)
+        self.assertEqual(idle['idleFrames'], 10)
+        self.assertEqual(idle['cycles'], 100)
+        self.assertNotEqual(idle['gfxHash'], result['gfxHash'])
+
+    def test_engines_produce_same_result(self):
+        keys = [(2, 0x7, 1)]
+        interpreted = runROM(self.romFile, cycles=500, keys=keys)
+        recompiled = runROM(self.romFile, cycles=500, keys=keys,
+                            engine='recompiler')
+        for key in ('cycles', 'pc', 'I', 'V', 'gfxHash'):
+            self.assertEqual(interpreted[key], recompiled[key])
+
+    def test_main_prints_report(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main([self.romFile, '--frames', '5', '--keys', '0:2'])
+        self.assertIn('Frames:      5', output.getvalue())
+        self.assertIn('Framebuffer:', output.getvalue())
+
+    def test_runROM_is_reproducible_with_seed(self):
+        # Draw random sprites from the font at random positions
+        romFile = writeROM(self, [0xC00F, 0xF029, 0xC13F, 0xC21F, 0xD125,
+                                  0x1200])
+        hashes = [runROM(romFile, frames=30, seed=seed)['gfxHash']
+                  for seed in (1, 1, 2)]
+        self.assertEqual(hashes[0], hashes[1])
+        self.assertNotEqual(hashes[0], hashes[2])
@@ -0,0 +1,129 @@
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from chip8.chip8 import Chip8
+from chip8.headless import main as headlessMain
+from chip8.pack import (ENTRY, HEADER, ROMPack, buildPack,
+                        detectQuirkSensitive, main, writePack)
+
+
+def words(*values):
+    return b''.join(value.to_bytes(2, 'big') for value in values)
+
+
+class TestPack(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.packFile = os.path.join(self.directory, 'library.c8pk')
+        # Draw the font sprite for 0 and loop, shift and store registers
+        self.draw = words(0xD005, 0x1202)
+        self.shift = words(0x8016, 0xF155, 0x1200)
+
+    def test_write_and_read_pack(self):
+        count = writePack(self.packFile, [('draw_test.ch8', self.draw),
+                                          ('shift.ch8', self.shift, 'Shift'),
+                                          ('copy.ch8', self.draw)])
+        self.assertEqual(count, 3)
+        with ROMPack(self.packFile) as pack:
+            self.assertEqual(len(pack), 3)
+            entry = pack.getEntry('draw_test.ch8')
+            self.assertEqual(entry.sha1, hashlib.sha1(self.draw).hexdigest())
+            self.assertEqual(entry.title, 'draw test')
+            self.assertEqual(entry.size, 4)
+            self.assertEqual(entry.quirkSensitive, ())
+            self.assertEqual(pack.getEntry('shift.ch8').title, 'Shift')
+            self.assertEqual(pack.getEntry('shift.ch8').quirkSensitive,
+                             ('shift', 'memory'))
+            self.assertEqual(pack.getROM('copy.ch8'), self.draw)
+            self.assertEqual(pack.getROM(entry.sha1), self.draw)
+            self.assertIn('shift.ch8', pack)
+            self.assertNotIn('missing.ch8', pack)
+            self.assertRaises(KeyError, pack.getROM, 'missing.ch8')
+            self.assertEqual([entry.sha1 for entry in pack.getEntries()],
+                             sorted(entry.sha1 for entry
+                                    in pack.getEntries()))
+        # ROMs with the same contents share their data
+        self.assertEqual(os.path.getsize(self.packFile),
+                         HEADER.size + 3 * ENTRY.size +
+                         len('draw_test.ch8draw testshift.ch8Shift'
+                             'copy.ch8copy') +
+                         len(self.draw) + len(self.shift))
+
+    def test_rejects_invalid_packs(self):
+        for data in (b'', b'C8P', b'ABCD\x01\x00\x00\x00\x00\x00\x00\x00',
+                     b'C8PK\x01\x00\x00\x00\x05\x00\x00\x00'):
+            with open(self.packFile, 'wb') as fileBuffer:
+                fileBuffer.write(data)
+            self.assertRaises(ValueError, ROMPack, self.packFile)
+        with open(self.packFile, 'wb') as fileBuffer:
+            fileBuffer.write(b'C8PK\x02\x00\x00\x00\x00\x00\x00\x00')
+        with self.assertRaisesRegex(ValueError, 'unsupported'):
+            ROMPack(self.packFile)
+
+    def test_rejects_large_roms(self):
+        self.assertRaises(ValueError, writePack, self.packFile,
+                          [('large.ch8', bytes(4096 - 0x1FF))])
+
+    def test_detectQuirkSensitive(self):
+        for rom, sensitive in (
+                (words(0xB200), 1 << 2),
+                (words(0x8011, 0x1200), 1 << 3),
+                # Unreachable instructions are ignored
+                (words(0x1200, 0x8016), 0),
+                # Only sprites at constant coordinates that reach an edge
+                # count for clip
+                (words(0xD005, 0x1202), 0),
+                (words(0x603C, 0xD005, 0x1204), 1 << 4),
+                (words(0x6110, 0x6130, 0xD015, 0x1206), 0),
+                (words(0x611C, 0xD015, 0x1204), 1 << 4),
+                (words(0x6031, 0xD000, 0x1204), 1 << 4),
+                (words(0x603C, 0x7001, 0xD005, 0x1206), 0)):
+            self.assertEqual(detectQuirkSensitive(rom), sensitive)
+
+    def test_loadROMData(self):
+        writePack(self.packFile, [('draw.ch8', self.draw)])
+        chip8 = Chip8()
+        with ROMPack(self.packFile) as pack:
+            chip8.loadROMData(pack.getROM('draw.ch8'))
+        self.assertEqual(bytes(chip8._Chip8__ram[0x200:0x204]), self.draw)
+        self.assertEqual(sorted(chip8.getAnalysis().getInstructions()),
+                         [0x200, 0x202])
+        chip8.run(1)
+        self.assertEqual(chip8.getGFX()[0][0], 1)
+
+    def test_build_and_list(self):
+        os.mkdir(os.path.join(self.directory, 'games'))
+        for name, data in (('games/draw.ch8', self.draw),
+                           ('shift.c8', self.shift),
+                           ('notes.txt', b'not a ROM')):
+            with open(os.path.join(self.directory, name), 'wb') as fileBuffer:
+                fileBuffer.write(data)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main(['build', self.packFile, self.directory])
+            main(['list', self.packFile])
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], '2 ROMs written to {}'.format(
+            self.packFile))
+        self.assertEqual(sorted(line.split()[2] for line in lines[1:]),
+                         ['draw.ch8', 'shift.c8'])
+
+    def test_headless_runs_rom_from_pack(self):
+        with open(os.path.join(self.directory, 'draw.ch8'), 'wb') as rom:
+            rom.write(self.draw)
+        self.assertEqual(buildPack(self.packFile, [self.directory]), 1)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            headlessMain(['draw.ch8', '--pack', self.packFile,
+                          '--cycles', '10'])
+        self.assertIn('ROM:         draw.ch8', output.getvalue())
+        self.assertIn('Cycles:      10', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
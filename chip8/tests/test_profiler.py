@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from chip8.chip8 import Chip8
+from chip8.headless import main
+from chip8.profiler import Profiler
+from chip8.tests.helpers import writeROM
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        # Count in V0, draw a font sprite and a three row sprite, then loop
+        self.words = [0x7001, 0xF029, 0xD125, 0xD123, 0x1200]
+        self.romFile = writeROM(self, self.words)
+
+    def run_profiled(self, engine='interpreter', cycles=100):
+        chip8 = Chip8(engine=engine, ips=10000)
+        profiler = Profiler()
+        chip8.setProfiler(profiler)
+        chip8.loadROM(self.romFile)
+        while chip8.getCycles() < cycles:
+            chip8.run(cycles - chip8.getCycles())
+        return chip8, profiler
+
+    def test_counts_families_addresses_and_heights(self):
+        chip8, profiler = self.run_profiled()
+        families = profiler.getFamilies()
+        self.assertEqual(sorted(families),
+                         ['1NNN', '7XNN', 'DXYN', 'FX29'])
+        self.assertEqual(families['7XNN']['executions'], 20)
+        self.assertEqual(families['DXYN']['executions'], 40)
+        self.assertGreater(families['DXYN']['seconds'], 0)
+        self.assertEqual(profiler.getAddresses(),
+                         {0x200: 20, 0x202: 20, 0x204: 20, 0x206: 20,
+                          0x208: 20})
+        self.assertEqual(profiler.getSpriteHeights(), {3: 20, 5: 20})
+
+    def test_recompiler_is_bypassed_while_profiling(self):
+        chip8, profiler = self.run_profiled('recompiler', 1000)
+        self.assertEqual(sum(profiler.getAddresses().values()), 1000)
+
+    def test_detaching_removes_instrumentation(self):
+        chip8, profiler = self.run_profiled()
+        chip8.setProfiler(None)
+        chip8.run(100)
+        self.assertEqual(sum(profiler.getAddresses().values()), 100)
+        self.assertIsNone(chip8.getProfiler())
+        profiler.clear()
+        self.assertEqual(profiler.getFamilies(), {})
+
+    def test_idle_loops_are_counted(self):
+        chip8 = Chip8()
+        profiler = Profiler()
+        chip8.setProfiler(profiler)
+        chip8._Chip8__ram[0x200:0x202] = b'\x12\x00'
+        self.assertEqual(chip8.run(500), Chip8.EVENT_IDLE)
+        self.assertEqual(profiler.getFamilies()['IDLE']['executions'], 1)
+
+    def test_report_and_table(self):
+        chip8, profiler = self.run_profiled()
+        report = json.loads(json.dumps(profiler.getReport()))
+        self.assertEqual(report['executions'], 100)
+        self.assertEqual(report['addresses']['0x204'], 20)
+        self.assertEqual(report['spriteHeights'], {'3': 20, '5': 20})
+        table = profiler.formatTable(top=2)
+        self.assertIn('DXYN', table)
+        self.assertEqual(table.count('0x20'), 2)
+
+    def test_main_prints_and_writes_profile(self):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
+            pass
+        self.addCleanup(os.remove, tmp.name)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main([self.romFile, '--cycles', '50', '--profile', '3',
+                  '--profile-json', tmp.name])
+        self.assertIn('Family  Executions', output.getvalue())
+        with open(tmp.name) as fileBuffer:
+            self.assertEqual(json.load(fileBuffer)['executions'], 50)
@@ -0,0 +1,74 @@
+import unittest
+from chip8.chip8 import Chip8
+from chip8.rewind import RewindBuffer
+
+
+class TestRewindBuffer(unittest.TestCase):
+    def setUp(self):
+        # Count in V0 and draw a font sprite every frame
+        self.chip8 = Chip8()
+        self.chip8.reset()
+        for i, word in enumerate([0x7001, 0xF029, 0xD125, 0x1200]):
+            self.chip8._Chip8__ram[0x200 + 2 * i] = word >> 8
+            self.chip8._Chip8__ram[0x201 + 2 * i] = word & 0xFF
+
+    def snapshots(self, count):
+        snapshots = []
+        for _ in range(count):
+            while not self.chip8.runFrame() & Chip8.EVENT_FRAME:
+                pass
+            snapshots.append(bytes(self.chip8.saveState()))
+        return snapshots
+
+    def test_pop_returns_snapshots_newest_first(self):
+        rewind = RewindBuffer(keyframeInterval=4)
+        snapshots = self.snapshots(10)
+        for snapshot in snapshots:
+            rewind.push(snapshot)
+        self.assertEqual(rewind.getFrameCount(), 10)
+        # Rewind part of the way, then continue recording
+        for snapshot in reversed(snapshots[7:]):
+            self.assertEqual(rewind.pop(), snapshot)
+        more = self.snapshots(3)
+        for snapshot in more:
+            rewind.push(snapshot)
+        for snapshot in reversed(snapshots[:7] + more):
+            self.assertEqual(rewind.pop(), snapshot)
+        self.assertTrue(rewind.isEmpty())
+        self.assertEqual(rewind.getSize(), 0)
+        with self.assertRaises(Exception):
+            rewind.pop()
+
+    def test_deltas_are_compressed(self):
+        rewind = RewindBuffer(keyframeInterval=60)
+        snapshots = self.snapshots(60)
+        rewind.push(snapshots[0])
+        keyframe = rewind.getSize()
+        for snapshot in snapshots[1:]:
+            rewind.push(snapshot)
+        self.assertLess((rewind.getSize() - keyframe) / 59,
+                        Chip8.STATE_SIZE / 20)
+
+    def test_evicts_oldest_frames(self):
+        rewind = RewindBuffer(maxFrames=10, keyframeInterval=4)
+        snapshots = self.snapshots(13)
+        for snapshot in snapshots:
+            rewind.push(snapshot)
+        # The first group of four frames was evicted
+        self.assertEqual(rewind.getFrameCount(), 9)
+        for snapshot in reversed(snapshots[4:]):
+            self.assertEqual(rewind.pop(), snapshot)
+        self.assertTrue(rewind.isEmpty())
+
+    def test_evicts_to_memory_cap(self):
+        rewind = RewindBuffer(maxBytes=2000, keyframeInterval=4)
+        for snapshot in self.snapshots(100):
+            rewind.push(snapshot)
+        self.assertLessEqual(rewind.getSize(), 2000)
+        self.assertGreater(rewind.getFrameCount(), 0)
+
+    def test_rejects_snapshots_of_another_size(self):
+        rewind = RewindBuffer()
+        rewind.push(bytes(self.chip8.saveState()))
+        with self.assertRaises(Exception):
+            rewind.push(b'\x00' * 10)
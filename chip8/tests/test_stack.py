@@ -11,6 +11,13 @@ class TestStack(unittest.TestCase):
         self.assertEqual(stack.pop(), 1)
         self.assertTrue(stack.isEmpty())
 
+    def test_getItems(self):
+        stack = Stack()
+        stack.push(1)
+        stack.push(2)
+        self.assertEqual(stack.getItems(), [1, 2])
+        self.assertFalse(stack.isEmpty())
+
     def test_clear(self):
         stack = Stack()
         stack.push(1)
@@ -0,0 +1,103 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from chip8.chip8 import Chip8
+from chip8.headless import main as headlessMain
+from chip8.tests.helpers import writeROM
+from chip8.trace import (RECORD, TraceBuffer, TraceRecord, decodeTrace,
+                         main, readTrace)
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        # Count in V0, point I at its font sprite, draw it and loop
+        self.words = [0x7001, 0xF029, 0xD125, 0x1200]
+        self.romFile = writeROM(self, self.words)
+
+    def traced(self, tracer, engine='interpreter', cycles=8):
+        chip8 = Chip8(engine=engine, ips=10000)
+        chip8.setTracer(tracer)
+        chip8.loadROM(self.romFile)
+        while chip8.getCycles() < cycles:
+            chip8.run(cycles - chip8.getCycles())
+        return chip8
+
+    def test_records_instructions(self):
+        tracer = TraceBuffer(16)
+        self.traced(tracer)
+        records = list(decodeTrace(tracer.getRecords()))
+        self.assertEqual(records[:4], [
+            TraceRecord(0, 0x200, 0x7001, 0, 0, 1),
+            TraceRecord(1, 0x202, 0xF029, 5, None, 0),
+            TraceRecord(2, 0x204, 0xD125, 5, 0xF, 0),
+            TraceRecord(3, 0x206, 0x1200, 5, None, 0)])
+        self.assertEqual(records[6], TraceRecord(6, 0x204, 0xD125, 10, 0xF, 1))
+        self.assertEqual(tracer.getCount(), 8)
+
+    def test_ring_keeps_newest_records(self):
+        tracer = TraceBuffer(3)
+        self.traced(tracer, cycles=10)
+        self.assertEqual(tracer.getCount(), 10)
+        records = list(decodeTrace(tracer.getRecords()))
+        self.assertEqual([record.cycle for record in records], [7, 8, 9])
+
+    def test_recompiled_blocks_record_as_interpreter(self):
+        # A block changing V0, V1, VF and I, which the records must show as
+        # they were after each of its instructions
+        self.words = [0x6005, 0xA300, 0x7001, 0x8104, 0xF01E, 0x8016,
+                      0xF165, 0x1200]
+        self.romFile = writeROM(self, self.words)
+        # Capacities that blocks fill exactly or only part of at the end
+        for capacity in (5, 8, 1024):
+            with self.subTest(capacity=capacity):
+                expected = TraceBuffer(capacity)
+                self.traced(expected, 'interpreter', 400)
+                tracer = TraceBuffer(capacity)
+                chip8 = self.traced(tracer, 'recompiler', 400)
+                self.assertTrue(any(block[0] is not None for block in
+                                    chip8._Chip8__blocks.values()))
+                self.assertEqual(tracer.getCount(), 400)
+                self.assertEqual(tracer.getRecords(), expected.getRecords())
+        chip8.setTracer(None)
+        chip8.run(100)
+        self.assertIsNone(chip8.getTracer())
+        self.assertEqual(tracer.getCount(), 400)
+
+    def test_streams_to_file_and_filters(self):
+        with tempfile.NamedTemporaryFile(delete=False) as stream:
+            tracer = TraceBuffer(5, stream)
+            self.traced(tracer, cycles=42)
+            tracer.flush()
+        self.addCleanup(os.remove, stream.name)
+        self.assertEqual(os.path.getsize(stream.name), 8 + 42 * RECORD.size)
+        records = list(readTrace(stream.name))
+        self.assertEqual([record.cycle for record in records], list(range(42)))
+        draws = list(readTrace(stream.name, opcode=0xD000, mask=0xF000,
+                               start=10, end=30))
+        self.assertEqual([record.cycle for record in draws],
+                         [10, 14, 18, 22, 26])
+        self.assertEqual(len(list(readTrace(stream.name, pcs=[0x200],
+                                            register=0))), 11)
+
+    def test_readTrace_rejects_invalid_file(self):
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            tmp.write(b'C8SS\x01\x00\x10\x00')
+        self.addCleanup(os.remove, tmp.name)
+        with self.assertRaises(ValueError):
+            list(readTrace(tmp.name))
+
+    def test_main_writes_and_prints_trace(self):
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            pass
+        self.addCleanup(os.remove, tmp.name)
+        with redirect_stdout(io.StringIO()):
+            headlessMain([self.romFile, '--cycles', '20', '--trace',
+                          tmp.name])
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main([tmp.name, '--opcode', 'D___', '--limit', '2'])
+        self.assertEqual(output.getvalue().splitlines(), [
+            '         2 0x204 d125 I=0x005 VF=00',
+            '         6 0x204 d125 I=0x00a VF=01'])
@@ -0,0 +1,154 @@
+import unittest
+from chip8.chip8 import Chip8, UnknownOpcodeError
+from chip8.tests.helpers import writeROM
+from chip8.tests.test_compiler import PROGRAM
+
+try:
+    import numpy
+    from chip8.vector import VectorChip8
+except ImportError:
+    numpy = None
+
+
+@unittest.skipUnless(numpy, 'NumPy is not installed')
+class TestVectorChip8(unittest.TestCase):
+    def assertMatchesChip8(self, vector, chips):
+        for i, chip8 in enumerate(chips):
+            expected = chip8.getState()
+            actual = vector.getState(i)
+            for key in ('PRC', 'ADR', 'TIM', 'GFX', 'REG', 'RAM'):
+                self.assertEqual(actual[key], expected[key], key)
+            self.assertEqual(vector.getGFXBytes(i), chip8.getGFXBytes())
+
+    def test_matches_chip8(self):
+        romFile = writeROM(self, PROGRAM)
+        vector = VectorChip8(3, ips=700)
+        vector.loadROM(romFile)
+        chip8 = Chip8(ips=700)
+        chip8.loadROM(romFile)
+        for _ in range(3000):
+            chip8.emulateCycle()
+        vector.run(3000)
+        self.assertEqual(vector.getCycles(), 3000)
+        self.assertEqual(vector.getState(0)['PRC'], 0x22A)
+        self.assertMatchesChip8(vector, [chip8] * 3)
+
+    def test_systems_diverge_on_keys(self):
+        # Wait for a key, draw its font sprite, count the frames until the
+        # delay timer expires and skip over the count while key 1 is held
+        romFile = writeROM(self, {0x200: [0xF00A, 0xF029, 0xD005, 0xF015,
+                                          0xF207, 0x7101, 0x3200, 0x1208,
+                                          0x6301, 0xE39E, 0x7401, 0x1212]})
+        vector = VectorChip8(4)
+        vector.loadROM(romFile)
+        chips = []
+        for i, keys in enumerate([(), (0x1,), (0x7, 0xA), (0xF,)]):
+            chip8 = Chip8()
+            chip8.loadROM(romFile)
+            for key in keys:
+                chip8.setKeyState(key, 1)
+                vector.setKeyState(i, key, 1)
+            chips.append(chip8)
+        for _ in range(500):
+            for chip8 in chips:
+                chip8.emulateCycle()
+            vector.step()
+        self.assertEqual(vector.getState(0)['PRC'], 0x200)
+        self.assertMatchesChip8(vector, chips)
+
+    def test_random_numbers_match_chip8_seeds(self):
+        romFile = writeROM(self, {0x200: [0xC0FF, 0xC10F, 0x8014, 0x1200]})
+        vector = VectorChip8(3, seed=[7, 8, 7])
+        vector.loadROM(romFile)
+        chips = []
+        for seed in (7, 8, 7):
+            chip8 = Chip8(seed=seed)
+            chip8.loadROM(romFile)
+            chips.append(chip8)
+        for _ in range(200):
+            for chip8 in chips:
+                chip8.emulateCycle()
+            vector.step()
+        self.assertMatchesChip8(vector, chips)
+        self.assertNotEqual(vector.getState(0)['REG'],
+                            vector.getState(1)['REG'])
+        self.assertEqual(VectorChip8(2, seed=5).getSeed(1), 6)
+
+    def test_16x16_sprites_match_chip8(self):
+        # Draw the large font sprite for 0 with DXY0 across the right and
+        # bottom edges and over itself
+        romFile = writeROM(self, {0x200: [0xA050, 0x6030, 0x6105, 0xD010,
+                                          0x603A, 0x611C, 0xD010, 0x6034,
+                                          0xD010, 0x1212]})
+        vector = VectorChip8(2)
+        vector.loadROM(romFile)
+        chip8 = Chip8()
+        chip8.loadROM(romFile)
+        for _ in range(40):
+            chip8.emulateCycle()
+        vector.run(40)
+        self.assertTrue(any(vector.getGFXBytes(0)))
+        self.assertMatchesChip8(vector, [chip8] * 2)
+
+    def test_quirks_match_chip8(self):
+        # Shift, OR, store and load registers, draw across the bottom right
+        # corner and jump with BNNN, each of which depends on a quirk
+        romFile = writeROM(self, {0x200: [0x6005, 0x6103, 0x8016, 0x8101,
+                                          0xA300, 0xF155, 0xF065, 0xA000,
+                                          0x603C, 0x611E, 0xD015, 0x6002,
+                                          0x6200, 0xB21E],
+                                  0x21E: [0x7301, 0x7401, 0x1200]})
+        for profile in ('vip', 'chip48', 'schip', 'modern'):
+            with self.subTest(profile=profile):
+                vector = VectorChip8(2, quirks=profile)
+                vector.loadROM(romFile)
+                chip8 = Chip8(quirks=profile)
+                chip8.loadROM(romFile)
+                # Drawing takes the rest of the frame with the vblank quirk
+                for cycle in range(300):
+                    chip8.emulateCycle()
+                    vector.run(chip8.getCycles() - vector.getCycles())
+                    if cycle % 25 == 0:
+                        self.assertMatchesChip8(vector, [chip8] * 2)
+                self.assertEqual(vector.getQuirks(), chip8.getQuirks())
+
+    def test_super_chip_instructions_raise(self):
+        romFile = writeROM(self, {0x200: [0x00FF]})
+        vector = VectorChip8(2)
+        vector.loadROM(romFile)
+        with self.assertRaisesRegex(NotImplementedError, '00FF'):
+            vector.step()
+        vector = VectorChip8(2, quirks='vip')
+        vector.loadROM(romFile)
+        with self.assertRaises(KeyError):
+            vector.step()
+        self.assertRaises(Exception, VectorChip8, 2, quirks='unknown')
+
+    def test_subroutines_use_a_stack_per_system(self):
+        romFile = writeROM(self, {0x200: [0x2206, 0x7001, 0x1204,
+                                          0x7101, 0x00EE]})
+        vector = VectorChip8(2)
+        vector.loadROM(romFile)
+        vector.run(4)
+        state = vector.getState(1)
+        self.assertEqual(state['PRC'], 0x204)
+        self.assertEqual(state['REG'][:2], [1, 1])
+        self.assertTrue(state['STK'].isEmpty())
+
+    def test_stack_overflow_raises(self):
+        romFile = writeROM(self, {0x200: [0x2200]})
+        vector = VectorChip8(2)
+        vector.loadROM(romFile)
+        vector.run(VectorChip8.STACK_SIZE)
+        with self.assertRaises(Exception):
+            vector.step()
+
+    def test_unknown_opcode_raises(self):
+        romFile = writeROM(self, {0x200: [0x00E0, 0x0123]})
+        vector = VectorChip8(2)
+        vector.loadROM(romFile)
+        vector.step()
+        with self.assertRaises(UnknownOpcodeError) as raised:
+            vector.step()
+        self.assertEqual(raised.exception.pc, 0x202)
+        self.assertEqual(raised.exception.opCode, 0x0123)
@@ -0,0 +1,213 @@
+import argparse
+import struct
+from collections import namedtuple
+
+# Trace files start with a header of the magic, version and record size
+TRACE_MAGIC = b'C8TR'
+TRACE_VERSION = 1
+HEADER = struct.Struct('<4sHH')
+# Cycle, PC, opcode, lowest 16 bits of I, changed register and its new value
+RECORD = struct.Struct('<QHHHBB')
+# Register field of the instructions that do not change a register
+NO_REGISTER = 0xFF
+
+# A decoded trace record, register is None if no register was changed
+TraceRecord = namedtuple('TraceRecord',
+                         ['cycle', 'pc', 'opcode', 'I', 'register', 'value'])
+
+
+class TraceBuffer(object):
+    '''TraceBuffer records the instructions executed by a Chip8 object into a
+    preallocated ring buffer of fixed size binary records, one per
+    instruction. Without a stream the buffer keeps the newest capacity
+    records. With a stream, an open binary file, the trace file header is
+    written first and the buffer is written to the stream every time it
+    fills up, so that the whole run is kept. Recording does not allocate.'''
+
+    def __init__(self, capacity=65536, stream=None):
+        '''Create a new empty TraceBuffer holding up to capacity records.'''
+        # Exceptions
+        self.__capacityException = Exception(
+            'The trace buffer must hold at least one record!')
+        if capacity < 1:
+            raise self.__capacityException
+        self.__buffer = bytearray(capacity * RECORD.size)
+        self.__view = memoryview(self.__buffer)
+        self.__cursor = [0]         # Offset of the next record
+        self.__wrapped = False      # Whether older records were overwritten
+        self.__count = 0            # Records in full buffers already passed
+        self.__stream = stream
+        if stream is not None:
+            stream.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, RECORD.size))
+
+    def record(self, cycle, pc, opcode, I, register, value):
+        '''Add the record of an instruction to the buffer. The register is
+        NO_REGISTER for instructions that do not change a register.'''
+        offset = self.__cursor[0]
+        RECORD.pack_into(self.__buffer, offset, cycle, pc, opcode, I,
+                         register, value)
+        offset += RECORD.size
+        if offset == len(self.__buffer):
+            offset = self.__wrap(offset)
+        self.__cursor[0] = offset
+
+    def write(self, records):
+        '''Add records already packed together as bytes to the buffer,
+        wrapping it where they reach its end.'''
+        records = memoryview(records)
+        while records:
+            offset = self.__cursor[0]
+            size = min(len(records), len(self.__buffer) - offset)
+            self.__view[offset:offset + size] = records[:size]
+            records = records[size:]
+            offset += size
+            if offset == len(self.__buffer):
+                offset = self.__wrap(offset)
+            self.__cursor[0] = offset
+
+    def getRecorder(self):
+        '''Return a memoryview of the buffer, a one item list holding the
+        offset of the next record and the function to call with the offset
+        once it reaches the end of the buffer, which returns the new offset.
+        Chip8 uses them to pack records in place without a method call per
+        instruction.'''
+        return self.__view, self.__cursor, self.__wrap
+
+    def getCount(self):
+        '''Return the number of records added since the buffer was created
+        or cleared, including those no longer in the buffer.'''
+        return self.__count + self.__cursor[0] // RECORD.size
+
+    def getRecords(self):
+        '''Return the records held in the buffer, oldest first, as bytes that
+        decodeTrace can read. Records already written to the stream are not
+        included.'''
+        offset = self.__cursor[0]
+        if self.__wrapped:
+            return bytes(self.__view[offset:]) + bytes(self.__view[:offset])
+        return bytes(self.__view[:offset])
+
+    def flush(self):
+        '''Write the records not yet written to the stream, if there is one,
+        and flush the stream.'''
+        if self.__stream is not None:
+            offset = self.__cursor[0]
+            if offset:
+                self.__stream.write(self.__view[:offset])
+            self.__count += offset // RECORD.size
+            self.__cursor[0] = 0
+            self.__stream.flush()
+
+    def clear(self):
+        '''Remove every record from the buffer without writing it.'''
+        self.__cursor[0] = 0
+        self.__wrapped = False
+        self.__count = 0
+
+    def __wrap(self, offset):
+        '''Write the full buffer to the stream, if there is one, or mark the
+        oldest records as overwritten, and return the offset of the next
+        record.'''
+        if self.__stream is not None:
+            self.__stream.write(self.__view)
+        else:
+            self.__wrapped = True
+        self.__count += offset // RECORD.size
+        return 0
+
+
+def decodeTrace(data, pcs=None, opcode=None, mask=0xFFFF, register=None,
+                start=None, end=None):
+    '''Decode the records in data, bytes without a header, and yield those
+    that match every filter given. The filters are a collection of program
+    counters, an opcode compared after applying mask to both, such as 0xD000
+    with mask 0xF000 for every DXYN, the register changed and the range of
+    cycles from start up to end.'''
+    for fields in RECORD.iter_unpack(data):
+        cycle, pc, opCode = fields[0:3]
+        if pcs is not None and pc not in pcs:
+            continue
+        if opcode is not None and opCode & mask != opcode & mask:
+            continue
+        if register is not None and fields[4] != register:
+            continue
+        if start is not None and cycle < start:
+            continue
+        if end is not None and cycle >= end:
+            continue
+        yield TraceRecord(cycle, pc, opCode, fields[3],
+                          fields[4] if fields[4] != NO_REGISTER else None,
+                          fields[5])
+
+
+def readTrace(filename, **filters):
+    '''Read a trace file written by a TraceBuffer and yield the records that
+    match the filters of decodeTrace.'''
+    with open(filename, 'rb') as fileBuffer:
+        data = fileBuffer.read()
+    if len(data) < HEADER.size:
+        raise ValueError('The trace file is invalid!')
+    magic, version, size = HEADER.unpack_from(data)
+    if magic != TRACE_MAGIC or size != RECORD.size or \
+       (len(data) - HEADER.size) % size:
+        raise ValueError('The trace file is invalid!')
+    if version != TRACE_VERSION:
+        raise ValueError('The trace file was written by an unsupported '
+                         'version!')
+    return decodeTrace(memoryview(data)[HEADER.size:], **filters)
+
+
+def formatRecord(record):
+    '''Return a trace record as a line of text.'''
+    change = ''
+    if record.register is not None:
+        change = 'V{:X}={:02x}'.format(record.register, record.value)
+    return '{:>10} {:#05x} {:04x} I={:#05x} {}'.format(
+        record.cycle, record.pc, record.opcode, record.I, change).rstrip()
+
+
+def main(args=None):
+    '''Print the records of a trace file that match the filters given on the
+    command line.'''
+    parser = argparse.ArgumentParser(
+        prog='python -m chip8.trace',
+        description='Decode and filter a CHIP-8 instruction trace.')
+    parser.add_argument('trace', help='path to the trace file')
+    parser.add_argument('--pc', type=lambda text: int(text, 16),
+                        action='append',
+                        help='only show the instructions at this hexadecimal '
+                             'address, may be repeated')
+    parser.add_argument('--opcode',
+                        help='only show the opcodes matching this pattern of '
+                             'hexadecimal digits and wildcards, such as D___ '
+                             'or 8__4')
+    parser.add_argument('--register', type=lambda text: int(text, 16),
+                        help='only show the instructions that change this '
+                             'register')
+    parser.add_argument('--start', type=int,
+                        help='only show the instructions from this cycle')
+    parser.add_argument('--end', type=int,
+                        help='only show the instructions before this cycle')
+    parser.add_argument('--limit', type=int,
+                        help='stop after this many records')
+    options = parser.parse_args(args)
+    opcode = None
+    mask = 0xFFFF
+    if options.opcode is not None:
+        if len(options.opcode) != 4:
+            parser.error('the opcode pattern must have four digits')
+        opcode = int(''.join(c if c != '_' else '0' for c in options.opcode),
+                     16)
+        mask = int(''.join('0' if c == '_' else 'F' for c in options.opcode),
+                   16)
+    records = readTrace(options.trace, pcs=options.pc, opcode=opcode,
+                        mask=mask, register=options.register,
+                        start=options.start, end=options.end)
+    for i, record in enumerate(records):
+        if options.limit is not None and i >= options.limit:
+            break
+        print(formatRecord(record))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,652 @@
+import numpy as np
+from .chip8 import Chip8, UnknownOpcodeError
+from .quirks import DEFAULT_PROFILE, PROFILES, Quirks
+from .stack import Stack
+
+
+class VectorChip8(object):
+    '''VectorChip8 emulates a batch of CHIP-8 systems in lockstep. The state of
+    every system is held in NumPy arrays with one row per system and each step
+    executes one instruction on all of them at once. Systems are grouped by the
+    class of the instruction at their program counter and each group is
+    executed with masked array operations, so the cost of a step grows with
+    the number of distinct instructions rather than the number of systems.
+    The quirks are emulated as in Chip8, but the SUPER-CHIP instructions
+    other than DXY0 are not: there is no high resolution mode.'''
+
+    # Depth of the call stack of each system
+    STACK_SIZE = 16
+
+    def __init__(self, count, ips=600, seed=None, quirks=DEFAULT_PROFILE):
+        '''Create a batch of count CHIP-8 systems. The speed is the number of
+        instructions emulated per second of emulated time, the delay and sound
+        timers count down at 60 Hz. The seed of the random number generator
+        used by CXNN is applied on every reset as in Chip8. It is either a
+        sequence with one seed per system or a single seed, in which case
+        system i uses the seed plus i. A new random seed is chosen for every
+        system on every reset if it is None. The quirks are Quirks or the
+        name of one of the PROFILES, as in Chip8.setQuirks. With the superchip
+        quirk, the SUPER-CHIP instructions other than DXY0 raise a
+        NotImplementedError.'''
+        # Exceptions
+        self.__romSizeException = Exception(
+            'The ROM file is too large to fit in memory!')
+        self.__speedException = Exception(
+            'The speed must be a positive number of instructions!')
+        self.__stackOverflowException = Exception(
+            'Cannot push to a full stack!')
+        self.__emptyStackException = Exception('Cannot pop from empty stack!')
+        self.__quirksException = Exception(
+            'The specified quirk profile does not exist!')
+        if ips <= 0:
+            raise self.__speedException
+        if not isinstance(quirks, Quirks):
+            if quirks not in PROFILES:
+                raise self.__quirksException
+            quirks = PROFILES[quirks]
+        self.__quirks = quirks
+        self.__count = count        # Number of systems
+        self.__ips = ips            # Instructions per second
+        self.__cycles = 0           # Number of cycles emulated by each system
+        self.__seeds = None         # Random number generator seeds
+        self.__rng = None           # Random number generator states
+        self.__all = np.arange(count)
+        self.__waitUntil = None     # Cycle each system waits for (vblank)
+        # Instruction handlers, indexed by the class in the opcode table
+        self.__handlers = []
+        self.__classTable = self.__buildClassTable()
+        self.reset(seed)
+
+    def __buildClassTable(self):
+        '''Return an array mapping each of the 65536 opcodes to the index of
+        its handler, or -1 for opcodes that do not decode. Opcodes decode the
+        same way as in Chip8 with the same quirks, which only looks at the
+        bits below. Later patterns take precedence.'''
+        quirks = self.__quirks
+        patterns = [(0x00E0, 0xFFFF, self.__inst00E0),
+                    (0x00EE, 0xFFFF, self.__inst00EE),
+                    (0x1000, 0xF000, self.__inst1NNN),
+                    (0x2000, 0xF000, self.__inst2NNN),
+                    (0x3000, 0xF000, self.__inst3XNN),
+                    (0x4000, 0xF000, self.__inst4XNN),
+                    (0x5000, 0xF000, self.__inst5XY0),
+                    (0x6000, 0xF000, self.__inst6XNN),
+                    (0x7000, 0xF000, self.__inst7XNN),
+                    (0x8000, 0xF00F, self.__inst8XY0),
+                    (0x8001, 0xF00F, self.__inst8XY1),
+                    (0x8002, 0xF00F, self.__inst8XY2),
+                    (0x8003, 0xF00F, self.__inst8XY3),
+                    (0x8004, 0xF00F, self.__inst8XY4),
+                    (0x8005, 0xF00F, self.__inst8XY5),
+                    (0x8006, 0xF00F, self.__inst8XY6),
+                    (0x8007, 0xF00F, self.__inst8XY7),
+                    (0x800E, 0xF00F, self.__inst8XYE),
+                    (0x9000, 0xF000, self.__inst9XY0),
+                    (0xA000, 0xF000, self.__instANNN),
+                    (0xB000, 0xF000, self.__instBNNN),
+                    (0xC000, 0xF000, self.__instCXNN),
+                    (0xD000, 0xF000, self.__instDXYN),
+                    (0xD000, 0xF00F, self.__instDXY0),
+                    (0xE09E, 0xF0FF, self.__instEX9E),
+                    (0xE0A1, 0xF0FF, self.__instEXA1),
+                    (0xF007, 0xF0FF, self.__instFX07),
+                    (0xF00A, 0xF0FF, self.__instFX0A),
+                    (0xF015, 0xF0FF, self.__instFX15),
+                    (0xF018, 0xF0FF, self.__instFX18),
+                    (0xF01E, 0xF0FF, self.__instFX1E),
+                    (0xF029, 0xF0FF, self.__instFX29),
+                    (0xF033, 0xF0FF, self.__instFX33),
+                    (0xF055, 0xF0FF, self.__instFX55),
+                    (0xF065, 0xF0FF, self.__instFX65)]
+        if not quirks.shift:
+            patterns += [(0x8006, 0xF00F, self.__instVY8XY6),
+                         (0x800E, 0xF00F, self.__instVY8XYE)]
+        if quirks.memory:
+            patterns += [(0xF055, 0xF0FF, self.__instIncrementFX55),
+                         (0xF065, 0xF0FF, self.__instIncrementFX65)]
+        if quirks.jump:
+            patterns.append((0xB000, 0xF000, self.__instVXBNNN))
+        if quirks.logic:
+            patterns += [(0x8001, 0xF00F, self.__instReset8XY1),
+                         (0x8002, 0xF00F, self.__instReset8XY2),
+                         (0x8003, 0xF00F, self.__instReset8XY3)]
+        if quirks.clip:
+            patterns += [(0xD000, 0xF000, self.__instClipDXYN),
+                         (0xD000, 0xF00F, self.__instClipDXY0)]
+        if quirks.superchip:
+            patterns += [(0x00C0, 0xFFF0, self.__instSuperChip),
+                         (0x00FB, 0xFFFF, self.__instSuperChip),
+                         (0x00FC, 0xFFFF, self.__instSuperChip),
+                         (0x00FD, 0xFFFF, self.__instSuperChip),
+                         (0x00FE, 0xFFFF, self.__instSuperChip),
+                         (0x00FF, 0xFFFF, self.__instSuperChip),
+                         (0xF030, 0xF0FF, self.__instSuperChip),
+                         (0xF075, 0xF0FF, self.__instSuperChip),
+                         (0xF085, 0xF0FF, self.__instSuperChip)]
+        else:
+            # DXY0 draws a sprite of no rows
+            patterns.append((0xD000, 0xF00F, self.__instClipDXYN
+                             if quirks.clip else self.__instDXYN))
+        if quirks.vblank:
+            patterns = [(pattern, mask, self.__waitingDraw(handler))
+                        if pattern == 0xD000 else (pattern, mask, handler)
+                        for pattern, mask, handler in patterns]
+        opCodes = np.arange(0x10000)
+        table = np.full(0x10000, -1, dtype=np.int8)
+        for pattern, mask, handler in patterns:
+            table[(opCodes & mask) == pattern] = len(self.__handlers)
+            self.__handlers.append(handler)
+        return table
+
+    def reset(self, seed=None):
+        '''Reset every system to it's original state. Clear all registers,
+        graphics buffers, key states, timers, RAM, stacks and program counters
+        and load the default fontset. Seed the random number generators with
+        the specified seed, which is then used by later resets, or with the
+        seed given at construction.'''
+        count = self.__count
+        if seed is not None:
+            if np.ndim(seed):
+                seeds = np.array(seed, dtype=np.uint64)
+            else:
+                seeds = np.arange(count, dtype=np.uint64) + np.uint64(seed)
+            self.__seeds = seeds & np.uint64(0xFFFFFFFF)
+        if self.__seeds is not None:
+            seeds = self.__seeds
+        else:
+            seeds = np.random.default_rng().integers(
+                0, 1 << 32, count, dtype=np.uint64)
+        # The same initial xorshift32 state as Chip8 gives for each seed
+        states = (seeds * np.uint64(0x9E3779B1) + np.uint64(0x7F4A7C15)) & \
+            np.uint64(0xFFFFFFFF)
+        states[states == 0] = 0x7F4A7C15
+        self.__rng = states.astype(np.uint32)
+        self.__cycles = 0
+        self.__waitUntil = np.zeros(count, dtype=np.int64)
+        self.__pc = np.full(count, 512, dtype=np.int64)
+        self.__I = np.zeros(count, dtype=np.int64)
+        self.__V = np.zeros((count, 16), dtype=np.uint8)
+        self.__timers = np.zeros((count, 2), dtype=np.int64)
+        self.__stk = np.zeros((count, self.STACK_SIZE), dtype=np.int64)
+        self.__sp = np.zeros(count, dtype=np.int64)
+        self.__key = np.zeros((count, 16), dtype=np.uint8)
+        # One 64 bit mask per row, the most significant bit is the leftmost
+        # pixel as in Chip8
+        self.__gfx = np.zeros((count, 32), dtype=np.uint64)
+        self.__ram = np.zeros((count, 4096), dtype=np.uint8)
+        fonts = Chip8.FONT_SET + Chip8.BIG_FONT_SET
+        self.__ram[:, 0:len(fonts)] = np.frombuffer(fonts, dtype=np.uint8)
+
+    def loadROM(self, filename):
+        '''Reset every system and load a file's binary data into their RAM.'''
+        self.reset()
+        with open(filename, 'rb') as fileBuffer:
+            romData = fileBuffer.read()
+        if len(romData) > 4096 - 512:
+            raise self.__romSizeException
+        self.__ram[:, 512:512 + len(romData)] = \
+            np.frombuffer(romData, dtype=np.uint8)
+
+    def getCount(self):
+        '''Return the number of systems in the batch.'''
+        return self.__count
+
+    def getSeed(self, system):
+        '''Return the seed applied to the random number generator of a system
+        on reset, or None if a new random seed is chosen on every reset.'''
+        if self.__seeds is not None:
+            return int(self.__seeds[system])
+
+    def getSpeed(self):
+        '''Return the number of instructions emulated per second.'''
+        return self.__ips
+
+    def getQuirks(self):
+        '''Return the Quirks emulated.'''
+        return self.__quirks
+
+    def getCycles(self):
+        '''Return the number of cycles each system emulated since the last
+        reset.'''
+        return self.__cycles
+
+    def setKeyState(self, system, key, state):
+        '''Set the state of a key. The system and key may also be arrays to
+        set several keys at once.'''
+        self.__key[system, key] = state
+
+    def getGFXBytes(self, system):
+        '''Return the graphics buffer of a system packed into bytes in the
+        same layout as Chip8.getGFXBytes.'''
+        return self.__gfx[system].astype('>u8').tobytes()
+
+    def getState(self, system):
+        '''Return the state of a system in the same format as
+        Chip8.getState.'''
+        tick = self.__tickAt(self.__cycles)
+        pc = int(self.__pc[system])
+        ram = self.__ram[system]
+        stack = Stack()
+        for address in self.__stk[system, :self.__sp[system]]:
+            stack.push(int(address))
+        gfx = [int(row) for row in self.__gfx[system]]
+        return {
+            'PRC': pc,
+            'ADR': int(self.__I[system]),
+            'OPC': (int(ram[pc]) << 8) | int(ram[pc + 1]),
+            'TIM': [max(int(timer) - tick, 0)
+                    for timer in self.__timers[system]],
+            'GFX': [[(row >> (63 - x)) & 1 for row in gfx] for x in range(64)],
+            'KEY': [int(key) for key in self.__key[system]],
+            'REG': [int(register) for register in self.__V[system]],
+            'STK': stack,
+            'RAM': ['{:02x}'.format(byte) for byte in ram.tolist()]
+        }
+
+    def step(self):
+        '''Emulate one cycle on every system. Fetch the opcode at each program
+        counter, group the systems by instruction and execute each group with
+        its handler. Systems waiting for the display interrupt after drawing
+        (vblank quirk) execute nothing until the frame ends, as the draw takes
+        the rest of the frame in Chip8. Raise an UnknownOpcodeError for the
+        first system whose opcode does not decode.'''
+        systems = self.__all
+        if self.__quirks.vblank:
+            systems = systems[self.__waitUntil <= self.__cycles]
+        if len(systems):
+            self.__execute(systems)
+        self.__cycles += 1
+
+    def __execute(self, systems):
+        '''Execute the instructions at the program counters of systems.'''
+        pc = self.__pc[systems]
+        ram = self.__ram
+        opCodes = (ram[systems, pc].astype(np.int64) << 8) | \
+            ram[systems, pc + 1]
+        classes = self.__classTable[opCodes]
+        if classes.min() < 0:
+            unknown = np.argmax(classes < 0)
+            raise UnknownOpcodeError(int(pc[unknown]),
+                                     int(opCodes[unknown]))
+        if classes.max() == classes.min():
+            # Every system executes the same instruction
+            self.__handlers[classes[0]](systems, opCodes)
+        else:
+            order = np.argsort(classes, kind='stable')
+            bounds = np.cumsum(np.bincount(classes))
+            start = 0
+            for handler, end in zip(self.__handlers, bounds):
+                if end > start:
+                    group = order[start:end]
+                    handler(systems[group], opCodes[group])
+                start = end
+
+    def run(self, cycles):
+        '''Emulate the specified number of cycles on every system.'''
+        for _ in range(cycles):
+            self.step()
+
+    def __tickAt(self, cycle):
+        '''Return the number of 60 Hz timer ticks of emulated time that have
+        elapsed at the specified cycle.'''
+        return cycle * 60 // self.__ips
+
+    def __frameEnd(self):
+        '''Return the first cycle of the next 60 Hz timer tick.'''
+        return -(-(self.__tickAt(self.__cycles) + 1) * self.__ips // 60)
+
+    def __waitingDraw(self, draw):
+        '''Return a variant of a draw handler that waits for the display
+        interrupt after drawing (vblank quirk).'''
+        def handler(s, op):
+            draw(s, op)
+            self.__waitUntil[s] = self.__frameEnd()
+        return handler
+
+    def __instSuperChip(self, s, op):
+        '''SUPER-CHIP instructions other than DXY0, which are not
+        emulated.'''
+        raise NotImplementedError(
+            'VectorChip8 does not emulate the SUPER-CHIP instruction '
+            '{:04X}'.format(int(op[0])))
+
+    def __skip(self, s, condition):
+        '''Advance the program counters of the systems s past the next
+        instruction where condition holds and to it otherwise.'''
+        self.__pc[s] += np.where(condition, 4, 2)
+
+    def __inst00E0(self, s, op):
+        '''0x00E0: Clear the graphics buffer.'''
+        self.__gfx[s] = 0
+        self.__pc[s] += 2
+
+    def __inst00EE(self, s, op):
+        '''00EE: Return from subroutine.'''
+        if (self.__sp[s] == 0).any():
+            raise self.__emptyStackException
+        self.__sp[s] -= 1
+        self.__pc[s] = self.__stk[s, self.__sp[s]] + 2
+
+    def __inst1NNN(self, s, op):
+        '''1NNN: Jump to address NNN.'''
+        self.__pc[s] = op & 0xFFF
+
+    def __inst2NNN(self, s, op):
+        '''2NNN: Call subroutine at NNN.'''
+        if (self.__sp[s] == self.STACK_SIZE).any():
+            raise self.__stackOverflowException
+        self.__stk[s, self.__sp[s]] = self.__pc[s]
+        self.__sp[s] += 1
+        self.__pc[s] = op & 0xFFF
+
+    def __inst3XNN(self, s, op):
+        '''3XNN: Skip the next instruction if VX equals NN.'''
+        self.__skip(s, self.__V[s, (op >> 8) & 0xF] == (op & 0xFF))
+
+    def __inst4XNN(self, s, op):
+        '''4XNN: Skip the next instruction if VX doesn't equal NN.'''
+        self.__skip(s, self.__V[s, (op >> 8) & 0xF] != (op & 0xFF))
+
+    def __inst5XY0(self, s, op):
+        '''5XY0: Skip the next instruction if VX equals VY.'''
+        V = self.__V
+        self.__skip(s, V[s, (op >> 8) & 0xF] == V[s, (op >> 4) & 0xF])
+
+    def __inst6XNN(self, s, op):
+        '''6XNN: Set VX to NN.'''
+        self.__V[s, (op >> 8) & 0xF] = op & 0xFF
+        self.__pc[s] += 2
+
+    def __inst7XNN(self, s, op):
+        '''7XNN: Add NN to VX.'''
+        x = (op >> 8) & 0xF
+        self.__V[s, x] = (self.__V[s, x] + (op & 0xFF)) & 0xFF
+        self.__pc[s] += 2
+
+    def __inst8XY0(self, s, op):
+        '''8XY0: Set VX to the value of VY.'''
+        self.__V[s, (op >> 8) & 0xF] = self.__V[s, (op >> 4) & 0xF]
+        self.__pc[s] += 2
+
+    def __inst8XY1(self, s, op):
+        '''8XY1: Set VX to VX OR VY.'''
+        x = (op >> 8) & 0xF
+        self.__V[s, x] |= self.__V[s, (op >> 4) & 0xF]
+        self.__pc[s] += 2
+
+    def __inst8XY2(self, s, op):
+        '''8XY2: Set VX to VX AND VY.'''
+        x = (op >> 8) & 0xF
+        self.__V[s, x] &= self.__V[s, (op >> 4) & 0xF]
+        self.__pc[s] += 2
+
+    def __inst8XY3(self, s, op):
+        '''8XY3: Set VX to VX XOR VY.'''
+        x = (op >> 8) & 0xF
+        self.__V[s, x] ^= self.__V[s, (op >> 4) & 0xF]
+        self.__pc[s] += 2
+
+    def __instReset8XY1(self, s, op):
+        '''8XY1: Set VX to VX OR VY and VF to 0 (logic quirk).'''
+        self.__inst8XY1(s, op)
+        self.__V[s, 15] = 0
+
+    def __instReset8XY2(self, s, op):
+        '''8XY2: Set VX to VX AND VY and VF to 0 (logic quirk).'''
+        self.__inst8XY2(s, op)
+        self.__V[s, 15] = 0
+
+    def __instReset8XY3(self, s, op):
+        '''8XY3: Set VX to VX XOR VY and VF to 0 (logic quirk).'''
+        self.__inst8XY3(s, op)
+        self.__V[s, 15] = 0
+
+    # The flag instructions below write VF before VX, and read VX and VY again
+    # after writing VF, in the same order as Chip8 does. This matters when X or
+    # Y is F.
+
+    def __inst8XY4(self, s, op):
+        '''8XY4: Add VY to VX. VF is set to 1 when there's a carry, and to 0
+        when there isn't.'''
+        V = self.__V
+        x = (op >> 8) & 0xF
+        result = V[s, x].astype(np.int64) + V[s, (op >> 4) & 0xF]
+        V[s, 15] = result > 0xFF
+        V[s, x] = result & 0xFF
+        self.__pc[s] += 2
+
+    def __inst8XY5(self, s, op):
+        '''8XY5: Subtract VY from VX. VF is set to 0 when there's a borrow, and
+        1 when there isn't.'''
+        V = self.__V
+        x = (op >> 8) & 0xF
+        y = (op >> 4) & 0xF
+        V[s, 15] = V[s, x] >= V[s, y]
+        V[s, x] = V[s, x] - V[s, y]
+        self.__pc[s] += 2
+
+    def __inst8XY6(self, s, op):
+        '''8XY6: Shift VX right by 1. VF is set to the value of the least
+        significant bit of VX before the shift.'''
+        V = self.__V
+        x = (op >> 8) & 0xF
+        V[s, 15] = V[s, x] & 0x1
+        V[s, x] = V[s, x] >> 1
+        self.__pc[s] += 2
+
+    def __instVY8XY6(self, s, op):
+        '''8XY6: Set VX to VY shifted right by 1. VF is set to the value of
+        the least significant bit of VY before the shift (without the shift
+        quirk).'''
+        V = self.__V
+        y = (op >> 4) & 0xF
+        V[s, 15] = V[s, y] & 0x1
+        V[s, (op >> 8) & 0xF] = V[s, y] >> 1
+        self.__pc[s] += 2
+
+    def __inst8XY7(self, s, op):
+        '''8XY7: Set VX to VY minus VX. VF is set to 0 when there's a borrow,
+        and 1 when there isn't.'''
+        V = self.__V
+        x = (op >> 8) & 0xF
+        y = (op >> 4) & 0xF
+        V[s, 15] = V[s, y] >= V[s, x]
+        V[s, x] = V[s, y] - V[s, x]
+        self.__pc[s] += 2
+
+    def __inst8XYE(self, s, op):
+        '''8XYE: Shift VX left by one. VF is set to the value of the most
+        significant bit of VX before the shift.'''
+        V = self.__V
+        x = (op >> 8) & 0xF
+        V[s, 15] = (V[s, x] >> 7) & 0x1
+        V[s, x] = V[s, x] << 1
+        self.__pc[s] += 2
+
+    def __instVY8XYE(self, s, op):
+        '''8XYE: Set VX to VY shifted left by one. VF is set to the value of
+        the most significant bit of VY before the shift (without the shift
+        quirk).'''
+        V = self.__V
+        y = (op >> 4) & 0xF
+        V[s, 15] = (V[s, y] >> 7) & 0x1
+        V[s, (op >> 8) & 0xF] = V[s, y] << 1
+        self.__pc[s] += 2
+
+    def __inst9XY0(self, s, op):
+        '''9XY0: Skip the next instruction if VX doesn't equal VY.'''
+        V = self.__V
+        self.__skip(s, V[s, (op >> 8) & 0xF] != V[s, (op >> 4) & 0xF])
+
+    def __instANNN(self, s, op):
+        '''ANNN: Set I to the address NNN.'''
+        self.__I[s] = op & 0xFFF
+        self.__pc[s] += 2
+
+    def __instBNNN(self, s, op):
+        '''BNNN: Jump to the address NNN plus V0.'''
+        self.__pc[s] = (op & 0xFFF) + self.__V[s, 0]
+
+    def __instVXBNNN(self, s, op):
+        '''BXNN: Jump to the address XNN plus VX (jump quirk).'''
+        self.__pc[s] = (op & 0xFFF) + self.__V[s, (op >> 8) & 0xF]
+
+    def __instCXNN(self, s, op):
+        '''CXNN: Set VX to a random number and NN.'''
+        # Advance the xorshift32 generators and use their highest byte
+        r = self.__rng[s]
+        r ^= r << np.uint32(13)
+        r ^= r >> np.uint32(17)
+        r ^= r << np.uint32(5)
+        self.__rng[s] = r
+        self.__V[s, (op >> 8) & 0xF] = (r >> np.uint32(24)) & op & 0xFF
+        self.__pc[s] += 2
+
+    def __instDXYN(self, s, op):
+        '''DXYN: Draw a sprite at coordinate (VX, VY) that has a width of 8
+        pixels and a height of N pixels.'''
+        self.__drawSprites(s, op, op & 0xF, 8, False)
+
+    def __instDXY0(self, s, op):
+        '''DXY0: Draw a 16x16 sprite at coordinate (VX, VY), two bytes per
+        row (SUPER-CHIP).'''
+        self.__drawSprites(s, op, np.full(len(s), 16), 16, False)
+
+    def __instClipDXYN(self, s, op):
+        '''DXYN: Draw a sprite at coordinate (VX, VY) that has a width of 8
+        pixels and a height of N pixels, clipped at the edges of the screen
+        (clip quirk).'''
+        self.__drawSprites(s, op, op & 0xF, 8, True)
+
+    def __instClipDXY0(self, s, op):
+        '''DXY0: Draw a 16x16 sprite at coordinate (VX, VY), two bytes per
+        row, clipped at the edges of the screen (SUPER-CHIP, clip quirk).'''
+        self.__drawSprites(s, op, np.full(len(s), 16), 16, True)
+
+    def __drawSprites(self, s, op, n, width, clip):
+        '''Draw the sprites of DXYN and DXY0 on the systems s, n rows high
+        and width pixels wide, 8 or 16, with the rows stored in one byte or
+        two. The sprites wrap around the edges of the screen, or are clipped
+        at them if clip is set.'''
+        V = self.__V
+        gfx = self.__gfx
+        x = (V[s, (op >> 8) & 0xF] % 64).astype(np.uint64)
+        y = V[s, (op >> 4) & 0xF].astype(np.int64) % 32
+        I = self.__I[s]
+        ram = self.__ram
+        # Rotate each sprite row right by X within the 64 bit row, the pixels
+        # shifted out on the right wrap around to the left, as in Chip8
+        wraps = x > 64 - width if not clip else np.zeros(len(s), bool)
+        if clip:
+            # Rows below the bottom edge are not drawn
+            n = np.minimum(n, 32 - y)
+        wrapShift = np.where(wraps, 128 - width - x.astype(np.int64), 0)
+        wrapShift = wrapShift.astype(np.uint64)
+        collision = np.zeros(len(s), dtype=bool)
+        for row in range(int(n.max(initial=0))):
+            drawn = np.flatnonzero(n > row)
+            t = s[drawn]
+            if width == 8:
+                sprite = ram[t, I[drawn] + row].astype(np.uint64)
+            else:
+                address = I[drawn] + 2 * row
+                sprite = ram[t, address].astype(np.uint64) << np.uint64(8) | \
+                    ram[t, address + 1]
+            bits = (sprite << np.uint64(64 - width)) >> x[drawn]
+            bits |= np.where(wraps[drawn], sprite << wrapShift[drawn], 0) \
+                .astype(np.uint64)
+            line = (y[drawn] + row) % 32
+            collision[drawn] |= (gfx[t, line] & bits) != 0
+            gfx[t, line] ^= bits
+        V[s, 15] = collision
+        self.__pc[s] += 2
+
+    def __instEX9E(self, s, op):
+        '''EX9E: Skip the next instruction if the key stored in VX is
+        pressed.'''
+        keys = self.__V[s, (op >> 8) & 0xF]
+        self.__skip(s, self.__key[s, keys] != 0)
+
+    def __instEXA1(self, s, op):
+        '''EXA1 Skip the next instruction if the key stored in VX is not
+        pressed.'''
+        keys = self.__V[s, (op >> 8) & 0xF]
+        self.__skip(s, self.__key[s, keys] == 0)
+
+    def __instFX07(self, s, op):
+        '''FX07: Set VX to the value of the delay timer.'''
+        value = self.__timers[s, 0] - self.__tickAt(self.__cycles)
+        self.__V[s, (op >> 8) & 0xF] = np.maximum(value, 0)
+        self.__pc[s] += 2
+
+    def __instFX0A(self, s, op):
+        '''FX0A: Wait for a key press and store the key in VX.'''
+        keys = self.__key[s] != 0
+        pressed = keys.any(axis=1)
+        # Systems without a key pressed repeat this instruction
+        t = s[pressed]
+        x = (op[pressed] >> 8) & 0xF
+        self.__V[t, x] = np.argmax(keys[pressed], axis=1)
+        self.__pc[t] += 2
+
+    def __instFX15(self, s, op):
+        '''FX15: Set the delay timer to VX.'''
+        self.__timers[s, 0] = self.__tickAt(self.__cycles) + \
+            self.__V[s, (op >> 8) & 0xF].astype(np.int64)
+        self.__pc[s] += 2
+
+    def __instFX18(self, s, op):
+        '''FX18: Set the sound timer to VX.'''
+        self.__timers[s, 1] = self.__tickAt(self.__cycles) + \
+            self.__V[s, (op >> 8) & 0xF].astype(np.int64)
+        self.__pc[s] += 2
+
+    def __instFX1E(self, s, op):
+        '''FX1E: Add VX to I.'''
+        self.__I[s] += self.__V[s, (op >> 8) & 0xF]
+        self.__pc[s] += 2
+
+    def __instFX29(self, s, op):
+        '''FX29: Set I to the location of the sprite for the character in
+        VX.'''
+        self.__I[s] = self.__V[s, (op >> 8) & 0xF].astype(np.int64) * 5
+        self.__pc[s] += 2
+
+    def __instFX33(self, s, op):
+        '''FX33: Store the Binary-coded decimal representation of VX at the
+        addresses I, I+1, and I+2.'''
+        value = self.__V[s, (op >> 8) & 0xF]
+        I = self.__I[s]
+        self.__ram[s, I] = value // 100
+        self.__ram[s, I + 1] = (value // 10) % 10
+        self.__ram[s, I + 2] = value % 10
+        self.__pc[s] += 2
+
+    def __instFX55(self, s, op):
+        '''FX55: Store V0 to VX in memory starting at address I.'''
+        x = (op >> 8) & 0xF
+        for i in range(int(x.max()) + 1):
+            t = s[x >= i]
+            self.__ram[t, self.__I[t] + i] = self.__V[t, i]
+        self.__pc[s] += 2
+
+    def __instFX65(self, s, op):
+        '''FX65: Fill V0 to VX with values from memory starting at address
+        I.'''
+        x = (op >> 8) & 0xF
+        for i in range(int(x.max()) + 1):
+            t = s[x >= i]
+            self.__V[t, i] = self.__ram[t, self.__I[t] + i]
+        self.__pc[s] += 2
+
+    def __instIncrementFX55(self, s, op):
+        '''FX55: Store V0 to VX in memory starting at address I and then
+        increment I past them (memory quirk).'''
+        self.__instFX55(s, op)
+        self.__I[s] += ((op >> 8) & 0xF) + 1
+
+    def __instIncrementFX65(self, s, op):
+        '''FX65: Fill V0 to VX with values from memory starting at address I
+        and then increment I past them (memory quirk).'''
+        self.__instFX65(s, op)
+        self.__I[s] += ((op >> 8) & 0xF) + 1
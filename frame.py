@@ -3,10 +3,13 @@ from PyQt5 import QtGui, QtCore, QtWidgets
 
 class Frame(QtWidgets.QFrame):
     '''Frame extends the QtWidgets.QFrame class. It is used to draw a
-    custom grid of pixels to the screen. The pixels are specified in a 2D list
-    where the active pixels are denoted by 1 and drawn in a specific colour
-    while pixels denoted by 0 are drawn as the background with another
-    colour.'''
+    custom grid of pixels to the screen. The pixels are specified either in a
+    2D list or packed into bytes, where the active pixels are denoted by 1
+    and drawn in a specific colour while pixels denoted by 0 are drawn as the
+    background with another colour. Packed rows are kept rather than copied,
+    such as a frame published by Chip8.publishFrame, and wrapped at paint
+    time in a 1-bit QImage whose two colour palette holds the background and
+    pixel colours, which is drawn scaled with a single drawImage call.'''
 
     def __init__(self,
                  parentWindow,
@@ -19,36 +22,89 @@ class Frame(QtWidgets.QFrame):
         default colours used to draw the pixels and background.'''
         super(Frame, self).__init__(parentWindow)
         # Grid frame variables
-        self.__grid = [[0 for _ in range(height)] for _ in range(width)]
         self.__pxSize = pxSize
         self.__gWidth = width
         self.__gHeight = height
+        # Size of the drawn grid, kept when the resolution changes
+        self.__displayWidth = width * pxSize
         # Default pixel and background colours
         self.__pxColour = defaultpxColour
         self.__bgColour = defaultbgColour
+        # The grid packed into bytes row by row, one bit per pixel with the
+        # leftmost pixel of a row in the most significant bit
+        self.__data = bytes(width * height // 8)
+        # The grid converted to 32-bit colour, which scales several
+        # times faster, or None until the next paint converts it again
+        self.__colourImage = None
         # Set strong policy for focusing keyboard events to Frame
         self.setFocusPolicy(QtCore.Qt.StrongFocus)
 
-    def updatePixels(self, grid):
-        '''Set the values of the pixels in the grid to the grid specified and
-        update the screen to reflect the change.'''
-        self.__grid = [row[:] for row in grid]
-        self.update()
+    def updatePixels(self, grid, rows=None):
+        '''Set the values of the pixels in the grid to the 2D list grid,
+        indexed by column and then row, and update the screen to reflect the
+        change. If a list of changed rows is specified only the area spanning
+        them is redrawn.'''
+        rowBytes = self.__gWidth // 8
+        data = bytearray(rowBytes * self.__gHeight)
+        for y in range(self.__gHeight):
+            bits = 0
+            for column in grid:
+                bits = bits << 1 | column[y]
+            data[y * rowBytes:(y + 1) * rowBytes] = \
+                bits.to_bytes(rowBytes, 'big')
+        self.updateRows(data, rows)
+
+    def updateRows(self, data, rows=None):
+        '''Set the values of the pixels in the grid to data, the rows of the
+        grid packed into bytes with one bit per pixel, such as returned by
+        Chip8.getGFXBytes or Chip8.publishFrame, and update the screen to
+        reflect the change. The data is kept rather than copied and read when
+        the grid is painted, so it must not change until the next update. If
+        a list of changed rows is specified only the area spanning them is
+        redrawn.'''
+        self.__data = data
+        self.__colourImage = None
+        if rows is None:
+            rows = range(self.__gHeight)
+        if len(rows) == self.__gHeight:
+            self.update()
+        elif rows:
+            top = rows[0] * self.__pxSize
+            bottom = (rows[-1] + 1) * self.__pxSize
+            self.update(0, top, self.width(), bottom - top)
+
+    def setResolution(self, width, height):
+        '''Change the number of pixels in the grid to width by height, such
+        as the 128x64 high resolution of SUPER-CHIP, and clear it. The pixel
+        size changes so that the grid is drawn at the same size.'''
+        if (width, height) != (self.__gWidth, self.__gHeight):
+            self.__gWidth = width
+            self.__gHeight = height
+            self.__pxSize = max(self.__displayWidth // width, 1)
+            self.clearPixels()
+
+    def getResolution(self):
+        '''Return the number of pixels in the grid as width and height.'''
+        return (self.__gWidth, self.__gHeight)
 
     def clearPixels(self):
         '''Set all the values for the pixels in the grid to 0 and update the
         screen to reflect the change.'''
-        self.__grid = [[0 for _ in range(self.__gHeight)]
-                       for _ in range(self.__gWidth)]
+        self.__data = bytes(self.__gWidth * self.__gHeight // 8)
+        self.__colourImage = None
         self.update()
 
     def changePixelColour(self, pxColour):
         '''Set the new value of the pixel colour to pxColour.'''
         self.__pxColour = pxColour
+        self.__colourImage = None
+        self.update()
 
     def changeBackgroundColour(self, bgColour):
         '''Set the new value of the background colour to bgColour.'''
         self.__bgColour = bgColour
+        self.__colourImage = None
+        self.update()
 
     def getPixelColour(self):
         '''Return the current value of the pixel colour.'''
@@ -58,25 +114,37 @@ class Frame(QtWidgets.QFrame):
         '''Return the current value of the background colour.'''
         return self.__bgColour
 
+    def __convertImage(self):
+        '''Return the grid as a 32-bit colour QImage. The packed rows are
+        wrapped without copying in a 1-bit QImage, 0 indexing the background
+        colour and 1 the pixel colour, which is then converted.'''
+        image = QtGui.QImage(self.__data, self.__gWidth, self.__gHeight,
+                             self.__gWidth // 8, QtGui.QImage.Format_Mono)
+        image.setColorTable([QtGui.qRgb(*self.__bgColour),
+                             QtGui.qRgb(*self.__pxColour)])
+        return image.convertToFormat(QtGui.QImage.Format_RGB32)
+
     def paintEvent(self, event):
-        '''Handle and process all of the drawing for the grid. Each pixel is
-        drawn using pixel colour and the background is drawn wherever the pixel
-        value is 0 using background colour.'''
+        '''Handle and process all of the drawing for the grid. The rows of the
+        grid that intersect the area being updated are scaled up to the
+        pixel size in a single draw, and the rest of the area is erased.'''
         painter = QtGui.QPainter(self)  # Used to draw on the frame
-        # Clear all drawings on the Frame
-        painter.eraseRect(0, 0, self.width(), self.height())
-        # Draw the pixels on the Frame
-        for y in range(self.__gHeight):
-            for x in range(self.__gWidth):
-                if self.__grid[x][y]:
-                    color = QtGui.QColor(self.__pxColour[0],
-                                         self.__pxColour[1],
-                                         self.__pxColour[2])
-                else:
-                    color = QtGui.QColor(self.__bgColour[0],
-                                         self.__bgColour[1],
-                                         self.__bgColour[2])
-                painter.fillRect(x * self.__pxSize,
-                                 y * self.__pxSize,
-                                 self.__pxSize,
-                                 self.__pxSize, color)
+        area = event.rect()
+        gridArea = QtCore.QRect(0, 0, self.__gWidth * self.__pxSize,
+                                self.__gHeight * self.__pxSize)
+        # Draw the rows that intersect the area
+        top = max(area.top() // self.__pxSize, 0)
+        bottom = min(area.bottom() // self.__pxSize + 1, self.__gHeight)
+        if top < bottom:
+            if self.__colourImage is None:
+                self.__colourImage = self.__convertImage()
+            painter.drawImage(
+                QtCore.QRect(0, top * self.__pxSize, gridArea.width(),
+                             (bottom - top) * self.__pxSize),
+                self.__colourImage,
+                QtCore.QRect(0, top, self.__gWidth, bottom - top))
+        # Clear the drawings in the rest of the area
+        if not gridArea.contains(area):
+            for rect in (QtGui.QRegion(area) -
+                         QtGui.QRegion(gridArea)).rects():
+                painter.eraseRect(rect)